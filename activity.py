@@ -28,10 +28,13 @@ import stopwatch
 import gobject
 import dobject
 
+import os
 import cPickle
+import savefile
+import journal
 import gtk.gdk
 
-SERVICE = "org.laptop.StopWatch"
+SERVICE = "org.laptop.StopWatch2" #not shared with versions before 17, which lack the Multiplexer
 
 class StopWatchActivity(Activity):
     """StopWatch Activity as specified in activity.info"""
@@ -94,6 +97,15 @@ class StopWatchActivity(Activity):
         self.timer = dobject.TimeHandler("main", self.tubebox)
         self.gui = stopwatch.GUIView(self.tubebox, self.timer)
 
+        # every change is journaled as it happens, so a crash loses little
+        self._journal_path = os.path.join(self.get_activity_root(), 'data',
+            'journal-' + self.get_id())
+        self._journal = None
+        if handle.object_id is None:
+            self._open_journal()
+        # otherwise read_file opens it, after the saved file has been read
+        self.connect('destroy', self._destroy_cb)
+
         self.set_canvas(self.gui.display)
         self.show_all()
 
@@ -168,17 +180,55 @@ class StopWatchActivity(Activity):
             self.tubebox.insert_tube(tube_conn, self.initiating)
     
     def read_file(self, file_path):
-        f = open(file_path, 'r')
-        q = cPickle.load(f)
-        f.close()
-        self.gui.set_all(q)
+        f = open(file_path, 'rb')
+        if savefile.is_savefile(f):
+            data = savefile.map_file(f)
+            f.close()
+            self.gui.set_mapped_data(data)
+        else:
+            q = cPickle.load(f) #saved by an older version
+            f.close()
+            self.gui.set_all(q)
+        # if we crashed, the journal holds changes newer than the file
+        if self._journal is None:
+            self._open_journal()
+    
+    def _open_journal(self):
+        """Replay the journal left by a crash, if any, and record every later
+        change in it"""
+        if os.path.exists(self._journal_path):
+            f = open(self._journal_path, 'rb')
+            try:
+                data = journal.read(f)
+            except ValueError as e:
+                self._logger.error('cannot replay journal: %s', e)
+                data = None
+            f.close()
+            if data is not None:
+                self.gui.set_save_data(data)
+        self._journal = journal.Journal(self._journal_path, self.gui.get_save_data)
+        self.gui.attach_journal(self._journal)
     
     def write_file(self, file_path):
         self.metadata['mime_type'] = 'application/x-stopwatch-activity'
-        q = self.gui.get_all()
-        f = open(file_path, 'w')
-        cPickle.dump(q, f)
+        self.gui.flush()
+        if self._journal is not None:
+            mark = self._journal.get_mark()
+        (offset, watches) = self.gui.get_save_data()
+        f = open(file_path, 'wb')
+        savefile.write(f, offset, watches)
+        f.flush()
+        os.fsync(f.fileno())
         f.close()
+        # the file now holds everything journaled before the mark
+        if self._journal is not None:
+            self._journal.discard(mark)
+    
+    def _destroy_cb(self, widget):
+        self.gui.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
         
     def _active_cb(self, widget, event):
         self._logger.debug("_active_cb")
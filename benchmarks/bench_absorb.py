@@ -0,0 +1,111 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures how AddOnlySortedSet._net_update ingests a batch of events into a
+history of HISTORY events, with ListSet.absorb and with the two paths it
+replaced:
+
+    direct      the message assigned to a ListSet's _list as it came, then
+                -= and |= by merge (the old _net_update)
+    sorted      the same, but the message first sorted and de-duplicated by
+                ListSet(), which direct needed to be correct
+
+Each is timed REPEATS times on fresh copies, and the minimum and median are
+reported.  direct is also checked for correctness, since a message need not
+arrive sorted.
+
+    python benchmarks/bench_absorb.py
+"""
+
+import os
+import sys
+import time
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dobject_helpers import ListSet
+
+HISTORY = 100000
+REPEATS = 7
+
+def direct(s, y):
+    d = ListSet()
+    d._list = y
+    d -= s
+    if len(d) > 0:
+        s |= d
+    return d
+
+def sorted_first(s, y):
+    d = ListSet(y)
+    d -= s
+    if len(d) > 0:
+        s |= d
+    return d
+
+def absorb(s, y):
+    new = s.absorb(y)
+    d = ListSet()
+    d._list = new
+    return d
+
+def time_ingest(f, history, batch):
+    """Returns (min, median) seconds for f to ingest batch, and the resulting
+    set and new items of one run"""
+    times = []
+    for r in xrange(REPEATS):
+        s = history.copy()
+        y = list(batch)
+        start = time.time()
+        d = f(s, y)
+        times.append(time.time() - start)
+    times.sort()
+    return (times[0], times[len(times)//2], s, d)
+
+def batches(rng, events):
+    """(name, batch) pairs, as received from receive_message"""
+    def fresh(n):
+        return [(rng.random()*HISTORY, 1 + rng.randrange(2)) for i in xrange(n)]
+    half = fresh(HISTORY//2) + rng.sample(events, HISTORY//2)
+    half.sort()
+    shuffled = list(half)
+    rng.shuffle(shuffled)
+    return [("10 new, sorted", sorted(fresh(10))),
+            ("1000 new, sorted", sorted(fresh(1000))),
+            ("100k, half new, sorted", half),
+            ("100k, none new, sorted", sorted(events)),
+            ("100k, half new, shuffled", shuffled),
+            ("100k, half new, duplicated", sorted(half + half[::3]))]
+
+def main():
+    rng = random.Random(9)
+    events = [(rng.random()*HISTORY, 1 + rng.randrange(2)) for i in xrange(HISTORY)]
+    history = ListSet(events)
+    print "history of %d events; ms, min / median of %d" % (len(history), REPEATS)
+    print "%-28s %17s %17s %17s" % ("batch", "direct", "sorted", "absorb")
+    for (name, batch) in batches(rng, events):
+        expected = set(events) | set(batch)
+        row = []
+        for f in (direct, sorted_first, absorb):
+            (best, median, s, d) = time_ingest(f, history, batch)
+            ok = (s._list == sorted(expected)) and (list(d) == sorted(expected - set(events)))
+            row.append("%7.2f / %7.2f%s" % (best*1000, median*1000, "" if ok else "!"))
+        print "%-28s %s" % (name, " ".join(row))
+    print "! marks a wrong result"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures the accuracy of clock synchronization over simulated links, in
+simulated time.  For each link, TRIALS members join a group whose clock is
+offset by a random amount, and drifts by up to DRIFT s/s, and probe it as
+TimeHandler does: PROBES probes PROBE_INTERVAL seconds apart, then one every
+REFINE_INTERVAL seconds.  The error of the offset estimate is reported, in
+ms, for
+
+    first       the first reply, as TimeHandler used to take
+    mean        the mean of the offsets of the first PROBES samples
+    estimator   ClockEstimator after the first PROBES samples
+    unrefined   the same estimate, REFINE minutes later
+    refined     the offset applied by ClockEstimator, slewing included, after
+                REFINE minutes of refinement
+
+    python benchmarks/bench_clock_sync.py
+"""
+
+import os
+import sys
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dobject_helpers
+from dobject_helpers import ClockEstimator, FakeClock
+
+TRIALS = 1000
+PROBES = 8 #as in TimeHandler
+PROBE_INTERVAL = 0.25
+REFINE_INTERVAL = 60.0
+REFINE = 10 #minutes
+PROCESSING = 0.001 #seconds for the peer to answer
+DRIFT = 5e-5 #largest drift of the group clock, in s/s
+
+def lan(rng):
+    return 0.001 + rng.expovariate(1/0.002)
+
+def mesh(rng):
+    d = 0.005 + rng.expovariate(1/0.02)
+    if rng.random() < 0.2:
+        d += rng.uniform(0.1, 1.0)
+    return d
+
+def congested(rng):
+    d = 0.02 + rng.expovariate(1/0.1)
+    if rng.random() < 0.5:
+        d += rng.uniform(0.2, 2.0)
+    return d
+
+def exchange(clock, est, offset, there, back):
+    """Probe a group clock that is offset(t) ahead of local time t"""
+    ask = clock.time()
+    clock.advance(there)
+    start = clock.time() + offset(clock.time())
+    clock.advance(PROCESSING)
+    finish = clock.time() + offset(clock.time())
+    clock.advance(back)
+    receive = clock.time()
+    return est.add_sample(ask, start, finish, receive)
+
+def trial(clock, rng, link):
+    (t0, offset0, drift) = (clock.time(), rng.uniform(-1000, 1000), rng.uniform(-DRIFT, DRIFT))
+    offset = lambda t: offset0 + drift*(t - t0)
+    est = ClockEstimator()
+    samples = []
+    for i in xrange(PROBES):
+        samples.append(exchange(clock, est, offset, link(rng), link(rng))[0])
+        clock.advance(PROBE_INTERVAL)
+    first = samples[0]
+    mean = sum(samples)/len(samples)
+    synced = est.offset
+    errors = [abs(x - offset(clock.time())) for x in (first, mean, synced)]
+    for i in xrange(REFINE):
+        clock.advance(REFINE_INTERVAL)
+        exchange(clock, est, offset, link(rng), link(rng))
+    now = clock.time()
+    return errors + [abs(synced - offset(now)), abs(est.get_offset() - offset(now))]
+
+def percentiles(errors):
+    errors.sort()
+    n = len(errors)
+    return (errors[n//2]*1000, errors[(95*n)//100]*1000, errors[-1]*1000)
+
+def main():
+    clock = FakeClock(1000.0)
+    dobject_helpers.set_clock(clock)
+    rng = random.Random(15)
+    print "error of the offset estimate in ms (median / 95th percentile / max) over %d trials" % TRIALS
+    print "%-10s %-10s %24s" % ("link", "method", "median /    p95 /    max")
+    for (name, link) in (("lan", lan), ("mesh", mesh), ("congested", congested)):
+        results = [trial(clock, rng, link) for i in xrange(TRIALS)]
+        for (k, method) in enumerate(("first", "mean", "estimator", "unrefined", "refined")):
+            print "%-10s %-10s %8.2f / %8.2f / %8.2f" % ((name, method) + percentiles([r[k] for r in results]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures the formatting of times, as OneWatchView does on every tick and
+for every mark, with TimeFormatter and with locale.format('%.2f'), which
+OneWatchView._format used to call.  The times are N random values up to an
+hour.  Results are in microseconds per time, the best of REPEATS.
+
+    python benchmarks/bench_format.py
+"""
+
+import os
+import sys
+import time
+import random
+import locale
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeformat import TimeFormatter
+
+N = 100000
+REPEATS = 5
+
+def best(f, values):
+    t = float('inf')
+    for i in xrange(REPEATS):
+        start = time.time()
+        for v in values:
+            f(v)
+        t = min(t, time.time() - start)
+    return t*1e6/len(values)
+
+def main():
+    locale.setlocale(locale.LC_ALL, '')
+    rng = random.Random(24)
+    values = [rng.uniform(0, 3600) for i in xrange(N)]
+    plain = TimeFormatter()
+    grouped = TimeFormatter(grouping=True)
+    clock = TimeFormatter()
+    clock.set_clock(True)
+    rows = [("locale.format('%.2f')", lambda t: locale.format('%.2f', max(0, t))),
+            ("locale.format, grouped", lambda t: locale.format('%.2f', max(0, t), True)),
+            ("TimeFormatter.format", plain.format),
+            ("  grouped", grouped.format),
+            ("  clock mode", clock.format),
+            ("TimeFormatter.format_seconds", plain.format_seconds)]
+    print "locale %s, %d times, us per time (best of %d)" % (locale.setlocale(locale.LC_NUMERIC), N, REPEATS)
+    for (name, f) in rows:
+        print "%-30s %8.2f" % (name, best(f, values))
+
+if __name__ == '__main__':
+    main()
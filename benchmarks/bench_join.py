@@ -0,0 +1,93 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures what it costs a member to join a group of MEMBERS that shares the
+DObjects of GUIView, with WATCHES watches, over the in-process FakeBus of the
+tests.  Each watch has a name (a HighScore), events and marks (AddOnlySets
+here, which sync by digest as the sorted sets do).  The DObjects are carried
+
+    per UO      each by its own UnorderedHandler
+    mux         all by one Multiplexer
+
+For each, the number of method calls and signals on the bus until the group
+is quiet, the signal match rules registered by the newcomer, and the time the
+bus takes to deliver it all, in ms, are reported.  The newcomer has half of
+the events and marks of each watch, and one of its own.  The FakeBus delivers
+everything in one process, so the time leaves out the latency of a real bus,
+which is paid once per round trip; the counts are what matter.
+
+    python benchmarks/bench_join.py
+"""
+
+import os
+import sys
+import time
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'tests'))
+
+import dobject
+from fakebus import FakeBus
+
+MEMBERS = 3
+EVENTS = 100
+
+def make_objects(handler, watches, part, extra):
+    objects = []
+    for i in xrange(watches):
+        objects.append(dobject.HighScore(handler('name%d' % i), 'Watch %d' % (i + 1), 0.0, dobject.string_translator, dobject.float_translator))
+        for kind in ('events', 'marks'):
+            items = [k for k in xrange(EVENTS) if k % part == 0] + [extra]
+            objects.append(dobject.AddOnlySet(handler('%s%d' % (kind, i)), items, dobject.int_translator))
+    return objects
+
+def join_unordered(bus, watches, part, extra):
+    box = dobject.TubeBox()
+    make_objects(lambda name: dobject.UnorderedHandler(name, box, 0), watches, part, extra)
+    tube = bus.join()
+    box.insert_tube(tube)
+    return tube
+
+def join_mux(bus, watches, part, extra):
+    box = dobject.TubeBox()
+    mux = dobject.Multiplexer('stopwatch', box, None, 0)
+    make_objects(mux.handler, watches, part, extra)
+    tube = bus.join()
+    box.insert_tube(tube)
+    return tube
+
+def measure(join, watches):
+    bus = FakeBus()
+    for m in xrange(MEMBERS):
+        join(bus, watches, 1, EVENTS + m)
+        bus.run()
+    calls = len(bus.calls)
+    signals = len(bus.signals)
+    start = time.time()
+    tube = join(bus, watches, 2, EVENTS + MEMBERS)
+    bus.run()
+    t = time.time() - start
+    return (len(bus.calls) - calls, len(bus.signals) - signals, len(tube._receivers), t*1000)
+
+def main():
+    print "%8s %8s %8s %8s %12s %10s" % ("watches", "handler", "calls", "signals", "match rules", "time (ms)")
+    for watches in (9, 200):
+        for (label, join) in (("per UO", join_unordered), ("mux", join_mux)):
+            print "%8d %8s %8d %8d %12d %10.1f" % ((watches, label) + measure(join, watches))
+
+if __name__ == '__main__':
+    main()
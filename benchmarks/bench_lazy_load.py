@@ -0,0 +1,112 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures how long read_file takes to make a saved session ready, against the
+size of the file, headless.  A session of WATCHES watches, with as many marks
+as events, is saved, and then restored
+
+    lazily      as read_file does: the file is mapped, only the fixed-size
+                part of each watch is parsed, and the watches are left for
+                GUIView.set_mapped_data to materialize when shown
+    eagerly     by reading and parsing the whole file, and loading every
+                watch's events and marks into sets as WatchModel.restore and
+                load_columns do
+
+The time to materialize the one watch that is shown first, by the same path,
+is reported too.  Times are the best of REPEATS, in ms, with the file in the
+page cache; GUIView itself, which needs gtk, is left out.
+
+    python benchmarks/bench_lazy_load.py
+"""
+
+import os
+import sys
+import time
+import array
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import savefile
+from dobject_helpers import ListSet
+
+WATCHES = 9
+REPEATS = 5
+
+def write_session(path, items):
+    """Save a session with items events and items marks in all"""
+    n = items//WATCHES
+    watches = []
+    for i in xrange(WATCHES):
+        times = array.array('d', [k*0.1 for k in xrange(n)])
+        types = array.array('i', [1 + k % 2 for k in xrange(n)])
+        marks = array.array('d', [k*0.1 + 0.05 for k in xrange(n)])
+        watches.append(('Watch %d' % (i + 1), 1.0, (0.0, 1), 0.0, times, types, marks))
+    f = open(path, 'wb')
+    savefile.write(f, 0.0, watches)
+    f.close()
+
+def materialize(watch):
+    #the columns into the sets of WatchModel.restore and load_columns
+    (name, nametime, basestate, basescore, columns) = watch
+    (times, types, marks) = columns.load()
+    ListSet().absorb_columns([times, types])
+    ListSet().absorb_columns([marks])
+
+def lazy(path):
+    f = open(path, 'rb')
+    (offset, watches) = savefile.map_file(f)
+    f.close()
+    #what set_mapped_data does with each watch before the first frame
+    unloaded = {}
+    for (i, w) in enumerate(watches):
+        if not w[4].is_empty():
+            unloaded[i] = w
+    return unloaded
+
+def eager(path):
+    f = open(path, 'rb')
+    (offset, watches) = savefile.read(f)
+    f.close()
+    for w in watches:
+        ListSet().absorb_columns([w[4], w[5]])
+        ListSet().absorb_columns([w[6]])
+
+def best(f, *args):
+    t = float('inf')
+    for i in xrange(REPEATS):
+        start = time.time()
+        f(*args)
+        t = min(t, time.time() - start)
+    return t*1000
+
+def main():
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'session')
+    try:
+        print "%10s %10s %12s %12s %16s" % ("items", "size (MB)", "lazy (ms)", "eager (ms)", "first watch (ms)")
+        for items in (9000, 90000, 900000, 4500000):
+            write_session(path, items)
+            size = os.path.getsize(path)/float(1 << 20)
+            first = lazy(path)[0]
+            print "%10d %10.1f %12.3f %12.1f %16.1f" % (items, size, best(lazy, path),
+                best(eager, path), best(materialize, first))
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    main()
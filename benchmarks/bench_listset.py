@@ -0,0 +1,121 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Compares the blocked ListSet with the ListSet it replaced, which kept one
+sorted list, at sizes from 10**3 to 10**6 items.  For each size, the set is
+filled by adding the items in order, and then
+
+    in order        the time per add when filling the set in order
+    out of order    the time per add of OPS items at random places
+    position        the time per position() of OPS random items
+    slice           the time per 100-item slice at OPS random places
+
+are measured, in microseconds per operation, best of REPEATS.
+
+    python benchmarks/bench_listset.py
+"""
+
+import os
+import sys
+import time
+import bisect
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dobject_helpers import ListSet, kill_dupes
+
+OPS = 10000
+REPEATS = 3
+
+class OldListSet:
+    """The parts of the list-based ListSet that are measured, as they were
+    before the blocked ListSet replaced it"""
+    def __init__(self, seq=[]):
+        L = list(seq)
+        if len(L) > 1:
+            L.sort()
+            L = kill_dupes(L)
+        self._list = L
+
+    def __len__(self):
+        return len(self._list)
+
+    def add(self, item):
+        if (len(self._list) > 0) and (item <= self._list[-1]):
+            a = bisect.bisect_left(self._list, item)
+            if self._list[a] != item:
+                self._list.insert(a, item)
+        else:
+            self._list.append(item)
+
+    def __getitem__(self, key):
+        if type(key) == int:
+            return self._list.__getitem__(key)
+        elif type(key) == slice:
+            a = OldListSet()
+            L = self._list.__getitem__(key)
+            if key.step < 0:
+                L.reverse()
+            a._list = L
+            return a
+
+    def position(self, x, i=0, j=-1):
+        return bisect.bisect_left(self._list, x, i, j)
+
+def best(f):
+    t = float('inf')
+    for i in xrange(REPEATS):
+        start = time.time()
+        f()
+        t = min(t, time.time() - start)
+    return t
+
+def measure(kind, n, rng):
+    items = [float(i) for i in xrange(n)]
+    late = [rng.random()*n for i in xrange(OPS)] #between the items
+    probes = [rng.random()*n for i in xrange(OPS)]
+    starts = [rng.randrange(max(1, n - 100)) for i in xrange(OPS)]
+    def in_order():
+        s = kind()
+        for x in items:
+            s.add(x)
+    s = kind(items)
+    def out_of_order():
+        t = kind(items)
+        start = time.time()
+        for x in late:
+            t.add(x)
+        return time.time() - start
+    def position():
+        for x in probes:
+            s.position(x)
+    def slices():
+        for a in starts:
+            s[a:a+100]
+    us = 1e6
+    return (best(in_order)*us/n, min(out_of_order() for i in xrange(REPEATS))*us/OPS,
+        best(position)*us/OPS, best(slices)*us/OPS)
+
+def main():
+    print "%9s %10s %17s %17s %17s %17s" % ("items", "ListSet", "in order (us)",
+        "out of order (us)", "position (us)", "slice (us)")
+    for n in (10**3, 10**4, 10**5, 10**6):
+        for (label, kind) in (("old", OldListSet), ("blocked", ListSet)):
+            print "%9d %10s %17.2f %17.2f %17.2f %17.2f" % ((n, label) + measure(kind, n, random.Random(n)))
+
+if __name__ == '__main__':
+    main()
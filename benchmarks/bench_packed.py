@@ -0,0 +1,90 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Compares ListSet with PackedListSet as the history and marks of a watch, as
+GUIView.PACKED chooses between them.  For each size, a watch's events,
+(time, type) records, and as many marks, floats, are added one by one in
+order, as they arrive while the watch runs, in a fresh process; then a batch
+of BATCH late events is absorbed, as from a peer.  Reported are
+
+    memory      the growth of the resident memory, from /proc/self/statm,
+                in bytes per event (with its mark)
+    add         the time per in-order add, in microseconds
+    absorb      the time to absorb the late batch, in ms
+
+python benchmarks/bench_packed.py
+"""
+
+import os
+import sys
+import time
+import random
+import functools
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dobject_helpers
+from dobject_helpers import ListSet, PackedListSet
+
+BATCH = 1000
+
+def rss():
+    """The resident memory of this process, in bytes"""
+    f = open('/proc/self/statm')
+    pages = int(f.read().split()[1])
+    f.close()
+    return pages*os.sysconf('SC_PAGE_SIZE')
+
+def once(kind, n):
+    """Fill one watch in this process, and print the memory growth in bytes,
+    and the add and absorb times in seconds"""
+    if kind == 'packed':
+        events = PackedListSet('di')
+        marks = PackedListSet('d')
+    else:
+        events = ListSet()
+        marks = ListSet()
+    rng = random.Random(n)
+    times = [i*0.5 for i in xrange(n)]
+    late = [(rng.random()*n*0.5, 2) for i in xrange(BATCH)]
+    before = rss()
+    start = time.time()
+    for (i, t) in enumerate(times):
+        events.add((t, 1 + i % 2))
+        marks.add(t + 0.25)
+    add = time.time() - start
+    after = rss()
+    start = time.time()
+    events.absorb(late)
+    absorb = time.time() - start
+    print after - before, add, absorb
+
+def main():
+    print "numpy: %s" % (dobject_helpers.numpy is not None)
+    print "%9s %8s %18s %10s %12s" % ("events", "set", "memory (B/event)", "add (us)", "absorb (ms)")
+    for n in (10**4, 10**5, 10**6):
+        for kind in ('list', 'packed'):
+            out = subprocess.Popen([sys.executable, __file__, '--once', kind, str(n)],
+                                   stdout=subprocess.PIPE).communicate()[0]
+            (memory, add, absorb) = [float(x) for x in out.split()]
+            print "%9d %8s %18.1f %10.2f %12.2f" % (n, kind, memory/n, add*1e6/(2*n), absorb*1000)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--once']:
+        once(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
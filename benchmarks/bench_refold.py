@@ -0,0 +1,78 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures the cost of refolding a watch's history after a late event, against
+the length of the history and how far from its end the event lands, with
+checkpoints every CHECKPOINT_INTERVAL events and with none.
+
+    python benchmarks/bench_refold.py
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dobject_helpers import ListSet, CheckpointedFold
+
+CHECKPOINT_INTERVAL = 32 #as in WatchModel
+REPEATS = 5
+
+RUN_EVENT = 1
+PAUSE_EVENT = 2
+PAUSED = 1
+RUNNING = 2
+
+def step(q, ev):
+    #the state machine of WatchModel._step, without the reset event
+    (timeval, s) = q
+    if s == PAUSED and ev[1] == RUN_EVENT:
+        return (ev[0] - timeval, RUNNING)
+    if s == RUNNING and ev[1] == PAUSE_EVENT:
+        return (ev[0] - timeval, PAUSED)
+    return q
+
+def history(n):
+    return ListSet([(float(i), RUN_EVENT + i % 2) for i in xrange(n)])
+
+def refold(n, depth, interval):
+    """Seconds to fold in one event landing depth events before the end of a
+    history of n events, the best of REPEATS"""
+    best = float('inf')
+    for r in xrange(REPEATS):
+        items = history(n)
+        fold = CheckpointedFold(items, step, (0.0, PAUSED), interval)
+        fold.update()
+        ev = (n - depth - 0.5, RUN_EVENT)
+        items.add(ev)
+        start = time.time()
+        fold.update(items.position(ev))
+        best = min(best, time.time() - start)
+    return best
+
+def main():
+    print "%8s %8s %12s %18s" % ("events", "depth", "full (ms)", "checkpointed (ms)")
+    for n in (1000, 10000, 100000):
+        for depth in (1, 10, 100, 1000):
+            if depth >= n:
+                continue
+            full = refold(n, depth, n + 1)
+            checkpointed = refold(n, depth, CHECKPOINT_INTERVAL)
+            print "%8d %8d %12.3f %18.3f" % (n, depth, full*1000, checkpointed*1000)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures saving and loading a session of WATCHES watches with savefile,
+against cPickle, for several numbers of marks in the session, spread evenly
+over the watches.  Each watch also has as many events as marks.
+
+    pickle 0    the tuple of get_all() that write_file used to pickle, with
+                the default protocol, as it did; it holds no events
+    pickle 2    the same data as savefile, as lists, with protocol 2
+    savefile    savefile.write and savefile.read
+
+Times are the best of REPEATS, in ms, writing to and reading from a file in a
+temporary directory, fsync excluded.
+
+    python benchmarks/bench_savefile.py
+"""
+
+import os
+import sys
+import time
+import array
+import random
+import shutil
+import tempfile
+import cPickle
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import savefile
+
+WATCHES = 9
+REPEATS = 3
+
+def session(rng, marks):
+    """(offset, watches) as returned by GUIView.get_save_data"""
+    watches = []
+    for i in xrange(WATCHES):
+        n = marks//WATCHES
+        times = array.array('d', sorted(rng.random()*3600 for k in xrange(n)))
+        types = array.array('i', [1 + k % 2 for k in xrange(n)])
+        m = array.array('d', sorted(rng.random()*3600 for k in xrange(n)))
+        watches.append(('Watch %d' % (i + 1), 10.0*i, (123.4, 1), 5.0, times, types, m))
+    return (rng.random()*100, watches)
+
+def old_tuple(offset, watches):
+    #(offset, names, states, marks), as GUIView.get_all returned it
+    return (offset, [w[0] for w in watches], [(w[2], w[3]) for w in watches], [list(w[6]) for w in watches])
+
+def as_lists(offset, watches):
+    return (offset, [(w[0], w[1], w[2], w[3], zip(w[4], w[5]), list(w[6])) for w in watches])
+
+def best(f):
+    t = float('inf')
+    for i in xrange(REPEATS):
+        start = time.time()
+        f()
+        t = min(t, time.time() - start)
+    return t*1000
+
+def measure(path, dump, load):
+    def save():
+        f = open(path, 'wb')
+        dump(f)
+        f.close()
+    def restore():
+        f = open(path, 'rb')
+        load(f)
+        f.close()
+    save_time = best(save)
+    return (save_time, best(restore), os.path.getsize(path))
+
+def main():
+    rng = random.Random(17)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'session')
+    try:
+        print "%8s %-10s %10s %10s %12s" % ("marks", "format", "save (ms)", "load (ms)", "size (bytes)")
+        for marks in (1000, 100000, 1000000):
+            (offset, watches) = session(rng, marks)
+            old = old_tuple(offset, watches)
+            lists = as_lists(offset, watches)
+            rows = [("pickle 0", lambda f: cPickle.dump(old, f), cPickle.load),
+                    ("pickle 2", lambda f: cPickle.dump(lists, f, 2), cPickle.load),
+                    ("savefile", lambda f: savefile.write(f, offset, watches), savefile.read)]
+            for (name, dump, load) in rows:
+                (save_time, load_time, size) = measure(path, dump, load)
+                print "%8d %-10s %10.2f %10.2f %12d" % (marks, name, save_time, load_time, size)
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures how model changes reach the watch views, headless, with a fake main
+loop in place of gobject's.
+
+The first part runs in simulated time: WATCHES running views receive a new
+state every PERIOD seconds each, and redrawing a view's label takes DRAW
+seconds.  It reports how many states were delivered, and the delay from a
+state being posted to it being delivered.
+
+The second part measures, in real time, how many updates per second worker
+threads can post while the main loop is busy, through the FrameScheduler and
+through the old handshake, in which each update was handed to the main loop
+with idle_add and the worker waited on a threading.Event until it had run.
+
+pygobject must be installed, since framescheduler imports it, but neither
+its main loop nor a display is used.
+
+    python benchmarks/bench_scheduler.py
+"""
+
+import os
+import sys
+import time
+import heapq
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dobject_helpers
+from framescheduler import FrameScheduler
+
+WATCHES = 9
+PERIOD = 0.001 #seconds between changes to each watch's model
+DURATION = 10.0 #simulated seconds
+WORKERS = 4
+UPDATES = 20000 #real updates posted by each worker
+DRAW = 0.002 #simulated seconds to redraw one view's label
+BUSY = 0.0005 #seconds the main loop spends on other work per iteration
+
+class FakeLoop:
+    """Runs timeouts in order of their deadlines, on a FakeClock, instead of
+    waiting for them"""
+    def __init__(self, clock):
+        self._clock = clock
+        self._heap = []
+        self._live = set()
+        self._next = 1
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def timeout_add(self, ms, f):
+        self._lock.acquire()
+        source = self._next
+        self._next += 1
+        heapq.heappush(self._heap, (self._clock.time() + ms/1000.0, source, f))
+        self._live.add(source)
+        self._lock.release()
+        return source
+    
+    def source_remove(self, source):
+        self._lock.acquire()
+        self._live.discard(source)
+        self._lock.release()
+    
+    def idle_add(self, f):
+        self._lock.acquire()
+        self._idle.append(f)
+        self._lock.release()
+    
+    def iterate(self, until):
+        """Run the idle functions and the timeouts due by until, advancing the
+        clock to each, and then to until"""
+        while True:
+            self._lock.acquire()
+            idle = self._idle
+            self._idle = []
+            while self._heap and self._heap[0][1] not in self._live:
+                heapq.heappop(self._heap)
+            if self._heap and self._heap[0][0] <= until:
+                (t, source, f) = heapq.heappop(self._heap)
+                self._live.discard(source)
+            else:
+                f = None
+            self._lock.release()
+            for g in idle:
+                g()
+            if f is None:
+                break
+            self._clock.set_time(max(t, self._clock.time()))
+            f()
+        self._clock.set_time(max(until, self._clock.time()))
+
+class View:
+    """Stands in for a OneWatchView: keeps the latest posted state, like
+    update_state, and records when the first of the states it delivers was
+    posted.  The states are (time of posting, state)."""
+    def __init__(self, scheduler, clock):
+        self._scheduler = scheduler
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending = None
+        self._posted_at = None
+        self.drawn = 0
+        self.delays = []
+    
+    def update_state(self, q):
+        self._lock.acquire()
+        if self._pending is None:
+            self._posted_at = q[0]
+        self._pending = q
+        self._lock.release()
+        self._scheduler.post(self)
+    
+    def _drain(self):
+        self._lock.acquire()
+        q = self._pending
+        posted_at = self._posted_at
+        self._pending = None
+        self._lock.release()
+        if q is not None:
+            self.drawn += 1
+            self.delays.append(self._clock.time() - posted_at)
+    
+    def _tick(self):
+        self._clock.advance(DRAW)
+        return FrameScheduler.INTERVAL
+
+def simulated():
+    clock = dobject_helpers.FakeClock(1000.0)
+    dobject_helpers.set_clock(clock)
+    loop = FakeLoop(clock)
+    scheduler = FrameScheduler(loop)
+    scheduler._power_checked = float('inf') #do not read /sys
+    views = [View(scheduler, clock) for i in xrange(WATCHES)]
+    for v in views:
+        scheduler.add(v)
+    posted = 0
+    depth = 0
+    t = clock.time()
+    end = t + DURATION
+    while t < end:
+        #post every change that happened while the last frame was drawn
+        while t <= clock.time():
+            for v in views:
+                v.update_state((t, 2))
+                posted += 1
+            t += PERIOD
+        depth = max(depth, scheduler.get_pending_depth())
+        loop.iterate(t)
+    delays = [d for v in views for d in v.delays]
+    drawn = sum(v.drawn for v in views)
+    print "simulated: %d states posted, %d delivered (%.1f per view per second)" % (
+        posted, drawn, drawn/float(WATCHES)/DURATION)
+    print "  delay from post to delivery: mean %.1f ms, max %.1f ms" % (
+        1000*sum(delays)/len(delays), 1000*max(delays))
+    print "  %d posts coalesced, at most %d views pending" % (
+        scheduler.get_coalesced_count(), depth)
+
+def threaded(post_factory, name):
+    """Real updates per second posted by WORKERS threads while the main loop
+    spends BUSY seconds on other work per iteration"""
+    clock = dobject_helpers.FakeClock(1000.0)
+    dobject_helpers.set_clock(clock)
+    loop = FakeLoop(clock)
+    scheduler = FrameScheduler(loop)
+    scheduler._power_checked = float('inf')
+    views = [View(scheduler, clock) for i in xrange(WORKERS)]
+    post = post_factory(loop)
+    longest = [0.0]
+    def work(v):
+        for i in xrange(UPDATES):
+            start = time.time()
+            post(v, (clock.time(), 2))
+            longest[0] = max(longest[0], time.time() - start)
+    threads = [threading.Thread(target=work, args=(v,)) for v in views]
+    start = time.time()
+    for th in threads:
+        th.start()
+    while any(th.is_alive() for th in threads):
+        loop.iterate(clock.time())
+        time.sleep(BUSY)
+        clock.advance(BUSY)
+    elapsed = time.time() - start
+    loop.iterate(clock.time())
+    print "%s: %d updates/s, longest post %.2f ms, %d delivered" % (
+        name, WORKERS*UPDATES/elapsed, 1000*longest[0], sum(v.drawn for v in views))
+
+def channel(loop):
+    return lambda v, q: v.update_state(q)
+
+def handshake(loop):
+    def post(v, q):
+        done = threading.Event()
+        def run():
+            v._pending = q
+            v._posted_at = q[0]
+            v._drain()
+            done.set()
+        loop.idle_add(run)
+        done.wait()
+    return post
+
+def main():
+    simulated()
+    threaded(channel, "latest-value channel")
+    threaded(handshake, "idle_add handshake")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Measures Stopwatch's startup: the time from building the TubeBox,
+TimeHandler and GUIView, as StopWatchActivity.__init__ does, to
+
+    ready       GUIView built and the window shown
+    paint       the first expose of the window
+    first row   the first watch row built
+    all rows    every row in view built
+
+for a window of the XO's screen size and WATCHES watches.  The resident
+memory, from /proc/self/statm, is read before the view is built and again
+once every row is built.  Each run is a fresh process, and the best of
+REPEATS is reported: times in ms, memory in MB.  Without an argument, the
+runs are made with each number of watches in WATCHES.  This needs gtk, dbus,
+the sugar libraries and a display, as the activity does; run it on an XO or
+in a Sugar development environment.
+
+    python benchmarks/bench_startup.py [watches]
+"""
+
+import os
+import sys
+import time
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WATCHES = (9, 200)
+REPEATS = 10
+WIDTH = 1200
+HEIGHT = 900
+
+def rss():
+    """The resident memory of this process, in bytes"""
+    f = open('/proc/self/statm')
+    pages = int(f.read().split()[1])
+    f.close()
+    return pages*os.sysconf('SC_PAGE_SIZE')
+
+def once(watches):
+    """Start once, and print the four times in seconds, and the resident
+    memory in bytes before the view is built and once every row is"""
+    import gobject
+    import gtk
+    import dbus.mainloop.glib
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    gobject.threads_init()
+    import dobject
+    import stopwatch
+    
+    times = {}
+    memory = {'before': rss()}
+    start = time.time()
+    window = gtk.Window()
+    window.set_default_size(WIDTH, HEIGHT)
+    def expose_cb(widget, event):
+        times.setdefault('paint', time.time())
+        return False
+    window.connect('expose-event', expose_cb)
+    tubebox = dobject.TubeBox()
+    timer = dobject.TimeHandler("main", tubebox)
+    gui = stopwatch.GUIView(tubebox, timer, watches)
+    window.add(gui.display)
+    window.show_all()
+    times['ready'] = time.time()
+    def check():
+        rows = gui._list
+        if len(rows._rows) > 0:
+            times.setdefault('first', time.time())
+            if len(rows._wanted) == 0 and rows._build_source is None and 'paint' in times:
+                times['all'] = time.time()
+                memory['after'] = rss()
+                gtk.main_quit()
+                return False
+        return True
+    gobject.idle_add(check, priority=gobject.PRIORITY_LOW)
+    gtk.main()
+    print ' '.join([repr(times[k] - start) for k in ('ready', 'paint', 'first', 'all')] +
+                   [str(memory[k]) for k in ('before', 'after')])
+
+def measure(watches):
+    runs = []
+    for i in xrange(REPEATS):
+        out = subprocess.Popen([sys.executable, __file__, '--once', str(watches)],
+                               stdout=subprocess.PIPE).communicate()[0]
+        runs.append([float(x) for x in out.split()[-6:]])
+    best = [min(r[k] for r in runs)*1000 for k in xrange(4)]
+    mb = float(1 << 20)
+    before = min(r[4] for r in runs)/mb
+    growth = min(r[5] - r[4] for r in runs)/mb
+    print "%d watches, best of %d" % (watches, REPEATS)
+    print "%10s %10s %10s %10s %12s %12s" % ("ready (ms)", "paint", "first row", "all rows", "RSS (MB)", "growth (MB)")
+    print "%10.1f %10.1f %10.1f %10.1f %12.1f %12.1f" % tuple(best + [before, growth])
+
+def main():
+    if len(sys.argv) > 1:
+        measure(int(sys.argv[1]))
+    else:
+        for watches in WATCHES:
+            measure(watches)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--once']:
+        once(int(sys.argv[2]))
+    else:
+        main()
@@ -19,10 +19,9 @@ along with DObject.  If not, see <http://www.gnu.org/licenses/>.
 import dbus
 import dbus.service
 import dbus.gobject_service
-import time
+import gobject
 import logging
 import threading
-import thread
 import random
 from dobject_helpers import *
 
@@ -34,6 +33,10 @@ splits, and merges automatically, and always to leave each connected component
 of users in a coherent state at quiescence.
 """
 
+DIGEST_BUCKETS = 64 #number of buckets in the digests of set-like DObjects
+SEND_INTERVAL = 0.05 #seconds that outgoing messages may wait to be merged
+SEND_LIMIT = 64 #number of outgoing messages that forces an immediate flush
+
 def PassFunction(*args):
     pass
 
@@ -75,15 +78,112 @@ class TubeBox:
         for L in self._listeners:
             L(tube, is_initiator)
 
+def signal_named(member, **kwargs):
+    """Like dbus.service.signal, but the signal is called member on the bus,
+    whatever the name of the decorated method, so that a class can emit a
+    signal from one method and offer a method of the signal's name that does
+    something else."""
+    def decorate(func):
+        func.__name__ = member #dbus.service.signal takes the name from here
+        return dbus.service.signal(**kwargs)(func)
+    return decorate
+
+class SendQueue:
+    """A SendQueue holds outgoing messages for a short while before emitting
+    them, so that a burst of changes to one DObject goes out as one message.
+    Each message is queued under a key identifying its DObject, along with an
+    optional function coalesce(old, new) that merges two messages for that
+    DObject into one; messages without one are sent in turn.
+    
+    Pending messages are emitted, in the order in which they were first
+    queued, interval seconds after the first of them, or at once when limit
+    messages have been queued.  An interval of 0 disables queueing.
+    """
+    def __init__(self, emit, interval=SEND_INTERVAL, limit=SEND_LIMIT):
+        self._emit = emit
+        self._interval = interval
+        self._limit = limit
+        
+        self._pending = [] #[key, message] in the order they were first queued
+        self._mergeable = {} #key -> entry of self._pending that can be merged into
+        self._count = 0 #messages queued since the last flush
+        self._source = None
+        self._lock = threading.Lock()
+        
+        self._sent = 0
+        self._coalesced = 0
+    
+    def queue(self, key, message, coalesce=None):
+        """Queue message for emission as emit(key, message)"""
+        if self._interval <= 0:
+            self._lock.acquire()
+            self._sent += 1
+            self._lock.release()
+            self._emit(key, message)
+            return
+        self._lock.acquire()
+        entry = self._mergeable.get(key)
+        if (entry is not None) and (coalesce is not None):
+            entry[1] = coalesce(entry[1], message)
+            self._coalesced += 1
+        else:
+            entry = [key, message]
+            self._pending.append(entry)
+            if coalesce is not None:
+                self._mergeable[key] = entry
+        self._count += 1
+        full = self._count >= self._limit
+        if (not full) and (self._source is None):
+            self._source = gobject.timeout_add(int(self._interval*1000), self._timeout)
+        self._lock.release()
+        if full:
+            self.flush()
+    
+    def _timeout(self):
+        self._lock.acquire()
+        self._source = None
+        self._lock.release()
+        self.flush()
+        return False
+    
+    def flush(self):
+        """Emit all pending messages now"""
+        self._lock.acquire()
+        pending = self._pending
+        self._pending = []
+        self._mergeable = {}
+        self._count = 0
+        if self._source is not None:
+            gobject.source_remove(self._source)
+            self._source = None
+        self._sent += len(pending)
+        self._lock.release()
+        for (key, message) in pending:
+            self._emit(key, message)
+    
+    def get_sent_count(self):
+        """The number of messages emitted so far"""
+        return self._sent
+    
+    def get_coalesced_count(self):
+        """The number of messages that were merged into another instead of
+        being emitted"""
+        return self._coalesced
+
 class TimeHandler(dbus.gobject_service.ExportedGObject):
     """A TimeHandler provides a universal clock for a sharing instance.  It is a
-    sort of cheap, decentralized synchronization system.  The TimeHandler 
-    determines the offset between local time and group time by sending a
-    broadcast and accepting the first response, and assuming that both transfer
-    displays were equal.  The initiator's offset is 0.0, but once another group
-    member has synchronized, the initiator can leave and new members will still
-    be synchronized correctly.  Errors at each synchronization are typically
-    between 0.1s and 2s.
+    sort of cheap, decentralized synchronization system.  The initiator's offset
+    is 0.0, but once another group member has synchronized, the initiator can
+    leave and new members will still be synchronized correctly.
+    
+    The offset between local time and group time is estimated by a
+    ClockEstimator, in the manner of NTP, with drift estimation and slewing so
+    that time() never jumps; see ClockEstimator.  The TimeHandler collects
+    its samples: a joining member broadcasts its first probe, which every
+    synchronized member answers, and then sends PROBES-1 more to the member
+    whose answer had the smallest error, PROBE_INTERVAL seconds apart.  After
+    that it sends one probe every REFINE_INTERVAL seconds, so the message
+    rate stays bounded.
     
     TimeHandler is not perfectly resilient to disappearances.  If the group
     splits, and one of the daughter groups does not contain any members that
@@ -93,6 +193,10 @@ class TimeHandler(dbus.gobject_service.ExportedGObject):
     """
     IFACE = "org.dobject.TimeHandler"
     BASEPATH = "/org/dobject/TimeHandler/"
+    
+    PROBES = 8 #probes sent when first synchronizing
+    PROBE_INTERVAL = 0.25 #seconds between those probes
+    REFINE_INTERVAL = 60.0 #seconds between probes once synchronized
 
     def __init__(self, name, tube_box, offset=0.0):
         self.PATH = TimeHandler.BASEPATH + name
@@ -102,9 +206,10 @@ class TimeHandler(dbus.gobject_service.ExportedGObject):
         self.tube = None
         self.is_initiator = None
         
-        self.offset = offset
-        self._know_offset = False
-        self._offset_lock = threading.Lock()
+        self._estimator = ClockEstimator(offset)
+        self._peer = None #unique name of the member to probe next
+        self._probes_left = 0
+        self._source = None
         
         self._tube_box.register_listener(self.get_tube)
                 
@@ -115,29 +220,67 @@ class TimeHandler(dbus.gobject_service.ExportedGObject):
         self.tube = tube
         self.add_to_connection(self.tube, self.PATH)
         self.is_initiator = is_initiator
-        self._know_offset = is_initiator
+        self._estimator.set_reference(is_initiator)
         self.tube.add_signal_receiver(self.tell_time, signal_name='What_time_is_it', dbus_interface=TimeHandler.IFACE, sender_keyword='sender', path=self.PATH)
 
-        if not self._know_offset:
-            self.ask_time()
+        if is_initiator:
+            self.set_offset(self._estimator.offset, 0.0)
+        else:
+            self._probes_left = TimeHandler.PROBES
+            self._probe()
 
     def time(self):
-        """Get the group time"""
-        return time.time() + self.offset
+        """Get the group time.  This never decreases."""
+        return self._estimator.time()
         
     def get_offset(self):
         """Get the difference between local time and group time"""
-        self._logger.debug("get_offset " + str(self.offset))
-        return self.offset
+        return self._estimator.get_offset()
+    
+    def get_drift(self):
+        """Get the estimated rate of change of the offset, in s/s"""
+        return self._estimator.get_drift()
     
-    def set_offset(self, offset):
+    def get_error(self):
+        """Get a bound on the error of get_offset(), in seconds.  This is inf
+        if the offset is not known."""
+        return self._estimator.get_error()
+    
+    def set_offset(self, offset, error=0.0):
         """Set the difference between local time and group time, and assert that
-        this is correct"""
+        this is correct, to within error seconds"""
         self._logger.debug("set_offset " + str(offset))
-        self._offset_lock.acquire()
-        self.offset = offset
-        self._know_offset = True
-        self._offset_lock.release()
+        self._estimator.set_offset(offset, error)
+    
+    def _add_sample(self, ask, start, finish, receive, error, sender):
+        (offset, error) = self._estimator.add_sample(ask, start, finish, receive, error, sender)
+        self._logger.debug("sample from " + str(sender) + ": " + str(offset) + " +- " + str(error))
+        best = self._estimator.get_sender()
+        if best is not None:
+            self._peer = best
+    
+    def _probe(self):
+        """Send one probe, to the best known member if there is one, or else to
+        everyone, and schedule the next."""
+        if self._peer is None:
+            self.ask_time()
+        else:
+            peer = self._peer
+            remote = self.tube.get_object(peer, self.PATH)
+            #_peer may change before the reply arrives
+            reply = lambda asktime, start_time, finish_time, error: self._receive_reply(peer, asktime, start_time, finish_time, error)
+            remote.get_time(clock_time(), reply_handler=reply, error_handler=self._probe_failed)
+        if self._probes_left > 0:
+            self._probes_left -= 1
+            delay = TimeHandler.PROBE_INTERVAL
+        else:
+            delay = TimeHandler.REFINE_INTERVAL
+        self._source = gobject.timeout_add(int(delay*1000), self._probe)
+        return False
+    
+    def _probe_failed(self, e):
+        self._logger.debug("probe failed: " + str(e))
+        self._peer = None #go back to asking everyone
 
     @dbus.service.signal(dbus_interface=IFACE, signature='d')
     def What_time_is_it(self, asktime):
@@ -145,35 +288,40 @@ class TimeHandler(dbus.gobject_service.ExportedGObject):
         
     def ask_time(self):
         self._logger.debug("ask_time")
-        self.What_time_is_it(time.time())
+        self.What_time_is_it(clock_time())
     
     def tell_time(self, asktime, sender=None):
         self._logger.debug("tell_time")
-        start_time = time.time()
+        start_time = clock_time()
         try:
             my_name = self.tube.get_unique_name()
             if sender == my_name:
                 return
-            if self._know_offset:
+            if self._estimator.is_known():
                 self._logger.debug("telling offset")
                 remote = self.tube.get_object(sender, self.PATH)
-                start_time += self.offset
-                remote.receive_time(asktime, start_time, time.time() + self.offset, reply_handler=PassFunction, error_handler=PassFunction)
+                start_time += self.get_offset()
+                remote.receive_time(asktime, start_time, self.time(), reply_handler=PassFunction, error_handler=PassFunction)
         finally:
             return
     
-    @dbus.service.method(dbus_interface=IFACE, in_signature='ddd', out_signature='')
-    def receive_time(self, asktime, start_time, finish_time):
+    @dbus.service.method(dbus_interface=IFACE, in_signature='ddd', out_signature='', sender_keyword='sender')
+    def receive_time(self, asktime, start_time, finish_time, sender=None):
+        """An answer to our broadcast.  Older members do not report their
+        error, so it is taken to be zero."""
         self._logger.debug("receive_time")
-        rtime = time.time()
-        thread.start_new_thread(self._handle_incoming_time, (asktime, start_time, finish_time, rtime))
-    
-    def _handle_incoming_time(self, ask, start, finish, receive):
-        self._offset_lock.acquire()
-        if not self._know_offset:
-            self.offset = ((start + finish)/2) - ((ask + receive)/2)
-            self._know_offset = True
-        self._offset_lock.release()
+        self._add_sample(asktime, start_time, finish_time, clock_time(), 0.0, sender)
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature='d', out_signature='dddd')
+    def get_time(self, asktime):
+        """Answer a probe from a single member with the probe's send time, the
+        group time on receipt and on reply, and our own error."""
+        start_time = self.time()
+        return (asktime, start_time, self.time(), self.get_error())
+    
+    def _receive_reply(self, peer, asktime, start_time, finish_time, error):
+        """The reply of peer to a probe"""
+        self._add_sample(asktime, start_time, finish_time, clock_time(), error, peer)
 
 
 class UnorderedHandler(dbus.gobject_service.ExportedGObject):
@@ -206,15 +354,45 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
     
     add_history(state):
     This method accepts and processes the state object returned by get_history()
+    
+    A UO whose state is a set of items may also implement two more methods,
+    which let a joining member fetch only the state it is missing:
+    
+    get_digest():
+    This method returns set_digest() of the state with DIGEST_BUCKETS buckets,
+    encoded by digest_translator.
+    
+    get_bucket_history(buckets):
+    This method returns the items that fall in the given buckets of the
+    digest, encoded as a message for receive_message().
+    
+    When a member joins, only one member that was already present, the one
+    that has been present longest (see Membership), answers it.  If the UO
+    supports digests, that member sends its digest, and the joining member
+    replies with its own items in the buckets where the digests differ, and
+    receives the responder's items in those buckets in return.  If the joining
+    member had anything new, the responder broadcasts the new items to the
+    rest of the group.  Otherwise the responder sends its full history, and
+    the joining member returns its own history, merged with the responder's;
+    if that changes the responder's state, the responder shares the merged
+    history with the rest of the group.  Either way, what the joining member
+    brings reaches everyone.
+    
+    Messages passed to send() wait in a SendQueue for up to send_interval
+    seconds.  A UO whose messages can be merged should implement
+    
+    coalesce(old, new):
+    This method returns a single message with the effect of receiving both old
+    and new.  While a message is waiting, later messages are merged into it.
     """
     IFACE = "org.dobject.Unordered"
     BASEPATH = "/org/dobject/Unordered/"
 
-    def __init__(self, name, tube_box):
+    def __init__(self, name, tube_box, send_interval=SEND_INTERVAL, send_limit=SEND_LIMIT):
         """To construct a UO, the program must provide a name and a TubeBox.
         The name is used to identify the UO; all UO with the same name on the
         same Tube should be considered views into the same abstract distributed
-        object."""
+        object.  send_interval and send_limit configure the SendQueue."""
         self._myname = name
         self.PATH = UnorderedHandler.BASEPATH + name
         dbus.gobject_service.ExportedGObject.__init__(self)
@@ -223,6 +401,8 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
         self.tube = None
         
         self.object = None
+        self._membership = Membership()
+        self._queue = SendQueue(self._emit_queued, send_interval, send_limit)
         self._tube_box.register_listener(self.set_tube)
 
     def set_tube(self, tube, is_initiator):
@@ -231,6 +411,7 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
         self.add_to_connection(self.tube, self.PATH)
                         
         self.tube.add_signal_receiver(self.receive_message, signal_name='send', dbus_interface=UnorderedHandler.IFACE, sender_keyword='sender', path=self.PATH)
+        self.tube.add_signal_receiver(self.receive_shared, signal_name='share', dbus_interface=UnorderedHandler.IFACE, sender_keyword='sender', path=self.PATH)
         self.tube.add_signal_receiver(self.tell_history, signal_name='ask_history', dbus_interface=UnorderedHandler.IFACE, sender_keyword='sender', path=self.PATH)
         self.tube.watch_participants(self.members_changed)
 
@@ -257,10 +438,26 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
         necessary if one DObject wishes to create another."""
         return self._tube_box
     
-    @dbus.service.signal(dbus_interface=IFACE, signature='v')
+    @signal_named('send', dbus_interface=IFACE, signature='v')
+    def _emit(self, message):
+        return
+    
     def send(self, message):
         """This method broadcasts message to all other handlers for this UO"""
-        return
+        self._queue.queue(None, message, getattr(self.object, 'coalesce', None))
+    
+    def _emit_queued(self, key, message):
+        self._emit(message)
+    
+    def flush(self):
+        """Broadcast all queued messages now"""
+        self._queue.flush()
+    
+    def get_sent_count(self):
+        return self._queue.get_sent_count()
+    
+    def get_coalesced_count(self):
+        return self._queue.get_coalesced_count()
         
     def receive_message(self, message, sender=None):
         if self.object is None:
@@ -273,16 +470,22 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
         return
     
     def tell_history(self, sender=None):
+        if (sender != self.tube.get_unique_name()) and self._membership.is_responder():
+            self._tell(sender)
+    
+    def _tell(self, sender):
         self._logger.debug("tell_history to " + str(sender))
         try:
-            if sender == self.tube.get_unique_name():
-                return
             if self.object is None:
                 self._logger.error("object not registered before tell_history")
                 return
             remote = self.tube.get_object(sender, self.PATH)
-            h = self.object.get_history()
-            remote.receive_history(h, reply_handler=PassFunction, error_handler=PassFunction)
+            if hasattr(self.object, 'get_digest'):
+                d = self.object.get_digest()
+                remote.receive_digest(d, reply_handler=PassFunction, error_handler=PassFunction)
+            else:
+                h = self.object.get_history()
+                remote.exchange_history(h, reply_handler=self._merge_history, error_handler=PassFunction)
         finally:
             return
     
@@ -292,6 +495,67 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
             self._logger.error("object not registered before receive_history")
             return
         self.object.add_history(hist)
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature = 'v', out_signature='v')
+    def exchange_history(self, hist):
+        """The responder's history has arrived.  Add it, and return ours, so
+        that what we brought reaches the group."""
+        if self.object is None:
+            self._logger.error("object not registered before exchange_history")
+            raise dbus.exceptions.DBusException("object not registered")
+        self.object.add_history(hist)
+        return self.object.get_history()
+    
+    def _merge_history(self, hist):
+        """A joining member's history has arrived.  Add it, and share the
+        result with the group if it changed anything."""
+        before = self.object.get_history()
+        self.object.add_history(hist)
+        after = self.object.get_history()
+        if after != before:
+            self._share(after)
+    
+    @signal_named('share', dbus_interface=IFACE, signature='v')
+    def _share(self, hist):
+        return
+    
+    def receive_shared(self, hist, sender=None):
+        if sender == self.tube.get_unique_name():
+            return
+        if self.object is None:
+            self._logger.error("got shared history before registration")
+        else:
+            self.object.add_history(hist)
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature = 'v', out_signature='', sender_keyword = 'sender')
+    def receive_digest(self, digest, sender=None):
+        """The responder's digest has arrived.  Send our items in the buckets
+        that differ, and ask for the responder's items in return."""
+        if self.object is None:
+            self._logger.error("object not registered before receive_digest")
+            return
+        buckets = digest_diff(self.object.get_digest(), digest_translator(digest, False))
+        self._logger.debug("receive_digest: " + str(len(buckets)) + " buckets differ")
+        if len(buckets) > 0:
+            remote = self.tube.get_object(sender, self.PATH)
+            h = self.object.get_bucket_history(buckets)
+            remote.sync_buckets(dbus.Array(buckets, signature='u'), h, reply_handler=self.receive_history, error_handler=PassFunction)
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature = 'auv', out_signature='v')
+    def sync_buckets(self, buckets, hist):
+        """A joining member has sent its items in the given buckets.  Add them,
+        pass them on to the group if any were new, and return ours."""
+        if self.object is None:
+            self._logger.error("object not registered before sync_buckets")
+            return dbus.Array([], type=dbus.Boolean)
+        buckets = [int(b) for b in buckets]
+        before = self.object.get_bucket_history(buckets)
+        self.object.add_history(hist)
+        after = self.object.get_bucket_history(buckets)
+        if len(after) > len(before):
+            #The rest of the group only lacks what was new to us
+            self.send(dbus.Array(new_items(before, after)))
+        return after
 
     #Alternative implementation of a members_changed (not yet working)
     """ 
@@ -302,8 +566,8 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
     """
     def members_changed(self, added, removed):
         self._logger.debug("members_changed")
-        for (handle, name) in added:
-            self.tell_history(sender=name)
+        for name in self._membership.update(self.tube.get_unique_name(), added, removed):
+            self._tell(name)
     
     def __repr__(self):
         return 'UnorderedHandler(' + self._myname + ', ' + repr(self._tube_box) + ')'
@@ -312,7 +576,331 @@ class UnorderedHandler(dbus.gobject_service.ExportedGObject):
         """A convenience function for returning a new UnorderedHandler derived
         from this one, with a new name.  This is safe as long as copy() is called
         with a different name every time."""
-        return UnorderedHandler(self._myname + "/" + name, self._tube_box)
+        return UnorderedHandler(self._myname + "/" + name, self._tube_box, self._queue._interval, self._queue._limit)
+
+class Multiplexer(dbus.gobject_service.ExportedGObject):
+    """A Multiplexer carries many UOs over a single DBus object.  Each
+    UnorderedHandler exports its own object, registers its own signal receivers
+    and watches the participants of the tube on its own, and each of them asks
+    for, and answers, the history of its UO separately.  With dozens of
+    DObjects, a joining member then sets off dozens of exchanges at once.
+    
+    A Multiplexer exports one object per tube and routes each message by the
+    name of its UO.  A joining member asks for the history of all its UOs in
+    one signal, and the responder answers with one call containing the digests
+    or histories of all the UOs it has registered, including those the joining
+    member has not created yet.  The joining member replies with one call
+    holding its items in the buckets that differ, its own histories, and the
+    digests of the UOs the responder did not list, and receives the
+    responder's items in those buckets in return; only if the responder lacks
+    some of the unlisted UOs' buckets does one more call follow.  Whatever the
+    joining member brought that was new is passed on to the rest of the
+    group.
+    
+    UOs use a Multiplexer through the lightweight handlers returned by
+    handler(name), which offer the same interface to the UO as an
+    UnorderedHandler.  A Multiplexer only talks to other Multiplexers, so all
+    members of a group must use the same kind of handler.
+    
+    Outgoing messages of all the UOs share one SendQueue, as for
+    UnorderedHandler.
+    
+    If a message or history arrives for a name that has not been registered,
+    the Multiplexer calls missing(name), if it was given, which may create and
+    register the missing UO; otherwise the message is dropped.
+    """
+    IFACE = "org.dobject.Multiplexer"
+    BASEPATH = "/org/dobject/Multiplexer/"
+
+    def __init__(self, name, tube_box, missing=None, send_interval=SEND_INTERVAL, send_limit=SEND_LIMIT):
+        self._myname = name
+        self.PATH = Multiplexer.BASEPATH + name
+        dbus.gobject_service.ExportedGObject.__init__(self)
+        self._logger = logging.getLogger(self.PATH)
+        self._tube_box = tube_box
+        self.tube = None
+        self._missing = missing
+        
+        self._objects = {} #name -> registered UO
+        self._handlers = {} #name -> MultiplexedHandler
+        self._unasked = set() #names registered since the last ask_history
+        self._offered = set() #names whose state we have sent to a responder
+        self._ask_source = None
+        self._lock = threading.Lock()
+        self._membership = Membership()
+        self._queue = SendQueue(self._emit, send_interval, send_limit)
+        self._tube_box.register_listener(self.set_tube)
+
+    def set_tube(self, tube, is_initiator):
+        """Callback for the TubeBox"""
+        self.tube = tube
+        self.add_to_connection(self.tube, self.PATH)
+        
+        self.tube.add_signal_receiver(self.receive_message, signal_name='send', dbus_interface=Multiplexer.IFACE, sender_keyword='sender', path=self.PATH)
+        self.tube.add_signal_receiver(self.receive_shared, signal_name='share', dbus_interface=Multiplexer.IFACE, sender_keyword='sender', path=self.PATH)
+        self.tube.add_signal_receiver(self.tell_history, signal_name='ask_history', dbus_interface=Multiplexer.IFACE, sender_keyword='sender', path=self.PATH)
+        self.tube.watch_participants(self.members_changed)
+        
+        self._lock.acquire()
+        self._unasked.update(self._objects.keys())
+        self._lock.release()
+        self._ask()
+
+    def handler(self, name):
+        """Returns the handler for the UO with this name, creating it if
+        necessary."""
+        self._lock.acquire()
+        h = self._handlers.get(name)
+        if h is None:
+            h = MultiplexedHandler(self, name)
+            self._handlers[name] = h
+        self._lock.release()
+        return h
+    
+    def get_tube(self):
+        return self._tube_box
+    
+    def _register(self, name, obj):
+        self._lock.acquire()
+        self._objects[name] = obj
+        if self.tube is not None:
+            #UOs are often created in bunches; ask for all of them at once
+            self._unasked.add(name)
+            if self._ask_source is None:
+                self._ask_source = gobject.idle_add(self._ask)
+        self._lock.release()
+    
+    def _ask(self):
+        self._lock.acquire()
+        names = list(self._unasked)
+        self._unasked.clear()
+        self._ask_source = None
+        self._lock.release()
+        if len(names) > 0:
+            self.ask_history(dbus.Array(names, signature='s'))
+        return False
+    
+    def _get_object(self, name):
+        name = str(name)
+        obj = self._objects.get(name)
+        if (obj is None) and (self._missing is not None):
+            self._missing(name)
+            obj = self._objects.get(name)
+        if obj is None:
+            self._logger.error("no object registered for " + name)
+        return obj
+    
+    @signal_named('send', dbus_interface=IFACE, signature='sv')
+    def _emit(self, name, message):
+        return
+    
+    def send(self, name, message):
+        """This method broadcasts message to all other handlers for the UO
+        called name"""
+        self._queue.queue(name, message, getattr(self._objects.get(name), 'coalesce', None))
+    
+    def flush(self):
+        """Broadcast all queued messages now"""
+        self._queue.flush()
+    
+    def get_sent_count(self):
+        return self._queue.get_sent_count()
+    
+    def get_coalesced_count(self):
+        return self._queue.get_coalesced_count()
+    
+    def receive_message(self, name, message, sender=None):
+        obj = self._get_object(name)
+        if obj is not None:
+            obj.receive_message(message)
+    
+    @dbus.service.signal(dbus_interface=IFACE, signature='as')
+    def ask_history(self, names):
+        return
+    
+    def tell_history(self, names, sender=None):
+        if (sender != self.tube.get_unique_name()) and self._membership.is_responder():
+            #Only the names asked for: a newcomer learns of all our UOs from
+            #members_changed, and later asks cover UOs registered since
+            self._tell(sender, [str(name) for name in names])
+    
+    def _tell(self, sender, names):
+        self._logger.debug("tell_history to " + str(sender))
+        try:
+            digests = {}
+            histories = {}
+            for name in names:
+                obj = self._objects.get(name)
+                if obj is None:
+                    continue
+                if hasattr(obj, 'get_digest'):
+                    digests[name] = obj.get_digest()
+                else:
+                    histories[name] = obj.get_history()
+            remote = self.tube.get_object(sender, self.PATH)
+            remote.receive_state(dbus.Dictionary(digests, signature='sv'), dbus.Dictionary(histories, signature='sv'), reply_handler=PassFunction, error_handler=PassFunction)
+        finally:
+            return
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature = 'a{sv}a{sv}', out_signature='', sender_keyword = 'sender')
+    def receive_state(self, digests, histories, sender=None):
+        """The responder's state has arrived: the histories of UOs that do not
+        support digests, and the digests of those that do.  Send our items in
+        the buckets that differ, our own histories, and the digests of the UOs
+        the responder did not list, and ask for the responder's items in
+        return."""
+        self.receive_histories(histories)
+        buckets = {}
+        items = {}
+        for (name, digest) in digests.iteritems():
+            obj = self._get_object(name)
+            if obj is None:
+                continue
+            b = digest_diff(obj.get_digest(), digest_translator(digest, False))
+            if len(b) > 0:
+                buckets[name] = dbus.Array(b, signature='u')
+                items[name] = obj.get_bucket_history(b)
+        my_histories = {}
+        my_digests = {}
+        self._lock.acquire()
+        for (name, obj) in self._objects.items():
+            listed = (name in digests) or (name in histories)
+            if (not listed) and (name in self._offered):
+                #Answers to later asks only list the names asked for; the
+                #rest were offered in an earlier sync
+                continue
+            if not hasattr(obj, 'get_digest'):
+                my_histories[name] = obj.get_history()
+            elif not listed:
+                my_digests[name] = obj.get_digest()
+            self._offered.add(name)
+        self._lock.release()
+        self._logger.debug("receive_state: " + str(len(buckets)) + " objects differ")
+        if (len(buckets) > 0) or (len(my_histories) > 0) or (len(my_digests) > 0):
+            remote = self.tube.get_object(sender, self.PATH)
+            reply = lambda replies, wanted: self._receive_sync(sender, replies, wanted)
+            remote.sync_state(dbus.Dictionary(buckets, signature='sau'), dbus.Dictionary(items, signature='sv'), dbus.Dictionary(my_histories, signature='sv'), dbus.Dictionary(my_digests, signature='sv'), reply_handler=reply, error_handler=PassFunction)
+    
+    def _receive_sync(self, sender, replies, wanted):
+        """The responder has returned its items in the buckets that differ,
+        and the buckets it wants of the UOs it did not list.  Send those."""
+        self.receive_histories(replies)
+        items = {}
+        for (name, b) in wanted.iteritems():
+            obj = self._get_object(name)
+            if obj is not None:
+                items[name] = obj.get_bucket_history([int(x) for x in b])
+        if len(items) > 0:
+            remote = self.tube.get_object(sender, self.PATH)
+            remote.sync_buckets(wanted, dbus.Dictionary(items, signature='sv'), reply_handler=self.receive_histories, error_handler=PassFunction)
+    
+    def receive_histories(self, histories):
+        for (name, hist) in histories.iteritems():
+            obj = self._get_object(name)
+            if obj is not None:
+                obj.add_history(hist)
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature = 'a{sau}a{sv}a{sv}a{sv}', out_signature='a{sv}a{sau}')
+    def sync_state(self, buckets, items, histories, digests):
+        """A joining member has sent its items in the buckets that differ, its
+        histories, and the digests of the UOs we did not list.  Add the items
+        and histories, pass on to the group whatever was new, and return our
+        items in those buckets and the buckets we want of the unlisted UOs."""
+        replies = self._sync_buckets(buckets, items)
+        for (name, hist) in histories.iteritems():
+            obj = self._get_object(name)
+            if obj is None:
+                continue
+            before = obj.get_history()
+            obj.add_history(hist)
+            after = obj.get_history()
+            if after != before:
+                self._share(name, after)
+        wanted = {}
+        for (name, digest) in digests.iteritems():
+            obj = self._get_object(name)
+            if obj is None:
+                continue
+            b = digest_diff(obj.get_digest(), digest_translator(digest, False))
+            if len(b) > 0:
+                wanted[name] = dbus.Array(b, signature='u')
+        return (replies, dbus.Dictionary(wanted, signature='sau'))
+    
+    @dbus.service.method(dbus_interface=IFACE, in_signature = 'a{sau}a{sv}', out_signature='a{sv}')
+    def sync_buckets(self, buckets, items):
+        """A joining member has sent its items in the buckets that differ, for
+        each UO.  Add them, pass them on to the group if any were new, and
+        return ours."""
+        return self._sync_buckets(buckets, items)
+    
+    def _sync_buckets(self, buckets, items):
+        replies = {}
+        for (name, b) in buckets.iteritems():
+            obj = self._get_object(name)
+            if obj is None:
+                continue
+            b = [int(x) for x in b]
+            hist = items[name]
+            before = obj.get_bucket_history(b)
+            obj.add_history(hist)
+            after = obj.get_bucket_history(b)
+            if len(after) > len(before):
+                #The rest of the group only lacks what was new to us
+                self.send(name, dbus.Array(new_items(before, after)))
+            replies[name] = after
+        return dbus.Dictionary(replies, signature='sv')
+    
+    @signal_named('share', dbus_interface=IFACE, signature='sv')
+    def _share(self, name, hist):
+        return
+    
+    def receive_shared(self, name, hist, sender=None):
+        if sender == self.tube.get_unique_name():
+            return
+        obj = self._get_object(name)
+        if obj is not None:
+            obj.add_history(hist)
+    
+    def members_changed(self, added, removed):
+        self._logger.debug("members_changed")
+        #A newcomer only asks for the UOs it has registered so far, so tell it
+        #about all of ours, as UnorderedHandler does
+        for name in self._membership.update(self.tube.get_unique_name(), added, removed):
+            self._tell(name, self._registered_names())
+    
+    def _registered_names(self):
+        self._lock.acquire()
+        names = self._objects.keys()
+        self._lock.release()
+        return names
+    
+    def __repr__(self):
+        return 'Multiplexer(' + self._myname + ', ' + repr(self._tube_box) + ')'
+
+class MultiplexedHandler:
+    """A MultiplexedHandler stands in for an UnorderedHandler, passing
+    everything through its Multiplexer under its name."""
+    def __init__(self, mux, name):
+        self._mux = mux
+        self._myname = name
+    
+    def register(self, obj):
+        self._mux._register(self._myname, obj)
+    
+    def send(self, message):
+        self._mux.send(self._myname, message)
+    
+    def get_path(self):
+        return self._mux.PATH + "/" + self._myname
+    
+    def get_tube(self):
+        return self._mux.get_tube()
+    
+    def copy(self, name):
+        return self._mux.handler(self._myname + "/" + name)
+    
+    def __repr__(self):
+        return 'MultiplexedHandler(' + repr(self._mux) + ', ' + self._myname + ')'
 
 def empty_translator(x, pack):
     return x
@@ -353,11 +941,13 @@ class HighScore:
         self._handler.register(self)
         
         self._listeners = []
+        self._change_listeners = []
     
     def _set_value_from_net(self, val, score, tiebreaker):
         self._logger.debug("set_value_from_net " + str(val) + " " + str(score))
         if self._actually_set_value(val, score, tiebreaker):
             self._trigger()
+            self._trigger_change()
     
     def receive_message(self, message):
         self._logger.debug("receive_message " + str(message))
@@ -369,6 +959,27 @@ class HighScore:
     
     add_history = receive_message
     
+    def restore(self, val, score):
+        """Set the value and score as if they had been received from another
+        user, without broadcasting them.  This is for restoring saved state,
+        so listeners are called, but change listeners are not."""
+        if self._actually_set_value(val, score, None):
+            self._trigger()
+    
+    def coalesce(self, old, new):
+        """Merge two outgoing messages by keeping the one with the higher
+        score"""
+        if len(new) == 3:
+            old_key = (self._score_trans(old[1], False), float_translator(old[2], False))
+            new_key = (self._score_trans(new[1], False), float_translator(new[2], False))
+        else:
+            old_key = self._score_trans(old[1], False)
+            new_key = self._score_trans(new[1], False)
+        if new_key > old_key:
+            return new
+        else:
+            return old
+    
     def set_value(self, val, score):
         """This method suggests a value and score for this HighScore.  If the
         suggested score is higher than the current score, then both value and
@@ -377,6 +988,7 @@ class HighScore:
         self._logger.debug("set_value " + str(val) + " " + str(score))
         if self._actually_set_value(val, score, None):
             self._handler.send(self.get_history())
+            self._trigger_change()
             
     def _actually_set_value(self, value, score, tiebreaker):
         self._logger.debug("_actually_set_value " + str(value)+ " " + str(score))
@@ -447,6 +1059,17 @@ class HighScore:
         (v,s) = self.get_pair()
         for L in self._listeners:
             L(v,s)
+    
+    def register_change_listener(self, L):
+        """Register a function L(value, score) that will be called whenever
+        the value changes, whether by set_value or by another user.  Unlike
+        register_listener, L is not called at registration."""
+        self._change_listeners.append(L)
+    
+    def _trigger_change(self):
+        (v,s) = self.get_pair()
+        for L in self._change_listeners:
+            L(v,s)
 
 def float_translator(f, pack):
     """This translator packs and unpacks floats for dbus serialization"""
@@ -455,6 +1078,21 @@ def float_translator(f, pack):
     else:
         return float(f)
 
+def int_translator(i, pack):
+    """This translator packs and unpacks integers for dbus serialization"""
+    if pack:
+        return dbus.Int32(i)
+    else:
+        return int(i)
+
+def digest_translator(d, pack):
+    """This translator packs and unpacks set digests (see set_digest) for dbus
+    serialization"""
+    if pack:
+        return dbus.Array([dbus.Struct((dbus.UInt32(c), dbus.UInt64(h)), signature='ut') for (c, h) in d], signature='(ut)')
+    else:
+        return [(int(c), int(h)) for (c, h) in d]
+
 def string_translator(s, pack):
     """This translator packs and unpacks unicode strings for dbus serialization"""
     if pack:
@@ -489,10 +1127,20 @@ class Latest:
         """ Returns the latest value """
         return self._highscore.get_value()
     
+    def get_time(self):
+        """ Returns the time at which the latest value was set """
+        return self._highscore.get_score()
+    
     def set_value(self, val):
         """ Suggest a new value """
         self._highscore.set_value(val, self._time_handler.time())
     
+    def restore(self, val, t):
+        """Set the value as if another user had set it at time t, without
+        broadcasting it.  This is for restoring saved state, so listeners are
+        called, but change listeners are not."""
+        self._highscore.restore(val, t)
+    
     def register_listener(self, L):
         """ Register a listener L(value), to be called whenever another user
         adds a new latest value."""
@@ -501,8 +1149,19 @@ class Latest:
         self._lock.release()
         L(self.get_value())
     
+    def unregister_listener(self, L):
+        """Stop calling a listener registered with register_listener"""
+        self._lock.acquire()
+        self._listeners.remove(L)
+        self._lock.release()
+    
+    def register_change_listener(self, L):
+        """Register a listener L(value, time), to be called whenever the
+        value changes, whether by set_value or by another user."""
+        self._highscore.register_change_listener(L)
+    
     def _highscore_cb(self, val, score):
-        for L in self._listeners:
+        for L in list(self._listeners):
             L(val)
 
 class AddOnlySet:
@@ -520,6 +1179,7 @@ class AddOnlySet:
 
         self._trans = translator
         self._listeners = []  #This must be done before registering with the handler
+        self._change_listeners = []
 
         self._handler = handler
         self._handler.register(self)
@@ -576,6 +1236,7 @@ class AddOnlySet:
         if len(d) > 0:
             self._set.update(d)
             self._send(d)
+            self._trigger_change(d)
     
     __ior__ = update
     
@@ -585,6 +1246,7 @@ class AddOnlySet:
         if y not in self._set:
             self._set.add(y)
             self._send((y,))
+            self._trigger_change((y,))
     
     def _send(self, els):
         if len(els) > 0:
@@ -596,18 +1258,32 @@ class AddOnlySet:
         if len(d) > 0:
             self._set.update(d)
             self._trigger(d)
+            self._trigger_change(d)
     
     def receive_message(self, msg):
         self._net_update((self._trans(el, False) for el in msg))
     
     def get_history(self):
-        if len(self._set) > 0:
-            return dbus.Array([self._trans(el, True) for el in self._set])
+        return self._pack(self._set)
+    
+    def _pack(self, els):
+        if len(els) > 0:
+            return dbus.Array([self._trans(el, True) for el in els])
         else:
             return dbus.Array([], type=dbus.Boolean) #Prevent introspection of empty list, which fails 
     
     add_history = receive_message
     
+    def coalesce(self, old, new):
+        """Merge two outgoing messages into one array of additions"""
+        return dbus.Array(list(old) + list(new))
+    
+    def get_digest(self):
+        return digest_translator(set_digest(self._set, DIGEST_BUCKETS), True)
+    
+    def get_bucket_history(self, buckets):
+        return self._pack(bucket_items(self._set, buckets, DIGEST_BUCKETS))
+    
     def register_listener(self, L):
         """Register a listener L(diffset).  Every time another user adds items
         to the set, L will be called with the set of new items."""
@@ -618,6 +1294,15 @@ class AddOnlySet:
         for L in self._listeners:
             L(s)
     
+    def register_change_listener(self, L):
+        """Register a listener L(items), to be called with the new items
+        whenever items are added, whether by this user or by another."""
+        self._change_listeners.append(L)
+    
+    def _trigger_change(self, items):
+        for L in self._change_listeners:
+            L(items)
+    
     def __repr__(self):
         return 'AddOnlySet(' + repr(self._handler) + ', ' + repr(self._set) + ', ' + repr(self._trans) + ')'
 
@@ -628,15 +1313,23 @@ class AddOnlySortedSet:
     and the messages are subject to a time-like ordering.  Messages may still
     arrive out of order, but they will be stored in the same order on each
     computer.
+    
+    By default the items are kept in a ListSet.  The creator may instead
+    provide a factory, called with an iterable of items, that returns another
+    kind of ListSet, such as functools.partial(PackedListSet, 'di') for a
+    compact set of (float, int) tuples that mostly arrive in order.
     """
-    def __init__(self, handler, initset = (), translator=empty_translator):
+    def __init__(self, handler, initset = (), translator=empty_translator, factory=ListSet):
         self._logger = logging.getLogger('dobject.AddOnlySortedSet')
-        self._set = ListSet(initset)
+        self._factory = factory
+        self._set = factory(initset)
+        self._floor = None #Items <= self._floor have been forgotten
         
         self._lock = threading.Lock()
 
         self._trans = translator
         self._listeners = []  #This must be done before registering with the handler
+        self._change_listeners = []
 
         self._handler = handler
         self._handler.register(self)
@@ -695,54 +1388,131 @@ class AddOnlySortedSet:
         """Add all the elements of an iterable y to the current set.  If any of
         these elements were not already present, they will be broadcast to all
         other users."""
-        d = ListSet(y)
-        d -= self._set
+        self._lock.acquire()
+        if self._floor is not None:
+            y = [el for el in y if el > self._floor]
+        d = self._set.absorb(y)
+        self._lock.release()
+        self._send(d)
         if len(d) > 0:
-            self._set.update(d)
-            self._send(d)
+            self._trigger_change(d)
     
     __ior__ = update
     
     def add(self, y):
         """ Add the single element y to the current set.  If y is not already
         present, it will be broadcast to all other users."""
-        if y not in self._set:
+        self._lock.acquire()
+        new = (y not in self._set) and ((self._floor is None) or (y > self._floor))
+        if new:
             self._set.add(y)
+        self._lock.release()
+        if new:
             self._send((y,))
+            self._trigger_change([y])
+    
+    def forget(self, x):
+        """Discard every item less than or equal to x, and ignore any such
+        items that are added later.  This is only coherent if the owner of the
+        set has a separate, agreed-upon record of what the discarded items
+        meant (e.g. a HighScore holding a summary of them)."""
+        self._lock.acquire()
+        if (self._floor is None) or (x > self._floor):
+            self._floor = x
+            del self._set[:self._above_floor(self._set)]
+        self._lock.release()
+    
+    def _above_floor(self, s):
+        """The position in s of its first item greater than the floor"""
+        n = s.position(self._floor)
+        if (n < len(s)) and (s[n] == self._floor):
+            n += 1
+        return n
+    
+    def columns(self, fields):
+        """Returns the items, which must be records of the array typecodes in
+        fields as for PackedListSet, as one array.array per field"""
+        self._lock.acquire()
+        cols = self._set.columns(fields)
+        self._lock.release()
+        return cols
+    
+    def load_columns(self, cols):
+        """Add the items given as sorted, duplicate-free columns, like those
+        returned by columns(), without broadcasting them.  This is for
+        restoring saved state, so listeners are called as for items from
+        another user, but change listeners are not called."""
+        self._lock.acquire()
+        new = self._set.absorb_columns(cols)
+        if self._floor is not None:
+            del self._set[:self._above_floor(self._set)]
+            new = new[self._above_floor(new):]
+        self._lock.release()
+        if len(new) > 0:
+            self._trigger(new)
     
     def _send(self, els):
         if len(els) > 0:
             self._handler.send(dbus.Array([self._trans(el, True) for el in els]))
     
     def _net_update(self, y):
-        d = ListSet()
-        d._list = y
-        d -= self._set
-        if len(d) > 0:
-            self._set |= d
-            self._trigger(d)
+        self._lock.acquire()
+        if self._floor is not None:
+            y = [el for el in y if el > self._floor]
+        new = self._set.absorb(y)
+        self._lock.release()
+        if len(new) > 0:
+            self._trigger(self._factory(new))
+            self._trigger_change(new)
     
     def receive_message(self, msg):
         self._net_update([self._trans(el, False) for el in msg])
     
     def get_history(self):
-        if len(self._set._list) > 0:
-            return dbus.Array([self._trans(el, True) for el in self._set._list])
+        return self._pack(self._set)
+    
+    def _pack(self, els):
+        if len(els) > 0:
+            return dbus.Array([self._trans(el, True) for el in els])
         else:
             return dbus.Array([], type=dbus.Boolean) #prevent introspection of empty list, which fails
     
     add_history = receive_message
     
+    def coalesce(self, old, new):
+        """Merge two outgoing messages into one array of additions"""
+        return dbus.Array(list(old) + list(new))
+    
+    def get_digest(self):
+        return digest_translator(set_digest(self._set, DIGEST_BUCKETS), True)
+    
+    def get_bucket_history(self, buckets):
+        return self._pack(bucket_items(self._set, buckets, DIGEST_BUCKETS))
+    
     def register_listener(self, L):
         """Register a listener L(diffset).  Every time another user adds items
         to the set, L will be called with the set of new items as a SortedSet."""
         self._listeners.append(L)
         L(self._set.copy())
     
+    def unregister_listener(self, L):
+        """Stop calling a listener registered with register_listener"""
+        self._listeners.remove(L)
+    
     def _trigger(self, s):
-        for L in self._listeners:
+        for L in list(self._listeners):
             L(s)
     
+    def register_change_listener(self, L):
+        """Register a listener L(items), to be called with a sorted list of
+        the new items whenever items are added, whether by this user or by
+        another."""
+        self._change_listeners.append(L)
+    
+    def _trigger_change(self, items):
+        for L in self._change_listeners:
+            L(items)
+    
     def __repr__(self):
         return 'AddOnlySortedSet(' + repr(self._handler) + ', ' + repr(self._set) + ', ' + repr(self._trans) + ')'
         
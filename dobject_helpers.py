@@ -18,6 +18,16 @@ along with DObject.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import bisect
+import itertools
+import array
+import hashlib
+import time
+import functools
+import threading
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """
 dobject_helpers is a collection of functions and data structures that are useful
@@ -76,6 +86,108 @@ def merge_and(a,b):
 def merge_sub(a,b):
     return merge(a, b, True, False, False)
 
+def merge_new(a, b):
+    """Internal helper function for adding the sorted list b, which may
+    contain duplicates, to the sorted list a in a single pass.  Returns
+    (union, new), where new is the sorted list of items of b that are not in
+    a.  If nothing is new, union is a itself.  a is only copied from the
+    first new item on, and the part of a before the first item of b is
+    skipped by bisection, so a batch of items that are already present, or
+    that are all newer than most of a, costs little more than the batch."""
+    X = len(a)
+    Y = len(b)
+    new = []
+    if X == 0 or Y == 0:
+        for q in b:
+            if len(new) == 0 or q != new[-1]:
+                new.append(q)
+        if len(new) == 0:
+            return (a, new)
+        return (merge_or(a, new), new)
+    x = bisect.bisect_left(a, b[0])
+    y = 0
+    #find the first new item of b
+    while x < X:
+        p = a[x]
+        q = b[y]
+        if p < q:
+            x += 1
+        elif p == q:
+            y += 1
+            if y == Y:
+                return (a, new)
+        else:
+            break
+    out = a[:x]
+    if x < X:
+        p = a[x]
+        q = b[y]
+        while True:
+            if p < q:
+                out.append(p)
+                x += 1
+                if x == X: break
+                p = a[x]
+            elif p > q:
+                out.append(q)
+                new.append(q)
+                y += 1
+                while y < Y and b[y] == q: y += 1
+                if y == Y: break
+                q = b[y]
+            else:
+                y += 1
+                if y == Y: break
+                q = b[y]
+    if x < X:
+        out.extend(a[x:])
+    else:
+        for q in b[y:]:
+            if q != out[-1]:
+                out.append(q)
+                new.append(q)
+    return (out, new)
+
+def item_hash(item):
+    """A 64-bit hash of item that is the same on every computer, unlike
+    hash(), which depends on the platform.  It is computed from repr(item)."""
+    return int(hashlib.md5(repr(item)).hexdigest()[:16], 16)
+
+def set_digest(items, nbuckets):
+    """Summarizes a set by dividing its items into nbuckets buckets by
+    item_hash, and returning a list holding the (count, sum of hashes modulo
+    2**64) of each bucket.  Two sets with equal digests are almost certainly
+    equal, and if they differ, only the items in the buckets whose entries
+    differ need to be exchanged to reconcile them."""
+    counts = [0]*nbuckets
+    sums = [0]*nbuckets
+    for item in items:
+        h = item_hash(item)
+        b = h % nbuckets
+        counts[b] += 1
+        sums[b] = (sums[b] + h) & 0xFFFFFFFFFFFFFFFF
+    return zip(counts, sums)
+
+def digest_diff(a, b):
+    """Returns the list of buckets in which the digests a and b differ"""
+    if len(a) != len(b):
+        return range(max(len(a), len(b)))
+    return [i for i in xrange(len(a)) if (a[i][0] != b[i][0]) or (a[i][1] != b[i][1])]
+
+def bucket_items(items, buckets, nbuckets):
+    """Returns a list of the items that fall in the given buckets"""
+    buckets = set(buckets)
+    return [item for item in items if (item_hash(item) % nbuckets) in buckets]
+
+def new_items(before, after):
+    """Returns the items of after that are not in before, in the order of
+    after.  The items need not be hashable."""
+    try:
+        old = set(before)
+    except TypeError:
+        old = before
+    return [item for item in after if item not in old]
+
 def kill_dupes(a): #assumes a is sorted
     """Internal helper function for removing duplicates in a sorted list"""
     prev = a[0]
@@ -99,56 +211,176 @@ class Comparable:
     def __cmp__(self, other):
         return self._cmp(self.item, other)
 
-class ListSet:
+class ListSet(object):
     """ListSet is a sorted set for comparable items.  It is inspired by the
-    Java Standard Library's TreeSet.  However, it is implemented by a sorted
-    list.  This implementation is much slower than a balanced binary tree, but
-    has the distinct advantage that I can actually implement it.
+    Java Standard Library's TreeSet.  However, it is implemented by a blocked
+    sorted list: a list of sorted blocks, each holding between LOAD/2 and
+    2*LOAD items, together with the maximum of each block and a Fenwick tree
+    of the block lengths.  add, __contains__, position and integer indexing
+    therefore cost O(log n) plus a small insertion into one block, and
+    iteration is as fast as iterating over a list.
     
     The methods of ListSet are all drawn directly from Python's set API,
-    Python's list API, and Java's SortedSet API.
+    Python's list API, and Java's SortedSet API.  Whole-set operations work on
+    the flattened, sorted contents, which are also available as self._list.
     """
+    LOAD = 512
+    
     def __init__(self, seq=[]):
         L = list(seq)
         if len(L) > 1:
             L.sort()
             L = kill_dupes(L)
-        self._list = L
+        self._set_list(L)
+    
+    def _set_list(self, L):
+        """Replace the contents by the sorted, duplicate-free list L"""
+        n = ListSet.LOAD
+        self._blocks = [L[i:i+n] for i in xrange(0, len(L), n)]
+        self._maxes = [b[-1] for b in self._blocks]
+        self._len = len(L)
+        self._tree = None
+    
+    def _get_list(self):
+        """Returns the contents as a new sorted list"""
+        if len(self._blocks) == 1:
+            return list(self._blocks[0])
+        return list(itertools.chain.from_iterable(self._blocks))
+    
+    _list = property(_get_list, _set_list)
+    
+    def _empty(self):
+        """Returns a new, empty set of the same kind"""
+        return ListSet()
+    
+    def _build_tree(self):
+        # 1-indexed Fenwick tree: self._tree[i] is the total length of the
+        # blocks i-(i&-i) .. i-1
+        tree = [0]
+        tree.extend([len(b) for b in self._blocks])
+        n = len(self._blocks)
+        for i in xrange(1, n+1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+    
+    def _tree_add(self, b, d):
+        tree = self._tree
+        if tree is None:
+            return #it will be rebuilt when next needed
+        i = b + 1
+        n = len(tree)
+        while i < n:
+            tree[i] += d
+            i += i & -i
+    
+    def _offset(self, b):
+        """The number of items in the blocks before block b"""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        total = 0
+        while b > 0:
+            total += tree[b]
+            b -= b & -b
+        return total
+    
+    def _locate(self, pos):
+        """Returns (b, i) such that item number pos is self._blocks[b][i]"""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        n = len(tree) - 1
+        b = 0
+        step = 1
+        while step*2 <= n:
+            step *= 2
+        while step > 0:
+            if b + step <= n and tree[b + step] <= pos:
+                b += step
+                pos -= tree[b]
+            step //= 2
+        return (b, pos)
+    
+    def _remove_at(self, b, i):
+        blk = self._blocks[b]
+        del blk[i]
+        self._len -= 1
+        if len(blk) == 0:
+            del self._blocks[b]
+            del self._maxes[b]
+            self._tree = None
+        else:
+            self._maxes[b] = blk[-1]
+            self._tree_add(b, -1)
+            if (len(blk) < ListSet.LOAD // 2) and (len(self._blocks) > 1):
+                self._join(b)
+    
+    def _join(self, b):
+        """Merge block b with a neighbor"""
+        if b == len(self._blocks) - 1:
+            b -= 1
+        self._blocks[b] = self._blocks[b] + self._blocks[b+1]
+        del self._blocks[b+1]
+        del self._maxes[b]
+        self._tree = None
+        if len(self._blocks[b]) > 2*ListSet.LOAD:
+            self._split(b)
+    
+    def _split(self, b):
+        blk = self._blocks[b]
+        n = len(blk) // 2
+        self._blocks[b:b+1] = [blk[:n], blk[n:]]
+        self._maxes.insert(b, blk[n-1])
+        self._tree = None
+    
+    def _range(self, a, b):
+        """Returns a list of the items at positions a through b-1"""
+        if a >= b:
+            return []
+        (x, i) = self._locate(a)
+        L = []
+        n = b - a
+        while len(L) < n:
+            blk = self._blocks[x]
+            L.extend(blk[i:i + n - len(L)])
+            x += 1
+            i = 0
+        return L
 
     def __and__(self, someset):
         if someset.__class__ == self.__class__:
             L = merge_and(self._list, someset._list)
         else:
             L = []
-            for x in self._list:
+            for x in self:
                 if x in someset:
                     L.append(x)
-        a = ListSet()
+        a = self._empty()
         a._list = L
         return a
     
     def __contains__(self, item):
-        if len(self._list) == 0:
-            return False
-        if self._list[0] <= item <= self._list[-1]:
-            a = bisect.bisect_left(self._list, item)
-            return item == self._list[a]
-        else:
+        b = bisect.bisect_left(self._maxes, item)
+        if b == len(self._maxes):
             return False
+        blk = self._blocks[b]
+        return item == blk[bisect.bisect_left(blk, item)]
     
     def __eq__(self, someset):
         if someset.__class__ == self.__class__:
-            return self._list == someset._list
+            return (self._len == someset._len) and (self._list == someset._list)
         else:
             return len(self.symmetric_difference(someset)) == 0
     
     def __ge__(self, someset):
         if someset.__class__ == self.__class__:
-            return len(merge_or(self._list, someset._list)) == len(self._list)
+            return len(merge_or(self._list, someset._list)) == self._len
         else:
             a = len(someset)
             k = 0
-            for i in self._list:
+            for i in self:
                 if i in someset:
                     k += 1
             return k == a
@@ -161,7 +393,7 @@ class ListSet:
             self._list = merge_and(self._list, someset._list)
         else:
             L = []
-            for i in self._list:
+            for i in self:
                 if i in someset:
                     L.append(i)
             self._list = L
@@ -179,14 +411,14 @@ class ListSet:
             self._list = merge_sub(self._list, someset._list)
         else:
             L = []
-            for i in self._list:
+            for i in self:
                 if i not in someset:
                     L.append(i)
             self._list = L
         return self
     
     def __iter__(self):
-        return self._list.__iter__()
+        return itertools.chain.from_iterable(self._blocks)
     
     def __ixor__(self, someset):
         if someset.__class__ == self.__class__:
@@ -197,9 +429,9 @@ class ListSet:
     
     def __le__(self, someset):
         if someset.__class__ == self.__class__:
-            return len(merge_or(self._list, someset._list)) == len(someset._list)
+            return len(merge_or(self._list, someset._list)) == someset._len
         else:
-            for i in self._list:
+            for i in self:
                 if i not in someset:
                    return False
             return True
@@ -211,10 +443,10 @@ class ListSet:
         return not (self == someset)
     
     def __len__(self):
-        return len(self._list)
+        return self._len
     
     def __or__(self, someset):
-        a = ListSet()
+        a = self._empty()
         if someset.__class__ == self.__class__:
             a._list = merge_or(self._list, someset._list)
         else:
@@ -231,20 +463,21 @@ class ListSet:
     
     def __rsub__(self, someset):
         if someset.__class__ == self.__class__:
-            a = ListSet()
+            a = self._empty()
             a._list = merge_sub(someset._list, self._list)
         else:
-            a = ListSet(someset)
+            a = self._empty()
+            a.update(someset)
             a._list = merge_sub(a._list, self._list)
         return a
     
     def __sub__(self, someset):
-        a = ListSet()
+        a = self._empty()
         if someset.__class__ == self.__class__:
             a._list = merge_sub(self._list, someset._list)
         else:
             L = []
-            for i in self._list:
+            for i in self:
                 if i not in someset:
                     L.append(i)
             a._list = L
@@ -252,7 +485,7 @@ class ListSet:
     
     def __xor__(self, someset):
         if someset.__class__ == self.__class__:
-            a = ListSet()
+            a = self._empty()
             a._list = merge_xor(self._list, someset._list)
         else:
             a = self.symmetric_difference(someset)
@@ -261,25 +494,86 @@ class ListSet:
     __rxor__ = __xor__
     
     def add(self, item):
-        if (len(self._list) > 0) and (item <= self._list[-1]):
-            a = bisect.bisect_left(self._list, item)
-            if self._list[a] != item:
-                self._list.insert(a, item)
+        if self._len == 0:
+            self._set_list([item])
+            return
+        b = bisect.bisect_left(self._maxes, item)
+        if b == len(self._maxes):
+            b -= 1
+            blk = self._blocks[b]
+            blk.append(item)
+            self._maxes[b] = item
         else:
-            self._list.append(item)
+            blk = self._blocks[b]
+            i = bisect.bisect_left(blk, item)
+            if blk[i] == item:
+                return
+            blk.insert(i, item)
+        self._len += 1
+        self._tree_add(b, 1)
+        if len(blk) > 2*ListSet.LOAD:
+            self._split(b)
+    
+    def absorb(self, seq):
+        """Add every item of seq, which need not be sorted, and return a sorted
+        list of the items that were not already present.  A batch that is
+        small relative to the set is inserted item by item.  A large one is
+        sorted once and added by a single pass of merge_new, which also finds
+        the new items; if nothing is new, the set is not rebuilt."""
+        L = list(seq)
+        if len(L) == 0:
+            return L
+        L.sort()
+        if len(L)*8 < self._len:
+            new = []
+            for item in L:
+                if (item not in self) and ((len(new) == 0) or (item != new[-1])):
+                    new.append(item)
+            for item in new:
+                self.add(item)
+            return new
+        return self._absorb_sorted(L)
+    
+    def _absorb_sorted(self, L):
+        (union, new) = merge_new(self._list, L)
+        if len(new) > 0:
+            self._list = union
+        return new
+    
+    def absorb_columns(self, cols):
+        """Like absorb, for records given as one sequence per field, like
+        those returned by columns().  The new items are returned as a set of
+        the same kind."""
+        if len(cols) == 1:
+            L = list(cols[0])
+        else:
+            L = zip(*cols)
+        a = self._empty()
+        a._list = self.absorb(L)
+        return a
+    
+    def columns(self, fields):
+        """Returns the items, which must be records of the array typecodes in
+        fields as for PackedListSet, as one array.array per field"""
+        L = self._list
+        if len(fields) == 1:
+            return [array.array(fields, L)]
+        return [array.array(f, [r[k] for r in L]) for (k, f) in enumerate(fields)]
     
     def clear(self):
-        self._list = []
+        self._set_list([])
     
     def copy(self):
-        a = ListSet()
-        a._list = list(self._list) #shallow copy
+        a = self._empty()
+        a._blocks = [list(b) for b in self._blocks] #shallow copy
+        a._maxes = list(self._maxes)
+        a._len = self._len
         return a
     
     def difference(self, iterable):
         L = list(iterable)
         L.sort()
-        a = ListSet()
+        a = self._empty()
         a._list = merge_sub(self._list, kill_dupes(L))
         return a
     
@@ -289,16 +583,19 @@ class ListSet:
         self._list = merge_sub(self._list, kill_dupes(L))
     
     def discard(self, item):
-        if (len(self._list) > 0) and (item <= self._list[-1]):
-            a = bisect.bisect_left(self._list, item)
-            if self._list[a] == item:
-                self._list.remove(a)
+        b = bisect.bisect_left(self._maxes, item)
+        if b < len(self._maxes):
+            blk = self._blocks[b]
+            i = bisect.bisect_left(blk, item)
+            if blk[i] == item:
+                self._remove_at(b, i)
     
     def intersection(self, iterable):
         L = list(iterable)
         L.sort()
-        a = ListSet()
+        a = self._empty()
         a._list = merge_and(self._list, kill_dupes(L))
+        return a
     
     def intersection_update(self, iterable):
         L = list(iterable)
@@ -309,7 +606,7 @@ class ListSet:
         L = list(iterable)
         L.sort()
         m = merge_or(self._list, kill_dupes(L))
-        return len(m) == len(self._list)
+        return len(m) == self._len
     
     def issubset(self, iterable):
         L = list(iterable)
@@ -319,23 +616,28 @@ class ListSet:
         return len(m) == len(L)
     
     def pop(self, i = None):
-        if i == None:
-            return self._list.pop()
-        else:
-            return self._list.pop(i)
+        if self._len == 0:
+            raise IndexError("pop from empty ListSet")
+        if i is None:
+            i = self._len - 1
+        elif i < 0:
+            i += self._len
+        if not (0 <= i < self._len):
+            raise IndexError("ListSet index out of range")
+        (b, j) = self._locate(i)
+        item = self._blocks[b][j]
+        self._remove_at(b, j)
+        return item
         
     def remove(self, item):
-        if (len(self._list) > 0) and (item <= self._list[-1]):
-            a = bisect.bisect_left(self._list, item)
-            if self._list[a] == item:
-                self._list.remove(a)
-                return
-        raise KeyError("Item is not in the set")
+        if item not in self:
+            raise KeyError("Item is not in the set")
+        self.discard(item)
     
     def symmetric_difference(self, iterable):
         L = list(iterable)
         L.sort()
-        a = ListSet()
+        a = self._empty()
         a._list = merge_xor(self._list, kill_dupes(L))
         return a
     
@@ -347,8 +649,9 @@ class ListSet:
     def union(self, iterable):
         L = list(iterable)
         L.sort()
-        a = ListSet()
+        a = self._empty()
         a._list = merge_or(self._list, kill_dupes(L))
+        return a
     
     def update(self, iterable):
         L = list(iterable)
@@ -356,46 +659,722 @@ class ListSet:
         self._list = merge_or(self._list, kill_dupes(L))
     
     def __getitem__(self, key):
-        if type(key) == int:
-            return self._list.__getitem__(key)
-        elif type(key) == slice:
-            a = ListSet()
-            L = self._list.__getitem__(key)
-            if key.step < 0:
-                L.reverse()
+        if isinstance(key, slice):
+            a = self._empty()
+            (start, stop, step) = key.indices(self._len)
+            if step == 1:
+                L = self._range(start, stop)
+            else:
+                L = self._list.__getitem__(key)
+                if step < 0:
+                    L.reverse()
             a._list = L
             return a
+        else:
+            if key < 0:
+                key += self._len
+            if not (0 <= key < self._len):
+                raise IndexError("ListSet index out of range")
+            (b, i) = self._locate(key)
+            return self._blocks[b][i]
     
     def __delitem__(self, key):
-        self._list.__delitem__(key)
+        if isinstance(key, slice):
+            (start, stop, step) = key.indices(self._len)
+            if (start == 0) and (step == 1):
+                #Fast path for dropping a prefix
+                while (stop > 0) and (len(self._blocks) > 0) and (len(self._blocks[0]) <= stop):
+                    stop -= len(self._blocks[0])
+                    self._len -= len(self._blocks[0])
+                    del self._blocks[0]
+                    del self._maxes[0]
+                if stop > 0:
+                    del self._blocks[0][:stop]
+                    self._len -= stop
+                self._tree = None
+            else:
+                L = self._list
+                del L[key]
+                self._list = L
+        else:
+            if key < 0:
+                key += self._len
+            if not (0 <= key < self._len):
+                raise IndexError("ListSet index out of range")
+            (b, i) = self._locate(key)
+            self._remove_at(b, i)
     
     def index(self, x, i=0, j=-1):
-        if (len(self._list) > 0) and (x <= self._list[-1]):
-            a = bisect.bisect_left(self._list, x, i, j)
-            if self._list[a] == x:
-                return a
+        a = self.position(x, i, j)
+        if (a < self._len) and (self[a] == x):
+            return a
         raise ValueError("Item not found")
     
     def position(self, x, i=0, j=-1):
-        return bisect.bisect_left(self._list, x, i, j)
+        if j == -1:
+            j = self._len
+        b = bisect.bisect_left(self._maxes, x)
+        if b == len(self._maxes):
+            a = self._len
+        else:
+            a = self._offset(b) + bisect.bisect_left(self._blocks[b], x)
+        return max(i, min(j, a))
     
     def subset(self, x, y):
-        a = bisect.bisect_left(self._list, x)
-        b = bisect.bisect_left(self._list, y)
-        s = ListSet()
-        s._list = self._list[a:b]
+        a = self.position(x)
+        b = self.position(y)
+        s = self._empty()
+        s._list = self._range(a, b)
         return s
     
     def first(self):
-        return self._list[0]
+        return self._blocks[0][0]
     
     def last(self):
-        return self._list[-1]
+        return self._blocks[-1][-1]
     
     def headset(self, x):
-        a = bisect.bisect_left(self._list, x, i, j)
+        a = self.position(x)
         return self[:a]
     
     def tailset(self, x):
-        a = bisect.bisect_left(self._list, x, i, j)
+        a = self.position(x)
         return self[a:]
+
+class _Records(object):
+    """A read-only sequence view of parallel columns as tuples, so that
+    bisect can search them"""
+    def __init__(self, cols):
+        self._cols = cols
+    
+    def __len__(self):
+        return len(self._cols[0])
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return zip(*[c[i] for c in self._cols])
+        return tuple([c[i] for c in self._cols])
+
+def _numpy_keys(cols):
+    """Returns records given as NumPy columns as one array that searchsorted
+    can search: the column itself, or a structured array of all of them,
+    which compares as the records do"""
+    if len(cols) == 1:
+        return cols[0]
+    keys = numpy.empty(len(cols[0]), [('f%d' % k, c.dtype) for (k, c) in enumerate(cols)])
+    for (k, c) in enumerate(cols):
+        keys['f%d' % k] = c
+    return keys
+
+def _numpy_merge(a, b, l, g, e):
+    """Internal helper function like merge(), but for sets of records stored
+    as lists of NumPy columns, using vectorized operations.  Both sets must be
+    sorted, duplicate-free and nonempty.  Nothing is sorted: the items of b
+    are located in a by binary search, and the kept items of each are
+    scattered into place."""
+    ka = _numpy_keys(a)
+    kb = _numpy_keys(b)
+    na = len(ka)
+    pb = numpy.searchsorted(ka, kb) #position in a of each item of b
+    b_in_a = numpy.zeros(len(kb), bool)
+    inside = numpy.flatnonzero(pb < na)
+    b_in_a[inside] = (ka[pb[inside]] == kb[inside])
+    a_in_b = numpy.zeros(na, bool)
+    a_in_b[pb[b_in_a]] = True
+    keep_a = numpy.zeros(na, bool)
+    if l:
+        keep_a |= ~a_in_b
+    if e:
+        keep_a |= a_in_b
+    if g:
+        keep_b = ~b_in_a
+    else:
+        keep_b = numpy.zeros(len(kb), bool)
+    #the kept items of b are not in a, so each goes before the kept items of
+    #a from its position on
+    before = numpy.concatenate(([0], numpy.cumsum(keep_a)))
+    nb = int(keep_b.sum())
+    where_b = before[pb[keep_b]] + numpy.arange(nb)
+    from_a = numpy.ones(int(before[-1]) + nb, bool)
+    from_a[where_b] = False
+    out = []
+    for (x, y) in zip(a, b):
+        c = numpy.empty(len(from_a), x.dtype)
+        c[from_a] = x[keep_a]
+        c[where_b] = y[keep_b]
+        out.append(c)
+    return out
+
+class PackedListSet(ListSet):
+    """PackedListSet is a ListSet of fixed-width numeric records, stored in
+    one array.array column per field instead of as boxed Python objects.
+    fields gives the array typecode of each field: 'd' makes a set of floats
+    (8 bytes each), and 'di' a set of (float, int) tuples (12 bytes each).
+    
+    If NumPy is available, the set operations (union, intersection,
+    difference and symmetric difference) are computed by vectorized
+    operations on the columns.  Otherwise they fall back to merge() on the
+    unpacked records.  Items appended in order are added in amortized
+    constant time, but any other addition shifts the columns, at O(n) cost,
+    so a PackedListSet only suits large sets whose items mostly arrive in
+    order; ListSet remains the better general choice.
+    """
+    INSERTS = 16 #largest batch that absorb inserts item by item
+    
+    def __init__(self, fields, seq=[]):
+        self._fields = fields
+        ListSet.__init__(self, seq)
+    
+    def _set_list(self, L):
+        self._cols = self._pack(L)
+    
+    def _get_list(self):
+        return list(self)
+    
+    _list = property(_get_list, _set_list)
+    
+    _len = property(lambda self: len(self._cols[0]))
+    
+    def _pack(self, L):
+        """Returns the sorted, duplicate-free list of records L as columns"""
+        if len(self._fields) == 1:
+            return [array.array(self._fields, L)]
+        return [array.array(f, [r[k] for r in L]) for (k, f) in enumerate(self._fields)]
+    
+    def _records(self):
+        if len(self._cols) == 1:
+            return self._cols[0]
+        return _Records(self._cols)
+    
+    def _empty(self):
+        return PackedListSet(self._fields)
+    
+    def _new(self, cols):
+        a = self._empty()
+        a._cols = cols
+        return a
+    
+    def _columns_of(self, someset):
+        """Returns the contents of someset as columns like self._cols"""
+        if isinstance(someset, PackedListSet) and (someset._fields == self._fields):
+            return someset._cols
+        L = list(someset)
+        if len(L) > 1:
+            L.sort()
+            L = kill_dupes(L)
+        return self._pack(L)
+    
+    def _merge(self, a, b, l, g, e):
+        """Like merge(), for two sets of records given as columns"""
+        if len(a[0]) == 0:
+            if g:
+                return [c[:] for c in b]
+            return [c[:0] for c in a]
+        if len(b[0]) == 0:
+            if l:
+                return [c[:] for c in a]
+            return [c[:0] for c in a]
+        if numpy is not None:
+            out = _numpy_merge([numpy.frombuffer(c, c.typecode) for c in a],
+                               [numpy.frombuffer(c, c.typecode) for c in b],
+                               l, g, e)
+            return [array.array(c.typecode, x.tostring()) for (c, x) in zip(a, out)]
+        if len(a) == 1:
+            return self._pack(merge(a[0], b[0], l, g, e))
+        return self._pack(merge(_Records(a), _Records(b), l, g, e))
+    
+    def __and__(self, someset):
+        return self._new(self._merge(self._cols, self._columns_of(someset), False, False, True))
+    
+    __rand__ = __and__
+    
+    def __contains__(self, item):
+        R = self._records()
+        a = bisect.bisect_left(R, item)
+        return (a < len(R)) and (R[a] == item)
+    
+    def __eq__(self, someset):
+        if isinstance(someset, PackedListSet) and (someset._fields == self._fields):
+            return self._cols == someset._cols
+        return ListSet.__eq__(self, someset)
+    
+    def __iand__(self, someset):
+        self._cols = self._merge(self._cols, self._columns_of(someset), False, False, True)
+        return self
+    
+    def __ior__(self, someset):
+        self._cols = self._merge(self._cols, self._columns_of(someset), True, True, True)
+        return self
+    
+    def __isub__(self, someset):
+        self._cols = self._merge(self._cols, self._columns_of(someset), True, False, False)
+        return self
+    
+    def __iter__(self):
+        if len(self._cols) == 1:
+            return iter(self._cols[0])
+        return itertools.izip(*self._cols)
+    
+    def __ixor__(self, someset):
+        self._cols = self._merge(self._cols, self._columns_of(someset), True, True, False)
+        return self
+    
+    def __len__(self):
+        return len(self._cols[0])
+    
+    def __or__(self, someset):
+        return self._new(self._merge(self._cols, self._columns_of(someset), True, True, True))
+    
+    __ror__ = __or__
+    
+    def __repr__(self):
+        return "PackedListSet(" + repr(self._fields) + ", " + repr(self._list) + ")"
+    
+    def __rsub__(self, someset):
+        return self._new(self._merge(self._cols, self._columns_of(someset), False, True, False))
+    
+    def __sub__(self, someset):
+        return self._new(self._merge(self._cols, self._columns_of(someset), True, False, False))
+    
+    def __xor__(self, someset):
+        return self._new(self._merge(self._cols, self._columns_of(someset), True, True, False))
+    
+    __rxor__ = __xor__
+    
+    def add(self, item):
+        n = len(self)
+        if (n == 0) or (item > self[n-1]):
+            if len(self._cols) == 1:
+                self._cols[0].append(item)
+            else:
+                for (c, v) in zip(self._cols, item):
+                    c.append(v)
+            return
+        a = bisect.bisect_left(self._records(), item)
+        if self[a] != item:
+            if len(self._cols) == 1:
+                self._cols[0].insert(a, item)
+            else:
+                for (c, v) in zip(self._cols, item):
+                    c.insert(a, v)
+    
+    def absorb(self, seq):
+        """Like ListSet.absorb, but since every insertion shifts the columns,
+        only batches of up to INSERTS items are inserted item by item; larger
+        ones are merged in one pass, unless they all come after the last
+        item, as when a peer sends events in order."""
+        L = list(seq)
+        if len(L) == 0:
+            return L
+        L.sort()
+        n = len(self)
+        if (n > 0) and (L[0] > self[n-1]):
+            L = kill_dupes(L)
+            for (c, x) in zip(self._cols, self._pack(L)):
+                c.extend(x)
+            return L
+        if len(L) <= PackedListSet.INSERTS:
+            new = []
+            for item in L:
+                if (item not in self) and ((len(new) == 0) or (item != new[-1])):
+                    new.append(item)
+            for item in new:
+                self.add(item)
+            return new
+        return self._absorb_sorted(L)
+    
+    def _absorb_sorted(self, L):
+        cols = self._pack(kill_dupes(L))
+        new = self._merge(self._cols, cols, False, True, False)
+        if len(new[0]) > 0:
+            self._cols = self._merge(self._cols, new, True, True, True)
+        return list(self._new(new))
+    
+    def absorb_columns(self, cols):
+        """Like ListSet.absorb_columns, but the columns must be sorted and
+        free of duplicates.  The new items are returned as a PackedListSet,
+        and are never unpacked."""
+        cols = [array.array(f, c) for (f, c) in zip(self._fields, cols)]
+        if len(self) == 0:
+            self._cols = cols
+            return self._new([c[:] for c in cols])
+        new = self._merge(self._cols, cols, False, True, False)
+        if len(new[0]) > 0:
+            self._cols = self._merge(self._cols, new, True, True, True)
+        return self._new(new)
+    
+    def copy(self):
+        return self._new([c[:] for c in self._cols])
+    
+    def columns(self, fields=None):
+        """Returns a copy of each column, as an array.array"""
+        return [c[:] for c in self._cols]
+    
+    def discard(self, item):
+        a = self.position(item)
+        if (a < len(self)) and (self[a] == item):
+            del self[a]
+    
+    def pop(self, i = None):
+        if i is None:
+            i = -1
+        item = self[i]
+        del self[i]
+        return item
+    
+    def _range(self, a, b):
+        return list(self._new([c[a:b] for c in self._cols]))
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            cols = [c[key] for c in self._cols]
+            if (key.step is not None) and (key.step < 0):
+                for c in cols:
+                    c.reverse()
+            return self._new(cols)
+        if len(self._cols) == 1:
+            return self._cols[0][key]
+        return tuple([c[key] for c in self._cols])
+    
+    def __delitem__(self, key):
+        for c in self._cols:
+            del c[key]
+    
+    def position(self, x, i=0, j=-1):
+        if j == -1:
+            j = len(self)
+        return bisect.bisect_left(self._records(), x, i, j)
+    
+    def first(self):
+        return self[0]
+    
+    def last(self):
+        return self[-1]
+
+class Membership:
+    """A Membership tracks the unique names of the members of a tube, so that
+    only one of the members already present answers each newcomer: the one
+    that has been present longest, which has long finished its own sync.
+    
+    Each member remembers the members that were already present when it
+    joined, as listed by the first watch_participants callback.  It answers
+    newcomers once all of them have left.  Members that joined at the same
+    moment may both answer, which costs a little traffic, but there is
+    always at least one member that answers."""
+    def __init__(self):
+        self._members = set()
+        self._elders = None #members present when we joined, until the first callback
+    
+    def is_responder(self):
+        """Whether this member should answer newcomers.  Until the first
+        callback, membership is not known, so it answers to be safe."""
+        return (self._elders is None) or (len(self._elders) == 0)
+    
+    def update(self, me, added, removed):
+        """Process a watch_participants callback, with added and removed
+        given as lists of (handle, unique name).  Returns the newcomers that
+        me should answer.  The first callback lists the members that were
+        present before we joined, so nobody is answered then."""
+        for (handle, name) in removed:
+            self._members.discard(name)
+            if self._elders is not None:
+                self._elders.discard(name)
+        newcomers = [name for (handle, name) in added if (name != me) and (name not in self._members)]
+        self._members.update(newcomers)
+        if self._elders is None:
+            self._elders = set(newcomers)
+            return []
+        if self.is_responder():
+            return newcomers
+        return []
+
+class CheckpointedFold:
+    """A CheckpointedFold keeps the result of folding a function step(q,
+    item) over the items of a sorted, indexable set, in order, starting from
+    an initial state.  The folded state is kept after the last item and, as a
+    checkpoint, before every interval items, so that when only the items from
+    some position on have changed, the fold resumes from the nearest
+    checkpoint at or before that position instead of from the start.  Items
+    appended in order cost one step each."""
+    def __init__(self, items, step, initial, interval=32):
+        self._items = items
+        self._step = step
+        self._interval = interval
+        self._checkpoints = [initial] #folded state before every interval items
+        self._tail = initial #folded state after the first self._folded items
+        self._folded = 0
+    
+    def reset(self, initial):
+        """Fold all the items again, from a new initial state, and return the
+        result"""
+        self._checkpoints = [initial]
+        self._tail = initial
+        self._folded = 0
+        return self.update(0)
+    
+    def update(self, start=0):
+        """Bring the fold up to date, assuming that only the items at
+        positions start and later have changed, and return the result"""
+        N = self._interval
+        if 0 < self._folded <= start:
+            start = self._folded
+            q = self._tail
+        else:
+            j = start // N
+            del self._checkpoints[j+1:]
+            start = j*N
+            q = self._checkpoints[j]
+        for i in xrange(start, len(self._items)):
+            if i % N == 0 and i // N == len(self._checkpoints):
+                self._checkpoints.append(q)
+            q = self._step(q, self._items[i])
+        self._tail = q
+        self._folded = len(self._items)
+        return q
+    
+    def get_state(self):
+        """The result of folding all the items, as of the last update"""
+        return self._tail
+    
+    def state_at(self, n):
+        """The result of folding the first n items, which must not have
+        changed since the last update"""
+        N = self._interval
+        j = min(n // N, len(self._checkpoints) - 1)
+        q = self._checkpoints[j]
+        for i in xrange(j*N, n):
+            q = self._step(q, self._items[i])
+        return q
+
+CLOCK_MONOTONIC = 1 #clock ids from <time.h> on Linux
+CLOCK_BOOTTIME = 7
+
+def _monotonic_counter():
+    """Returns a function giving seconds since an arbitrary point, from a
+    counter that is not affected by changes to the wall clock.  The counter
+    keeps running while the machine is suspended where the platform allows
+    it (CLOCK_BOOTTIME).  If no such counter is available, this falls back on
+    time.time."""
+    if hasattr(time, 'clock_gettime'):
+        for clock_id in (getattr(time, 'CLOCK_BOOTTIME', None), time.CLOCK_MONOTONIC):
+            if clock_id is None:
+                continue
+            try:
+                time.clock_gettime(clock_id)
+                return functools.partial(time.clock_gettime, clock_id)
+            except (OSError, ValueError):
+                pass
+    try:
+        import ctypes
+        import ctypes.util
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+        lib = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = lib.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        clock_gettime.restype = ctypes.c_int
+        for clock_id in (CLOCK_BOOTTIME, CLOCK_MONOTONIC):
+            if clock_gettime(clock_id, ctypes.byref(timespec())) == 0:
+                def counter(clock_id=clock_id):
+                    t = timespec()
+                    clock_gettime(clock_id, ctypes.byref(t))
+                    return t.tv_sec + t.tv_nsec*1e-9
+                return counter
+    except (ImportError, OSError, AttributeError, TypeError):
+        pass
+    return time.time
+
+class MonotonicClock:
+    """A clock giving epoch time that never jumps.  The wall clock is read
+    once, at construction, and all later times are derived from it and a
+    monotonic counter, so that changes to the wall clock (by NTP, or by hand)
+    do not disturb running timers or the order of events."""
+    def __init__(self):
+        self._counter = _monotonic_counter()
+        self._epoch = time.time() - self._counter()
+    
+    def time(self):
+        return self._epoch + self._counter()
+
+class FakeClock:
+    """A clock that only moves when told to, for tests and benchmarks"""
+    def __init__(self, start=0.0):
+        self._now = start
+    
+    def time(self):
+        return self._now
+    
+    def advance(self, dt):
+        self._now += dt
+    
+    def set_time(self, t):
+        self._now = t
+
+_clock = MonotonicClock()
+
+def get_clock():
+    """Returns the clock used by clock_time()"""
+    return _clock
+
+def set_clock(clock):
+    """Replaces the clock used by clock_time() with clock, any object with a
+    time() method (e.g. a FakeClock)"""
+    global _clock
+    _clock = clock
+
+def clock_time():
+    """The local time, in seconds since the epoch, according to the current
+    clock.  Use this instead of time.time() for all timestamps."""
+    return _clock.time()
+
+class ClockEstimator:
+    """ClockEstimator estimates the offset between local time (clock_time())
+    and a group time, in the manner of NTP, from timed exchanges with other
+    members.  It does no communication itself; see dobject.TimeHandler.
+    
+    Each exchange yields a sample: the offset, assuming that both transfer
+    delays were equal, and an error bound of half the round-trip time, plus
+    the error of the member that answered.  The offset is taken from the
+    sample with the smallest error, where the error of each sample grows by
+    MAX_DRIFT for every second since it was taken.  Only the SAMPLES most
+    recent samples are kept.
+    
+    Clocks drift, so the offset is not constant.  Once the samples span at
+    least DRIFT_SPAN seconds, the drift is estimated by a regression of the
+    offset against local time over the samples, weighted by the inverse
+    square of their errors, and the offset is extrapolated from the best
+    sample along it.
+    
+    Group time never jumps.  Once the offset is known, each new estimate is
+    approached gradually, by running the group clock at most SLEW_RATE faster
+    or slower than the local clock, so time() never goes backwards.  Only the
+    first estimate, and set_offset(), take effect at once.
+    """
+    MAX_DRIFT = 1e-4 #assumed bound on the drift between two clocks, in s/s
+    SAMPLES = 32 #number of recent samples kept
+    DRIFT_SPAN = 300.0 #seconds the samples must span to estimate the drift
+    SLEW_RATE = 0.05 #largest rate, in s/s, at which the offset is corrected
+    
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self._reference = False
+        self._know_offset = False
+        self._lock = threading.Lock()
+        
+        self._samples = [] #(offset, error, local time, sender) of recent exchanges
+        self._best = None #the sample that self.offset was taken from
+        self._drift = 0.0 #estimated rate of change of the offset, in s/s
+        self._target = (offset, 0.0, 0.0) #(offset, at local time, drift) being approached
+        self._slew = None #(local time, offset) from which the target is approached
+        self._last_time = float('-inf') #the last value returned by time()
+    
+    def set_reference(self, reference):
+        """Declare whether this member's clock defines group time, so that
+        its offset has no error"""
+        self._reference = reference
+    
+    def is_known(self):
+        """Whether any offset has been estimated or set"""
+        return self._know_offset
+    
+    def time(self):
+        """Get the group time.  This never decreases."""
+        self._lock.acquire()
+        t = clock_time()
+        g = max(t + self._applied(t), self._last_time)
+        self._last_time = g
+        self._lock.release()
+        return g
+    
+    def get_offset(self):
+        """Get the difference between local time and group time"""
+        return self._applied(clock_time())
+    
+    def get_drift(self):
+        """Get the estimated rate of change of the offset, in s/s"""
+        return self._drift
+    
+    def get_error(self):
+        """Get a bound on the error of get_offset(), in seconds.  This is inf
+        if the offset is not known."""
+        self._lock.acquire()
+        error = self._aged_error(self._best, clock_time())
+        self._lock.release()
+        return error
+    
+    def get_sender(self):
+        """The member whose sample the offset was taken from, or None"""
+        best = self._best
+        if best is None:
+            return None
+        return best[3]
+    
+    def set_offset(self, offset, error=0.0):
+        """Set the difference between local time and group time, and assert that
+        this is correct, to within error seconds"""
+        self._lock.acquire()
+        self._samples = [(offset, error, clock_time(), None)]
+        self._know_offset = False #take effect at once, without slewing
+        self._slew = None
+        self._choose()
+        self._lock.release()
+    
+    def add_sample(self, ask, start, finish, receive, error=0.0, sender=None):
+        """Add the sample of an exchange: the request was sent at local time
+        ask, received at group time start, answered at group time finish, and
+        the answer received at local time receive.  error is the answering
+        member's own error.  Returns the (offset, error) of the sample."""
+        offset = ((start + finish)/2) - ((ask + receive)/2)
+        error += ((receive - ask) - (finish - start))/2
+        self._lock.acquire()
+        self._samples.append((offset, error, receive, sender))
+        del self._samples[:-ClockEstimator.SAMPLES]
+        self._choose()
+        self._lock.release()
+        return (offset, error)
+    
+    def _applied(self, t):
+        """The offset in effect at local time t: the target offset, or as
+        close to it as slewing from self._slew can get by then."""
+        (offset, t0, drift) = self._target
+        target = offset + drift*(t - t0)
+        slew = self._slew
+        if slew is None:
+            return target
+        reach = ClockEstimator.SLEW_RATE*max(0.0, t - slew[0])
+        return min(max(target, slew[1] - reach), slew[1] + reach)
+    
+    def _aged_error(self, sample, now):
+        if sample is None:
+            return float('inf')
+        if self._reference:
+            return 0.0
+        return sample[1] + ClockEstimator.MAX_DRIFT*(now - sample[2])
+    
+    def _choose(self):
+        """Take the offset from the best sample.  The caller must hold
+        self._lock."""
+        now = clock_time()
+        best = min(self._samples, key=lambda s: self._aged_error(s, now))
+        if best[1] < float('inf'):
+            if self._know_offset:
+                self._slew = (now, self._applied(now))
+            self._best = best
+            self._drift = self._estimate_drift()
+            self._target = (best[0], best[2], self._drift)
+            self.offset = best[0] + self._drift*(now - best[2])
+            self._know_offset = True
+    
+    def _estimate_drift(self):
+        """Weighted least-squares slope of offset against local time"""
+        points = [(s[2], s[0], 1.0/max(s[1], 1e-3)**2) for s in self._samples if s[1] < float('inf')]
+        if (len(points) < 2) or (max(p[0] for p in points) - min(p[0] for p in points) < ClockEstimator.DRIFT_SPAN):
+            return 0.0
+        w = sum(p[2] for p in points)
+        tm = sum(p[0]*p[2] for p in points)/w
+        om = sum(p[1]*p[2] for p in points)/w
+        num = sum(p[2]*(p[0] - tm)*(p[1] - om) for p in points)
+        den = sum(p[2]*(p[0] - tm)**2 for p in points)
+        if den <= 0:
+            return 0.0
+        return min(max(num/den, -ClockEstimator.MAX_DRIFT), ClockEstimator.MAX_DRIFT)
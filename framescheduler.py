@@ -0,0 +1,135 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import logging
+import threading
+import gobject
+import powerd
+from dobject_helpers import clock_time
+
+class FrameScheduler():
+    """FrameScheduler redraws the time labels of all running watches from a
+    single main loop timeout, so that running watches do not each need a
+    polling thread and their own wakeups.  It also carries state changes from
+    the models to the views: other threads post() a view, and the view's
+    _drain() is called once in the next frame.  Each view's _tick() returns the
+    delay until it next needs redrawing, and the timeout is always set for the
+    earliest such deadline.  Views that are due at nearly the same moment are
+    redrawn in the same frame, and the timeout is removed whenever no watch
+    is running.
+    
+    The timeouts are added to loop, which must offer timeout_add and
+    source_remove like gobject, so that a fake main loop can be used to
+    measure the scheduler without a display."""
+    INTERVAL = 0.07 #seconds between frames for a watch showing hundredths
+    BATTERY_INTERVAL = 0.1 #the same, while running on battery power
+    SLACK = 0.02 #views due within this many seconds are drawn together
+    POWER_CHECK = 30.0 #seconds between checks of the power supply
+    
+    def __init__(self, loop=gobject):
+        self._logger = logging.getLogger('stopwatch.FrameScheduler')
+        self._loop = loop
+        self._due = {} #view -> time (clock_time()) of its next _tick
+        self._posted = set() #views with new state to _drain in the next frame
+        self._coalesced = 0 #posts of views that were already posted
+        self._lock = threading.Lock()
+        self._source = None
+        self._when = None
+        self._power_checked = float("-inf")
+        self.on_battery = False
+    
+    def add(self, view):
+        """Call view._tick() as soon as possible, and then whenever it asks"""
+        self._lock.acquire()
+        self._due[view] = clock_time()
+        self._reschedule(0)
+        self._lock.release()
+    
+    def post(self, view):
+        """Call view._drain() in the next frame.  This never blocks, so model
+        threads are not held up while the main loop is busy."""
+        self._lock.acquire()
+        if view in self._posted:
+            self._coalesced += 1
+        else:
+            self._posted.add(view)
+            self._reschedule(0)
+        self._lock.release()
+    
+    def get_coalesced_count(self):
+        """The number of posts that were merged into an earlier post of the
+        same view, which had not been drained yet"""
+        return self._coalesced
+    
+    def get_pending_depth(self):
+        """The number of views waiting to be drained in the next frame"""
+        return len(self._posted)
+    
+    def remove(self, view):
+        """Stop calling view._tick()"""
+        self._lock.acquire()
+        if view in self._due:
+            del self._due[view]
+        self._lock.release()
+    
+    def forget(self, view):
+        """Stop calling view at all, before it is destroyed"""
+        self._lock.acquire()
+        if view in self._due:
+            del self._due[view]
+        self._posted.discard(view)
+        self._lock.release()
+    
+    def _reschedule(self, delay):
+        #self._lock must be held
+        when = clock_time() + delay
+        if self._source is not None:
+            if self._when <= when:
+                return
+            self._loop.source_remove(self._source)
+        self._when = when
+        self._source = self._loop.timeout_add(max(0, int(delay*1000)), self._frame)
+    
+    def _frame(self):
+        now = clock_time()
+        if now > self._power_checked + FrameScheduler.POWER_CHECK:
+            self.on_battery = powerd.on_battery()
+            self._power_checked = now
+        self._lock.acquire()
+        posted = self._posted
+        self._posted = set()
+        self._lock.release()
+        for v in posted:
+            v._drain()
+        self._lock.acquire()
+        self._source = None
+        due = [v for (v, t) in self._due.items() if t <= now + FrameScheduler.SLACK]
+        self._lock.release()
+        for v in due:
+            delay = v._tick()
+            self._lock.acquire()
+            if v in self._due:
+                self._due[v] = now + delay
+            self._lock.release()
+        self._lock.acquire()
+        if len(self._posted) > 0:
+            self._reschedule(0)
+        elif len(self._due) > 0:
+            self._reschedule(min(self._due.values()) - clock_time())
+        else:
+            self._logger.debug("stopping frames")
+        self._lock.release()
+        return False
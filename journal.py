@@ -0,0 +1,355 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import struct
+import array
+import zlib
+import sys
+import logging
+import threading
+try:
+    import gobject
+except ImportError:
+    gobject = None
+
+"""
+journal keeps an append-only log of every change to a Stopwatch session, so
+that a crash loses at most the last few seconds.  The file starts with
+'<8sI' MAGIC and VERSION, followed by records, each of which is
+
+    '<IiHH'     length of the data, CRC-32 of kind, watch and data, kind, watch
+                the data
+
+with the data of each kind being
+
+    OFFSET      '<d' offset of the group clock
+    NAME        '<d' time the name was set, then the name in UTF-8
+    BASE        '<ddi' base state timeval, base state score, base state
+    EVENTS      n event times (float64), then n event types (int32)
+    MARKS       n marks (float64)
+
+Everything is little-endian.  Records are only ever appended, so a crash can
+at worst leave a torn record at the end; it fails its length or checksum, and
+it and anything after it are ignored and overwritten.
+
+Because every DObject is a merge of everything it has received, replaying the
+records in order, on top of any other saved state, restores the session.
+
+Journals of VERSION 1 did not record the time of a name, so it is read as
+0.0, as in savefile.  A Journal that opens one rewrites it in the current
+version.
+"""
+
+MAGIC = 'STOPJRNL'
+VERSION = 2
+
+OFFSET = 1
+NAME = 2
+BASE = 3
+EVENTS = 4
+MARKS = 5
+
+_HEADER = struct.Struct('<8sI')
+_RECORD = struct.Struct('<IiHH')
+_KIND = struct.Struct('<HH')
+_FLOAT = struct.Struct('<d')
+_BASE = struct.Struct('<ddi')
+
+def _column_string(typecode, items):
+    a = array.array(typecode, items)
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a.tostring()
+
+def _column(typecode, data):
+    a = array.array(typecode)
+    a.fromstring(data)
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a
+
+def _record(kind, watch, data):
+    crc = zlib.crc32(data, zlib.crc32(_KIND.pack(kind, watch)))
+    return _RECORD.pack(len(data), crc, kind, watch) + data
+
+def _name_record(watch, name, t):
+    if isinstance(name, unicode):
+        name = name.encode('utf-8')
+    return _record(NAME, watch, _FLOAT.pack(t) + name)
+
+def _snapshot_records(offset, watches):
+    """Encode (offset, watches), in the form written by savefile, as records"""
+    records = [_record(OFFSET, 0, _FLOAT.pack(offset))]
+    for (i, (name, nametime, basestate, basescore, times, types, marks)) in enumerate(watches):
+        records.append(_name_record(i, name, nametime))
+        records.append(_record(BASE, i, _BASE.pack(basestate[0], basescore, basestate[1])))
+        if len(times) > 0:
+            records.append(_record(EVENTS, i, _column_string('d', times) + _column_string('i', types)))
+        if len(marks) > 0:
+            records.append(_record(MARKS, i, _column_string('d', marks)))
+    return records
+
+def _scan(data):
+    """Returns the list of (kind, watch, data) of the valid records in data,
+    the length of the valid prefix of data, and the version of the journal"""
+    if len(data) < _HEADER.size:
+        raise ValueError("not a Stopwatch journal")
+    (magic, version) = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a Stopwatch journal")
+    if version > VERSION:
+        raise ValueError("unsupported journal version " + str(version))
+    records = []
+    pos = _HEADER.size
+    while pos + _RECORD.size <= len(data):
+        (length, crc, kind, watch) = _RECORD.unpack_from(data, pos)
+        start = pos + _RECORD.size
+        end = start + length
+        if end > len(data):
+            break
+        body = data[start:end]
+        if zlib.crc32(body, zlib.crc32(_KIND.pack(kind, watch))) != crc:
+            break
+        records.append((kind, watch, body))
+        pos = end
+    return (records, pos, version)
+
+def is_journal(f):
+    """Whether the open file f starts with MAGIC.  The file position is
+    restored."""
+    pos = f.tell()
+    magic = f.read(len(MAGIC))
+    f.seek(pos)
+    return magic == MAGIC
+
+def read(f):
+    """Replay the journal in the open file f, returning (offset, watches) in
+    the form read by savefile, with the events and marks of each watch sorted
+    and without duplicates.  offset is None if no offset was recorded, and so
+    is the name of a watch whose name was not."""
+    (records, end, version) = _scan(f.read())
+    offset = None
+    watches = []
+    for (kind, watch, data) in records:
+        if kind == OFFSET:
+            (offset,) = _FLOAT.unpack(data)
+            continue
+        while len(watches) <= watch:
+            watches.append([None, float('-inf'), (0.0, 0), float('-inf'), array.array('d'), array.array('i'), array.array('d')])
+        w = watches[watch]
+        if kind == NAME:
+            if version == 1:
+                (t, name) = (0.0, data)
+            else:
+                (t,) = _FLOAT.unpack_from(data, 0)
+                name = data[_FLOAT.size:]
+            if t >= w[1]:
+                w[0] = name
+                w[1] = t
+        elif kind == BASE:
+            (timeval, score, state) = _BASE.unpack(data)
+            if score > w[3]:
+                w[2] = (timeval, state)
+                w[3] = score
+        elif kind == EVENTS:
+            n = len(data) // 12
+            w[4].extend(_column('d', data[:8*n]))
+            w[5].extend(_column('i', data[8*n:]))
+        elif kind == MARKS:
+            w[6].extend(_column('d', data))
+    for w in watches:
+        events = sorted(set(zip(w[4], w[5])))
+        w[4] = array.array('d', [e[0] for e in events])
+        w[5] = array.array('i', [e[1] for e in events])
+        w[6] = array.array('d', sorted(set(w[6])))
+    return (offset, [tuple(w) for w in watches])
+
+class Journal:
+    """A Journal appends the changes it is told about to a journal file.
+    Changes are buffered, with the events and marks of each watch gathered
+    into one record, and written and fsynced together at most FLUSH_INTERVAL
+    seconds after the first of them, or once FLUSH_LIMIT are waiting.  Each
+    flush costs only as much as the changes it writes.
+
+    When the file has grown to COMPACT_RATIO times its size just after the
+    last compaction, and at least COMPACT_MIN bytes, it is compacted: it is
+    replaced by the records of snapshot(), which must return the whole
+    session as (offset, watches), in the form written by savefile.  Once the
+    session has been saved elsewhere, discard() drops what the save holds.
+    
+    The flush timeout needs gobject's main loop.  Without gobject, as in
+    tools that only read or repair a journal, changes wait for FLUSH_LIMIT
+    or an explicit flush().
+    """
+    FLUSH_INTERVAL = 2.0
+    FLUSH_LIMIT = 4096
+    COMPACT_RATIO = 4
+    COMPACT_MIN = 1 << 20
+
+    def __init__(self, path, snapshot):
+        self._logger = logging.getLogger('stopwatch.Journal')
+        self._path = path
+        self._snapshot = snapshot
+        self._lock = threading.Lock()
+        self._pending = [] #records of names and base states, in order
+        self._events = {} #watch -> list of new events
+        self._marks = {} #watch -> list of new marks
+        self._count = 0
+        self._source = None
+
+        self._file = open(path, 'ab+')
+        self._file.seek(0)
+        data = self._file.read()
+        end = 0
+        version = VERSION
+        if len(data) >= _HEADER.size:
+            try:
+                (records, end, version) = _scan(data)
+            except ValueError:
+                self._logger.error("replacing unreadable journal " + path)
+        if end < len(data):
+            self._file.truncate(end) #drop a torn record, or an unreadable file
+        if end == 0:
+            self._file.write(_HEADER.pack(MAGIC, VERSION))
+            end = _HEADER.size
+        self._file.flush()
+        self._size = end
+        self._compacted_size = end
+        if version < VERSION:
+            self.compact()
+
+    def add_name(self, watch, name, t):
+        self._add(NAME, watch, _name_record(watch, name, t))
+
+    def add_base(self, watch, basestate, basescore):
+        self._add(BASE, watch, _record(BASE, watch, _BASE.pack(basestate[0], basescore, basestate[1])))
+
+    def add_events(self, watch, events):
+        self._add(EVENTS, watch, events)
+
+    def add_marks(self, watch, marks):
+        self._add(MARKS, watch, marks)
+
+    def _add(self, kind, watch, items):
+        self._lock.acquire()
+        if kind == EVENTS:
+            self._events.setdefault(watch, []).extend(items)
+            self._count += len(items)
+        elif kind == MARKS:
+            self._marks.setdefault(watch, []).extend(items)
+            self._count += len(items)
+        else:
+            self._pending.append(items)
+            self._count += 1
+        full = self._count >= Journal.FLUSH_LIMIT
+        if (not full) and (self._source is None) and (gobject is not None):
+            self._source = gobject.timeout_add(int(Journal.FLUSH_INTERVAL*1000), self._timeout)
+        self._lock.release()
+        if full:
+            self.flush()
+
+    def _timeout(self):
+        self._lock.acquire()
+        self._source = None
+        self._lock.release()
+        self.flush()
+        return False
+
+    def flush(self):
+        """Write and fsync all waiting changes"""
+        self._lock.acquire()
+        records = self._pending
+        for (watch, events) in self._events.iteritems():
+            records.append(_record(EVENTS, watch, _column_string('d', [e[0] for e in events]) + _column_string('i', [e[1] for e in events])))
+        for (watch, marks) in self._marks.iteritems():
+            records.append(_record(MARKS, watch, _column_string('d', marks)))
+        self._pending = []
+        self._events = {}
+        self._marks = {}
+        self._count = 0
+        if self._source is not None:
+            gobject.source_remove(self._source)
+            self._source = None
+        if len(records) > 0:
+            data = ''.join(records)
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._size += len(data)
+        compact = self._size >= max(Journal.COMPACT_MIN, Journal.COMPACT_RATIO*self._compacted_size)
+        self._lock.release()
+        if compact:
+            self.compact()
+
+    def get_mark(self):
+        """Flush, and return a mark for everything written so far, to be
+        passed to discard() once it has been saved elsewhere"""
+        self.flush()
+        self._lock.acquire()
+        mark = self._size
+        self._lock.release()
+        return mark
+
+    def discard(self, mark):
+        """Drop everything written before get_mark() returned mark, because
+        it has been saved elsewhere.  Later changes are kept."""
+        self._lock.acquire()
+        self._replace(_HEADER.pack(MAGIC, VERSION), mark)
+        self._lock.release()
+        self._logger.debug("discarded journal up to " + str(mark))
+
+    def compact(self):
+        """Replace the journal by a snapshot of the session"""
+        self._lock.acquire()
+        mark = self._size
+        self._lock.release()
+        (offset, watches) = self._snapshot()
+        data = _HEADER.pack(MAGIC, VERSION) + ''.join(_snapshot_records(offset, watches))
+        self._lock.acquire()
+        self._replace(data, mark)
+        self._lock.release()
+        self._logger.debug("compacted journal to " + str(self._size) + " bytes")
+
+    def _replace(self, data, mark):
+        """Replace the journal by data, followed by what was flushed after
+        mark.  The caller must hold self._lock."""
+        if self._size > mark:
+            f = open(self._path, 'rb')
+            f.seek(mark)
+            data += f.read(self._size - mark)
+            f.close()
+        tmp = self._path + '.tmp'
+        f = open(tmp, 'wb')
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.rename(tmp, self._path)
+        self._file.close()
+        self._file = open(self._path, 'ab')
+        self._size = len(data)
+        self._compacted_size = len(data)
+
+    def close(self):
+        """Write all waiting changes and close the file.  A journal with no
+        changes since it was last discarded is removed."""
+        self.flush()
+        self._lock.acquire()
+        self._file.close()
+        if self._size <= _HEADER.size:
+            os.remove(self._path)
+        self._lock.release()
@@ -17,6 +17,26 @@
 import os
 
 
+def on_battery():
+    """ True if the system is known to be running on battery power """
+    path = '/sys/class/power_supply'
+    battery = False
+    try:
+        supplies = os.listdir(path)
+    except:
+        return False
+    for supply in supplies:
+        try:
+            kind = file(os.path.join(path, supply, 'type')).read().strip()
+            if kind == 'Battery':
+                battery = True
+            elif file(os.path.join(path, supply, 'online')).read().strip() == '1':
+                return False
+        except:
+            pass
+    return battery
+
+
 def marker():
     """ filesystem path of per-process inhibit file """
     return os.path.join('/var/run/powerd-inhibit-suspend', str(os.getpid()))
@@ -0,0 +1,176 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import struct
+import array
+import mmap
+import sys
+
+"""
+savefile reads and writes Stopwatch's save format, a versioned binary file
+of fixed-width little-endian records.  Everything after the header starts on
+an 8-byte boundary, so that each column can be read directly with
+array.fromstring, or used in place from a memory map.
+
+    header      '<8sII'   MAGIC, VERSION, number of watches
+                '<d'      offset of the group clock
+    each watch  '<I'      length of the name in bytes
+                          the name in UTF-8, padded to 8 bytes
+                '<d'      time the name was set (only from VERSION 2)
+                '<ddi'    base state timeval, base state score, base state
+                '<II'     number of events n, number of marks m (after 4 pad)
+                          n event times (float64)
+                          n event types (int32), padded to 8 bytes
+                          m marks (float64)
+
+A watch is saved as (name, nametime, basestate, basescore, times, types,
+marks), where name is a UTF-8 encoded str, nametime is the time of the
+watch's Latest name, basestate is the (timeval, state) of the watch's
+HighScore base state and times, types and marks are array.arrays of typecodes
+'d', 'i' and 'd'.  Files of VERSION 1 did not record the name's time, so it
+is read as 0.0, later than an unset name and earlier than any rename.
+"""
+
+MAGIC = 'STOPWTCH'
+VERSION = 2
+
+_HEADER = struct.Struct('<8sII')
+_OFFSET = struct.Struct('<d')
+_LENGTH = struct.Struct('<I')
+_WATCH = struct.Struct('<dddi4xII')
+_WATCH_1 = struct.Struct('<ddi4xII')
+
+def _padding(n):
+    return -n % 8
+
+def _column_string(a):
+    if sys.byteorder == 'big':
+        a = array.array(a.typecode, a)
+        a.byteswap()
+    return a.tostring()
+
+def _column(typecode, data, pos, n):
+    """Returns the column of n items of typecode at data[pos:], and the
+    position after it"""
+    a = array.array(typecode)
+    end = pos + n*a.itemsize
+    if end > len(data):
+        raise ValueError("truncated save file")
+    a.fromstring(data[pos:end])
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return (a, end + _padding(end))
+
+def is_savefile(f):
+    """Whether the open file f starts with MAGIC.  The file position is
+    restored."""
+    pos = f.tell()
+    magic = f.read(len(MAGIC))
+    f.seek(pos)
+    return magic == MAGIC
+
+def write(f, offset, watches):
+    """Write the clock offset and the list of watches to the open file f"""
+    parts = [_HEADER.pack(MAGIC, VERSION, len(watches)), _OFFSET.pack(offset)]
+    for (name, nametime, basestate, basescore, times, types, marks) in watches:
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        parts.append(_LENGTH.pack(len(name)))
+        parts.append(name + '\0'*_padding(len(name) + _LENGTH.size))
+        parts.append(_WATCH.pack(nametime, basestate[0], basescore, basestate[1], len(times), len(marks)))
+        parts.append(_column_string(times))
+        parts.append(_column_string(types))
+        parts.append('\0'*_padding(len(types)*types.itemsize))
+        parts.append(_column_string(marks))
+    f.write(''.join(parts))
+
+def read(f):
+    """Read a file written by write(), returning (offset, watches)"""
+    return parse(f.read())
+
+def map_file(f):
+    """Memory-map the open file f, which was written by write(), and parse only
+    its header and the fixed-size part of each watch.  Returns (offset,
+    watches), where each watch is (name, nametime, basestate, basescore,
+    columns), and columns is a MappedColumns that reads the times, types and
+    marks when asked.  The map stays valid after f is closed, or even
+    deleted."""
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return parse(data, lazy=True)
+
+class MappedColumns:
+    """The columns of one watch of a mapped save file"""
+    def __init__(self, data, pos, n, m):
+        self._data = data
+        self._pos = pos
+        self._n = n
+        self._m = m
+    
+    def is_empty(self):
+        """Whether the watch has no events and no marks"""
+        return self._n == 0 and self._m == 0
+    
+    def load(self):
+        """Returns (times, types, marks), read from the map"""
+        (times, pos) = _column('d', self._data, self._pos, self._n)
+        (types, pos) = _column('i', self._data, pos, self._n)
+        (marks, pos) = _column('d', self._data, pos, self._m)
+        return (times, types, marks)
+
+def _columns_end(pos, n, m):
+    """The position after the columns of a watch starting at pos"""
+    pos += 8*n
+    pos += 4*n + _padding(4*n)
+    return pos + 8*m
+
+def parse(data, lazy=False):
+    """Parse the contents of a save file, which may be a string, a buffer or
+    a memory map.  If lazy is true, the columns are not read, as in
+    map_file()."""
+    try:
+        (magic, version, count) = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a Stopwatch save file")
+        if version > VERSION:
+            raise ValueError("unsupported save file version " + str(version))
+        pos = _HEADER.size
+        (offset,) = _OFFSET.unpack_from(data, pos)
+        pos += _OFFSET.size
+        watches = []
+        for i in xrange(count):
+            (length,) = _LENGTH.unpack_from(data, pos)
+            pos += _LENGTH.size
+            name = str(data[pos:pos+length])
+            pos += length + _padding(length + _LENGTH.size)
+            if version == 1:
+                nametime = 0.0
+                (timeval, basescore, state, n, m) = _WATCH_1.unpack_from(data, pos)
+                pos += _WATCH_1.size
+            else:
+                (nametime, timeval, basescore, state, n, m) = _WATCH.unpack_from(data, pos)
+                pos += _WATCH.size
+            end = _columns_end(pos, n, m)
+            if end > len(data):
+                raise ValueError("truncated save file")
+            if lazy:
+                watches.append((name, nametime, (timeval, state), basescore, MappedColumns(data, pos, n, m)))
+            else:
+                (times, types, marks) = MappedColumns(data, pos, n, m).load()
+                watches.append((name, nametime, (timeval, state), basescore, times, types, marks))
+            pos = end
+    except struct.error as e:
+        raise ValueError("truncated save file: " + str(e))
+    return (offset, watches)
@@ -20,16 +20,26 @@ import gtk.gdk
 import gobject
 import dobject
 import logging
-import time
-import thread
 import threading
 import locale
+import re
 import pango
+import cairo
+import pangocairo
+import bisect
+import array
+import functools
+import os
 from gettext import gettext
+from sugar.activity import activity
 import powerd
+import timeformat
+from framescheduler import FrameScheduler
 
 suspend = powerd.Suspend()
 
+scheduler = FrameScheduler()
+
 class WatchModel():
     STATE_PAUSED = 1
     STATE_RUNNING = 2
@@ -39,6 +49,8 @@ class WatchModel():
     RESET_EVENT = 3
     
     _default_basestate = (0.0, STATE_PAUSED)
+    
+    CHECKPOINT_INTERVAL = 32
 
     def _trans(self, s, pack):
         if pack:
@@ -46,10 +58,20 @@ class WatchModel():
         else:
             return (float(s[0]), int(s[1]))
 
-    def __init__(self, handler):
+    def __init__(self, handler, horizon=None, packed=False):
+        """If horizon is not None, events more than horizon seconds older than
+        the newest event are periodically folded into the base state and
+        dropped from the history, so that memory use, the history sent to new
+        peers, and the cost of _update_state all stay bounded.  If packed is
+        true, the history is kept in a PackedListSet."""
         self._logger = logging.getLogger('stopwatch.WatchModel')
-        self._history = dobject.AddOnlySortedSet(handler, translator=self._trans)
+        if packed:
+            factory = functools.partial(dobject.PackedListSet, 'di')
+        else:
+            factory = dobject.ListSet
+        self._history = dobject.AddOnlySortedSet(handler, translator=self._trans, factory=factory)
         self._history_lock = threading.RLock()
+        self._horizon = horizon
 
         self._view_listener = None  #This must be done before _update_state
         
@@ -59,6 +81,8 @@ class WatchModel():
                      float("-inf"), self._trans, dobject.float_translator)
         
         self._state = ()
+        self._fold = dobject.CheckpointedFold(self._history, self._step,
+                     WatchModel._default_basestate, WatchModel.CHECKPOINT_INTERVAL)
         self._update_state() #sets the state to the base_state
     
         self._base_state.register_listener(self._basestate_cb)
@@ -72,25 +96,52 @@ class WatchModel():
             lastevent = self._history.last()
             return lastevent[0]
         else:
-            return float("-inf")
+            return self._base_state.get_score()
         
     def reset(self, s, t):
         self._base_state.set_value(s, t)
-        self._update_state()
+        self._absorb(self._base_state.get_score())
+    
+    def restore(self, basestate, basescore, times, types):
+        """Merge in a saved base state and event history, given as sorted
+        columns as returned by get_saved(), without broadcasting them"""
+        self._base_state.restore(tuple(basestate), basescore)
+        self._history.load_columns([times, types])
+    
+    def register_change_listeners(self, events_listener, base_listener):
+        """Register events_listener(events), called with the new events
+        whenever events are added to the history, and base_listener(basestate,
+        basescore), called whenever the base state changes, whether by this
+        user or by another."""
+        self._history.register_change_listener(events_listener)
+        self._base_state.register_change_listener(base_listener)
+    
+    def get_saved(self):
+        """Returns (basestate, basescore, times, types): the base state, its
+        score, and the times and types of the events in the history as
+        array.arrays"""
+        self._history_lock.acquire()
+        (basestate, basescore) = self._base_state.get_pair()
+        (times, types) = self._history.columns('di')
+        self._history_lock.release()
+        return (basestate, basescore, times, types)
     
     def _basestate_cb(self, v, s):
-        self._update_state()
+        self._absorb(s)
         self._trigger()
     
     def _history_cb(self, diffset):
-        self._update_state()
+        if len(diffset) > 0:
+            self._update_state(self._history.position(diffset.first()))
+            self._compact()
         self._trigger()
     
     def add_event_from_view(self, ev):
         self._history_lock.acquire()
         if ev not in self._history:
             self._history.add(ev)
-            self._update_state()
+            self._update_state(self._history.position(ev))
+            self._compact()
         self._history_lock.release()
         self._trigger()
         #We always trigger when an event is received from the UI.  Otherwise,
@@ -98,31 +149,69 @@ class WatchModel():
         # and produce an old event that is irrelevant.  This results in the
         # UI reaching an inconsistent state, with the button toggled off
         # but the clock still running.
+    
+    def _step(self, q, ev):
+        """Apply the event ev to the folded state q = (timeval, state)"""
+        timeval = q[0]
+        s = q[1]
+        event_time = ev[0]
+        event_type = ev[1]
+        if s == WatchModel.STATE_PAUSED:
+            if event_type == WatchModel.RUN_EVENT:
+                s = WatchModel.STATE_RUNNING
+                timeval = event_time - timeval
+            elif event_type == WatchModel.RESET_EVENT:
+                timeval = 0.0
+        elif s == WatchModel.STATE_RUNNING:
+            if event_type == WatchModel.RESET_EVENT:
+                timeval = event_time
+            elif event_type == WatchModel.PAUSE_EVENT:
+                s = WatchModel.STATE_PAUSED
+                timeval = event_time - timeval
+        return (timeval, s)
         
-    def _update_state(self):
+    def _absorb(self, t):
+        """The base state summarizes every event up to time t, so those events
+        are dropped from the history and the state is refolded."""
+        self._history_lock.acquire()
+        if t > float("-inf"):
+            self._history.forget((t, float("inf")))
+        self._update_state()
+        self._history_lock.release()
+    
+    def _compact(self):
+        """Fold the events older than the horizon into a new base state, scored
+        by the time of the last folded event.  Peers that receive the new base
+        state drop the same prefix of their own histories."""
+        if self._horizon is None:
+            return
+        self._history_lock.acquire()
+        cutoff = self._history.last()[0] - self._horizon
+        n = self._history.position((cutoff, float("inf")))
+        if n >= WatchModel.CHECKPOINT_INTERVAL:
+            q = self._fold.state_at(n)
+            t = self._history[n-1][0]
+            self._logger.debug("_compact " + str(n) + " events up to " + str(t))
+            self._base_state.set_value(q, t)
+            self._absorb(t)
+        self._history_lock.release()
+    
+    def _update_state(self, start=0):
+        """Recompute the state from the history, assuming that only the events
+        at positions start and later have changed.  The fold keeps a
+        checkpoint every CHECKPOINT_INTERVAL events, so an event appended in
+        order costs one step, and a late event only replays from the nearest
+        preceding checkpoint."""
         self._logger.debug("_update_state")
-        L = len(self._history)
-        init = self._base_state.get_value()
-        timeval = init[0]
-        s = init[1]
-        #state machine
-        for ev in self._history:
-            event_time = ev[0]
-            event_type = ev[1]
-            if s == WatchModel.STATE_PAUSED:
-                if event_type == WatchModel.RUN_EVENT:
-                    s = WatchModel.STATE_RUNNING
-                    timeval = event_time - timeval
-                elif event_type == WatchModel.RESET_EVENT:
-                    timeval = 0.0
-            elif s == WatchModel.STATE_RUNNING:
-                if event_type == WatchModel.RESET_EVENT:
-                    timeval = event_time
-                elif event_type == WatchModel.PAUSE_EVENT:
-                    s = WatchModel.STATE_PAUSED
-                    timeval = event_time - timeval
-
-        return self._set_state((timeval, s))
+        self._history_lock.acquire()
+        if start < WatchModel.CHECKPOINT_INTERVAL:
+            #the base state may have changed
+            q = self._fold.reset(self._base_state.get_value())
+        else:
+            q = self._fold.update(start)
+        changed = self._set_state(q)
+        self._history_lock.release()
+        return changed
 
     def is_running(self):
         return self._state[1] == WatchModel.STATE_RUNNING
@@ -142,9 +231,252 @@ class WatchModel():
 
     def _trigger(self):
         if self._view_listener is not None:
-            thread.start_new_thread(self._view_listener, (self._state,))
+            #the view only posts the state for its next frame, so this never
+            #blocks, and needs no thread of its own
+            self._view_listener(self._state)
+
+formatter = timeformat.TimeFormatter()
+
+class ResourceCache():
+    """ResourceCache holds the icons, fonts and colors that all OneWatchViews
+    share, so that each is loaded or built once per process instead of once
+    per watch.  It also renders the glyphs of the time display once per font,
+    as alpha masks that can be painted in any color.  Everything is made on
+    first use, and only from the main loop."""
+    GLYPHS = u"0123456789:.,- " #characters of a formatted time
+    
+    def __init__(self):
+        self._pixbufs = {} #filename -> gtk.gdk.Pixbuf
+        self._fonts = {} #(family, size) -> pango.FontDescription
+        self._colors = {} #spec -> gtk.gdk.Color
+        self._glyphs = {} #(family, size) -> {character: (surface, width, height)}
+    
+    def pixbuf(self, filename):
+        """Returns the Pixbuf of the image filename in the activity bundle"""
+        p = self._pixbufs.get(filename)
+        if p is None:
+            p = gtk.gdk.pixbuf_new_from_file(os.path.join(activity.get_bundle_path(), filename))
+            self._pixbufs[filename] = p
+        return p
+    
+    def font(self, family, size):
+        """Returns the FontDescription of family at size points.  It must not
+        be modified."""
+        f = self._fonts.get((family, size))
+        if f is None:
+            f = pango.FontDescription()
+            f.set_family(family)
+            f.set_size(pango.SCALE*size)
+            self._fonts[(family, size)] = f
+        return f
+    
+    def color(self, spec):
+        c = self._colors.get(spec)
+        if c is None:
+            c = gtk.gdk.color_parse(spec)
+            self._colors[spec] = c
+        return c
+    
+    def glyphs(self, family, size):
+        """Returns a dictionary from each character of GLYPHS, and the locale's
+        decimal point and thousands separator, to (surface, width, height),
+        where surface is a cairo.ImageSurface holding the character as an
+        alpha mask of width by height pixels."""
+        g = self._glyphs.get((family, size))
+        if g is None:
+            g = {}
+            chars = set(ResourceCache.GLYPHS)
+            conv = locale.localeconv()
+            for c in (conv['decimal_point'], conv['thousands_sep']):
+                chars.update(c.decode('utf-8'))
+            font = self.font(family, size)
+            measure = pangocairo.CairoContext(cairo.Context(cairo.ImageSurface(cairo.FORMAT_A8, 1, 1)))
+            layout = measure.create_layout()
+            layout.set_font_description(font)
+            for c in chars:
+                layout.set_text(c.encode('utf-8'))
+                (width, height) = layout.get_pixel_size()
+                surface = cairo.ImageSurface(cairo.FORMAT_A8, max(1, width), max(1, height))
+                ctx = pangocairo.CairoContext(cairo.Context(surface))
+                ctx.update_layout(layout)
+                ctx.show_layout(layout)
+                g[c] = (surface, width, height)
+            self._glyphs[(family, size)] = g
+        return g
+
+resources = ResourceCache()
+
+class TimeDisplay():
+    """TimeDisplay shows a formatted time, right-justified in a row of
+    fixed-width cells, without the text layout and size negotiation that
+    gtk.Label.set_text costs.  The characters are painted from the glyphs of
+    the ResourceCache into a cached surface; set_text() repaints only the
+    cells whose character changed, and invalidates only the rectangle around
+    them, from which expose copies the surface to the screen."""
+    PADDING = 6 #pixels on either side of the text
+    
+    def __init__(self, family, size, chars):
+        self._glyphs = resources.glyphs(family, size)
+        self._cell = max([w for (surface, w, h) in self._glyphs.values()])
+        self._height = max([h for (surface, w, h) in self._glyphs.values()])
+        self._cells = []
+        self.display = gtk.DrawingArea()
+        self.display.connect('expose-event', self._expose_cb)
+        self._resize(chars)
+    
+    def _resize(self, chars):
+        self._cells = [u" "]*(chars - len(self._cells)) + self._cells
+        self._width = chars*self._cell + 2*TimeDisplay.PADDING
+        self._surface = cairo.ImageSurface(cairo.FORMAT_RGB24, self._width, self._height)
+        ctx = cairo.Context(self._surface)
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.paint()
+        for i in xrange(chars):
+            self._paint_cell(ctx, i, self._cells[i])
+        self.display.set_size_request(self._width, self._height)
+        self.display.queue_draw()
+    
+    def _origin(self):
+        """Returns the position of the surface in the widget"""
+        a = self.display.get_allocation()
+        return (a.width - self._width, (a.height - self._height) // 2)
+    
+    def _paint_cell(self, ctx, i, c):
+        x = TimeDisplay.PADDING + i*self._cell
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.rectangle(x, 0, self._cell, self._height)
+        ctx.fill()
+        g = self._glyphs.get(c)
+        if g is not None:
+            (surface, width, height) = g
+            ctx.set_source_rgb(0, 0, 0)
+            ctx.mask_surface(surface, x + (self._cell - width) // 2, (self._height - height) // 2)
+    
+    def set_text(self, text):
+        if isinstance(text, str):
+            text = text.decode('utf-8')
+        if len(text) > len(self._cells):
+            self._resize(len(text))
+        cells = [u" "]*(len(self._cells) - len(text)) + list(text)
+        changed = [i for i in xrange(len(cells)) if cells[i] != self._cells[i]]
+        if len(changed) == 0:
+            return
+        ctx = cairo.Context(self._surface)
+        for i in changed:
+            self._paint_cell(ctx, i, cells[i])
+        self._cells = cells
+        (x, y) = self._origin()
+        left = TimeDisplay.PADDING + changed[0]*self._cell
+        right = TimeDisplay.PADDING + (changed[-1] + 1)*self._cell
+        self.display.queue_draw_area(x + left, y, right - left, self._height)
+    
+    def _expose_cb(self, widget, event):
+        ctx = widget.window.cairo_create()
+        area = event.area
+        ctx.rectangle(area.x, area.y, area.width, area.height)
+        ctx.clip()
+        ctx.set_source_rgb(1, 1, 1)
+        ctx.paint()
+        (x, y) = self._origin()
+        ctx.set_source_surface(self._surface, x, y)
+        ctx.paint()
+        return True
+
+class MarksView():
+    """MarksView lists the marks of a watch in order, each with its lap time,
+    the time since the mark before it.  The list is a TreeView with
+    fixed-height rows in a ScrolledWindow, so only the rows in view are ever
+    drawn, however many marks there are.  Each new mark is inserted by
+    bisection, and only it, and the lap of the mark after it, are formatted.
+    A batch of more marks than are already shown rebuilds the list instead.
+    
+    Marks can be selected, as in the label that used to show them, and
+    Ctrl+C copies the selected rows.  keys, if given, sees each key pressed
+    in the list first, and returns True if it used the key, so that the
+    game keys of the watch are not taken for moving the cursor."""
+    HEIGHT = 72 #pixels
+    WIDTH = 12 #characters in each column
+    
+    def __init__(self, keys=None):
+        self._marks = [] #the marks, in the order of the rows of the store
+        self._clock = formatter.get_clock() #whether the store is in clock format
+        self._store = gtk.ListStore(str, str) #mark, lap
+        self._view = gtk.TreeView(self._store)
+        font = resources.font("monospace", 10)
+        glyphs = resources.glyphs("monospace", 10)
+        width = MarksView.WIDTH*max([w for (surface, w, h) in glyphs.values()])
+        for (title, column) in ((gettext("Mark"), 0), (gettext("Lap"), 1)):
+            cell = gtk.CellRendererText()
+            cell.props.font_desc = font
+            cell.props.xalign = 1.0
+            col = gtk.TreeViewColumn(title, cell, text=column)
+            col.set_sizing(gtk.TREE_VIEW_COLUMN_FIXED)
+            col.set_fixed_width(width)
+            self._view.append_column(col)
+        self._view.set_fixed_height_mode(True)
+        self._view.get_selection().set_mode(gtk.SELECTION_MULTIPLE)
+        if keys is not None:
+            self._view.connect('key-press-event', keys)
+        self._view.connect('key-press-event', self._keypress_cb)
+        
+        self.display = gtk.ScrolledWindow()
+        self.display.set_policy(gtk.POLICY_NEVER, gtk.POLICY_AUTOMATIC)
+        self.display.add(self._view)
+        self.display.set_size_request(-1, MarksView.HEIGHT)
+    
+    def _lap(self, i):
+        if i == 0:
+            return self._marks[0]
+        return self._marks[i] - self._marks[i-1]
+    
+    def _keypress_cb(self, widget, event):
+        if (event.state & gtk.gdk.CONTROL_MASK) and (gtk.gdk.keyval_name(event.keyval) in ('c', 'C')):
+            self.copy()
+            return True
+        return False
+    
+    def copy(self):
+        """Copy the selected rows to the clipboard, one line per mark, with
+        its lap after a tab"""
+        (model, paths) = self._view.get_selection().get_selected_rows()
+        if len(paths) > 0:
+            gtk.Clipboard().set_text("\n".join([model[p][0] + "\t" + model[p][1] for p in paths]))
+    
+    def add(self, marks):
+        """Show each of marks that is not shown yet"""
+        if len(marks) > len(self._marks):
+            self._rebuild(sorted(set(self._marks).union(marks)))
+            return
+        for m in marks:
+            i = bisect.bisect_left(self._marks, m)
+            if i < len(self._marks) and self._marks[i] == m:
+                continue
+            self._marks.insert(i, m)
+            self._store.insert(i, (formatter.format(m), formatter.format(self._lap(i))))
+            if i + 1 < len(self._marks):
+                self._store[i+1][1] = formatter.format(self._lap(i+1))
+            elif i > 0:
+                self._view.scroll_to_cell((i,))
+    
+    def refresh(self, marks):
+        """Show exactly the sorted list marks, in the current format"""
+        if len(marks) != len(self._marks) or formatter.get_clock() != self._clock:
+            self._rebuild(marks)
+    
+    def _rebuild(self, marks):
+        self._marks = marks
+        self._clock = formatter.get_clock()
+        self._view.set_model(None) #much faster than filling a shown model
+        self._store.clear()
+        for i in xrange(len(marks)):
+            self._store.append((formatter.format(marks[i]), formatter.format(self._lap(i))))
+        self._view.set_model(self._store)
+        if len(marks) > 0:
+            self._view.scroll_to_cell((len(marks) - 1,))
 
 class OneWatchView():
+    NAME_DELAY = 1.0 #seconds after the last keystroke before a name is shared
+    
     def __init__(self, mywatch, myname, mymarks, timer):
         self._logger = logging.getLogger('stopwatch.OneWatchView')
         self._watch_model = mywatch
@@ -153,90 +485,68 @@ class OneWatchView():
         self._timer = timer
         
         self._update_lock = threading.Lock()
+        self._pending_state = None #latest state and name not yet displayed
+        self._pending_name = None
+        self._pending_marks = [] #marks not yet displayed
+        self._destroyed = False
         self._state = None
         self._timeval = 0
-
-        self._offset = self._timer.get_offset()
         
         self._name = gtk.Entry()
+        self._name_source = None #timeout that shares the name being typed
         self._name_changed_handler = self._name.connect('changed', self._name_cb)
-        self._name_lock = threading.Lock()
+        self._name.connect('activate', self._name_activate_cb)
+        self._name.connect('focus-out-event', self._name_focus_out_cb)
         self._name_model.register_listener(self._update_name_cb)
         
-        check = gtk.Image()
-        check.set_from_file('check.svg')
+        check = gtk.image_new_from_pixbuf(resources.pixbuf('check.svg'))
         self._run_button = gtk.ToggleButton(gettext("Start/Stop"))
         self._run_button.set_image(check)
         self._run_button.props.focus_on_click = False        
         self._run_handler = self._run_button.connect('clicked', self._run_cb)
-        self._run_button_lock = threading.Lock()
 
-        circle = gtk.Image()
-        circle.set_from_file('circle.svg')
+        circle = gtk.image_new_from_pixbuf(resources.pixbuf('circle.svg'))
         self._reset_button = gtk.Button(gettext("Zero"))
         self._reset_button.set_image(circle)
         self._reset_button.props.focus_on_click = False
         self._reset_button.connect('clicked', self._reset_cb)
         
-        x = gtk.Image()
-        x.set_from_file('x.svg')
+        x = gtk.image_new_from_pixbuf(resources.pixbuf('x.svg'))
         self._mark_button = gtk.Button(gettext("Mark"))
         self._mark_button.set_image(x)
         self._mark_button.props.focus_on_click = False
         self._mark_button.connect('clicked', self._mark_cb)
         
-        timefont = pango.FontDescription()
-        timefont.set_family("monospace")
-        timefont.set_size(pango.SCALE*14)
-        self._time_label = gtk.Label(self._format(0))
-        self._time_label.modify_font(timefont)
-        self._time_label.set_single_line_mode(True)
-        self._time_label.set_selectable(True)
-        self._time_label.set_width_chars(10)
-        self._time_label.set_alignment(1,0.5) #justify right
-        self._time_label.set_padding(6,0)
-        eb = gtk.EventBox()
-        eb.add(self._time_label)
-        eb.modify_bg(gtk.STATE_NORMAL, gtk.gdk.color_parse("white"))
+        self._time_display = TimeDisplay("monospace", 14, 10)
+        self._time_display.set_text(self._format(0))
         
-        self._should_update = threading.Event()
         self._is_visible = threading.Event()
         self._is_visible.set()
-        self._update_lock = threading.Lock()
-        self._label_lock = threading.Lock()
+        self._focused = False
+        self._whole_seconds = False #whether to show whole seconds while unfocused
+        self._precise = True #whether to show hundredths while running
 
         self.box = gtk.HBox()
         self.box.pack_start(self._name, padding=6)
         self.box.pack_start(self._run_button, expand=False)
         self.box.pack_start(self._reset_button, expand=False)
         self.box.pack_start(self._mark_button, expand=False)
-        self.box.pack_end(eb, expand=False, padding=6)
+        self.box.pack_end(self._time_display.display, expand=False, padding=6)
         
-        markfont = pango.FontDescription()
-        markfont.set_family("monospace")
-        markfont.set_size(pango.SCALE*10)
-        self._marks_label = gtk.Label()
-        self._marks_label.modify_font(markfont)
-        self._marks_label.set_single_line_mode(True)
-        self._marks_label.set_selectable(True)
-        self._marks_label.set_alignment(0, 0.5) #justify left
-        self._marks_label.set_padding(6,0)
+        self._marks_view = MarksView(self._keypress_cb)
         self._marks_model.register_listener(self._update_marks)
-        eb2 = gtk.EventBox()
-        eb2.add(self._marks_label)
-        eb2.modify_bg(gtk.STATE_NORMAL, gtk.gdk.color_parse("white"))
         
         filler0 = gtk.VBox()
         filler0.pack_start(self.box, expand=False, fill=False)
-        filler0.pack_start(eb2, expand=False, fill=False)
+        filler0.pack_start(self._marks_view.display, expand=False, fill=False)
         
         filler = gtk.VBox()
         filler.pack_start(filler0, expand=True, fill=False)
         
         self.backbox = gtk.EventBox()
         self.backbox.add(filler)
-        self._black = gtk.gdk.color_parse("black")
-        self._gray = gtk.gdk.Color(256*192, 256*192, 256*192)
+        self._black = resources.color("black")
+        self._gray = resources.color("#c000c000c000")
         
         self.display = gtk.EventBox()
         self.display.add(self.backbox)
@@ -250,75 +560,93 @@ class OneWatchView():
         
         self._watch_model.register_view_listener(self.update_state)
         
-        thread.start_new_thread(self._start_running, ())
-        
     def update_state(self, q):
+        """Post a new state from the model.  This may be called from any thread
+        and never blocks; only the latest state posted before the next frame
+        is displayed."""
         self._logger.debug("update_state: "+str(q))
         self._update_lock.acquire()
-        self._logger.debug("acquired update_lock")
-        self._state = q[1]
-        self._offset = self._timer.get_offset()
-        if self._state == WatchModel.STATE_RUNNING:
-            self._timeval = q[0]
-            self._set_run_button_active(True)
-            self._should_update.set()
-        else:
-            self._set_run_button_active(False)
-            self._should_update.clear()
-            self._label_lock.acquire()
-            self._timeval = q[0]
-            ev = threading.Event()
-            gobject.idle_add(self._update_label, self._format(self._timeval), ev)
-            ev.wait()
-            self._label_lock.release()
+        self._pending_state = q
         self._update_lock.release()
+        scheduler.post(self)
     
     def _update_name_cb(self, name):
         self._logger.debug("_update_name_cb " + name)
-        thread.start_new_thread(self.update_name, (name,))
+        self.update_name(name)
     
     def update_name(self, name):
+        """Post a new name from the model, like update_state"""
         self._logger.debug("update_name " + name)
-        self._name_lock.acquire()
-        self._name.set_editable(False)
-        self._name.handler_block(self._name_changed_handler)
-        ev = threading.Event()
-        gobject.idle_add(self._set_name, name, ev)
-        ev.wait()
-        self._name.handler_unblock(self._name_changed_handler)
-        self._name.set_editable(True)
-        self._name_lock.release()
+        self._update_lock.acquire()
+        self._pending_name = name
+        self._update_lock.release()
+        scheduler.post(self)
+    
+    def _drain(self):
+        """Called by the FrameScheduler, in the main loop, to display the
+        latest state and name posted since the previous frame"""
+        self._update_lock.acquire()
+        q = self._pending_state
+        name = self._pending_name
+        marks = self._pending_marks
+        self._pending_state = None
+        self._pending_name = None
+        self._pending_marks = []
+        self._update_lock.release()
+        if self._destroyed:
+            return
+        if name is not None:
+            self._set_name(name)
+        if q is not None:
+            self._set_state(q)
+        if len(marks) > 0:
+            self._marks_view.add(marks)
+    
+    def _set_state(self, q):
+        self._state = q[1]
+        self._timeval = q[0]
+        if self._state == WatchModel.STATE_RUNNING:
+            self._set_run_button_active(True)
+            if self._is_visible.isSet():
+                scheduler.add(self)
+        else:
+            self._set_run_button_active(False)
+            scheduler.remove(self)
+            self._time_display.set_text(self._format(self._timeval))
             
-    def _set_name(self, name, ev):
+    def _set_name(self, name):
+        self._name.handler_block(self._name_changed_handler)
         self._name.set_text(name)
-        ev.set()
-        return False
+        self._name.handler_unblock(self._name_changed_handler)
         
     def _format(self, t):
-        return locale.format('%.2f', max(0,t))
+        return formatter.format(t)
     
-    def _update_label(self, string, ev):
-        self._time_label.set_text(string)
-        ev.set()
-        return False
+    def _format_seconds(self, t):
+        return formatter.format_seconds(t)
     
-    def _start_running(self):
-        self._logger.debug("_start_running")
-        ev = threading.Event()
-        while True:
-            self._should_update.wait()
-            self._is_visible.wait()
-            self._label_lock.acquire()
-            if self._should_update.isSet() and self._is_visible.isSet():
-                s = self._format(time.time() + self._timer.offset - self._timeval)
-                ev.clear()
-                gobject.idle_add(self._update_label, s, ev)
-                ev.wait()
-                time.sleep(0.07)
-            self._label_lock.release()
+    def _tick(self):
+        """Called by the FrameScheduler, in the main loop, while running.
+        Returns the number of seconds until the label next needs redrawing.
+        A watch showing hundredths is redrawn every frame.  One showing whole
+        seconds wakes once per second, just after the second changes: the
+        FrameScheduler may draw a view up to SLACK early, so the delay is
+        extended by SLACK, lest the view show the previous second and be
+        woken again at once."""
+        if self._state != WatchModel.STATE_RUNNING:
+            return 1.0
+        t = max(0, self._timer.time() - self._timeval)
+        if self._precise:
+            self._time_display.set_text(self._format(t))
+            if scheduler.on_battery:
+                return FrameScheduler.BATTERY_INTERVAL
+            return FrameScheduler.INTERVAL
+        else:
+            self._time_display.set_text(self._format_seconds(t))
+            return 1.0 - (t % 1.0) + FrameScheduler.SLACK
     
     def _run_cb(self, widget):
-        t = time.time()
+        t = self._timer.time()
         self._logger.debug("run button pressed: " + str(t))
         if self._run_button.get_active(): #button has _just_ been set active
             action = WatchModel.RUN_EVENT
@@ -326,68 +654,122 @@ class OneWatchView():
         else:
             action = WatchModel.PAUSE_EVENT
             suspend.uninhibit()
-        self._watch_model.add_event_from_view((self._timer.get_offset() + t, action))
+        self._watch_model.add_event_from_view((t, action))
         return True
         
     def _set_run_button_active(self, v):
-        self._run_button_lock.acquire()
         self._run_button.handler_block(self._run_handler)
         self._run_button.set_active(v)
         self._run_button.handler_unblock(self._run_handler)
-        self._run_button_lock.release()
             
     def _reset_cb(self, widget):
-        t = time.time()
+        t = self._timer.time()
         self._logger.debug("reset button pressed: " + str(t))
-        self._watch_model.add_event_from_view((self._timer.get_offset() + t, WatchModel.RESET_EVENT))
+        self._watch_model.add_event_from_view((t, WatchModel.RESET_EVENT))
         return True
     
     def _mark_cb(self, widget):
-        t = time.time() + self._offset
+        t = self._timer.time()
         self._logger.debug("mark button pressed: " + str(t))
         s = self._state
         tval = self._timeval
         if s == WatchModel.STATE_RUNNING:
-            self._marks_model.add(max(0.0, t - tval))
+            mark = max(0.0, t - tval)
         elif s == WatchModel.STATE_PAUSED:
-            self._marks_model.add(tval)
-        self._update_marks()
+            mark = tval
+        else:
+            return
+        self._marks_model.add(mark)
+        self._marks_view.add([mark])
     
-    def _update_marks(self, diffset=None):
-        L = list(self._marks_model)
-        L.sort()
-        s = [self._format(num) for num in L]
-        p = " ".join(s)
-        self._marks_label.set_text(p)
+    def _update_marks(self, diffset):
+        """Post marks added by another user, like update_state"""
+        self._update_lock.acquire()
+        self._pending_marks.extend(diffset)
+        self._update_lock.release()
+        scheduler.post(self)
     
     def _name_cb(self, widget):
-        self._name_model.set_value(widget.get_text())
+        #share the name once typing pauses, instead of after every keystroke
+        if self._name_source is not None:
+            gobject.source_remove(self._name_source)
+        self._name_source = gobject.timeout_add(int(OneWatchView.NAME_DELAY*1000), self._name_timeout)
         return True
+    
+    def _name_timeout(self):
+        self._name_source = None
+        self._name_model.set_value(self._name.get_text())
+        return False
+    
+    def commit_name(self):
+        """Share the name being typed now, if there is one"""
+        if self._name_source is not None:
+            gobject.source_remove(self._name_source)
+            self._name_timeout()
+    
+    def _name_activate_cb(self, widget):
+        self.commit_name()
+    
+    def _name_focus_out_cb(self, widget, event):
+        self.commit_name()
+        return False
         
     def pause(self):
         self._logger.debug("pause")
         self._is_visible.clear()
+        scheduler.remove(self)
     
     def resume(self):
         self._logger.debug("resume")
         self._is_visible.set()
+        if self._state == WatchModel.STATE_RUNNING:
+            scheduler.add(self)
+    
+    def destroy(self):
+        """Detach from the models and destroy the widgets"""
+        self._logger.debug("destroy")
+        self._update_lock.acquire()
+        self._destroyed = True
+        self._update_lock.release()
+        self.commit_name()
+        scheduler.forget(self)
+        self._watch_model.register_view_listener(None)
+        self._name_model.unregister_listener(self._update_name_cb)
+        self._marks_model.unregister_listener(self._update_marks)
+        self.display.destroy()
     
     def refresh(self):
         """Make sure display is up-to-date"""
         self._update_name_cb(self._name_model.get_value())
-        thread.start_new_thread(self.update_state, (self._watch_model.get_state(),))
-        self._update_marks()
+        self.update_state(self._watch_model.get_state())
+        self._marks_view.refresh(list(self._marks_model))
+    
+    def set_whole_seconds(self, whole):
+        """Show only whole seconds while running, unless focused"""
+        self._whole_seconds = whole
+        self._update_precision()
+    
+    def _update_precision(self):
+        precise = self._focused or not self._whole_seconds
+        if precise != self._precise:
+            self._precise = precise
+            if self._state == WatchModel.STATE_RUNNING and self._is_visible.isSet():
+                scheduler.add(self) #redraw at the new precision now
     
     def _got_focus_cb(self, widget, event):
         self._logger.debug("got focus")
         self.backbox.modify_bg(gtk.STATE_NORMAL, self._black)
         self._name.modify_bg(gtk.STATE_NORMAL, self._black)
+        self._focused = True
+        self._update_precision()
         return True
     
     def _lost_focus_cb(self, widget, event):
         self._logger.debug("lost focus")
         self.backbox.modify_bg(gtk.STATE_NORMAL, self._gray)
         self._name.modify_bg(gtk.STATE_NORMAL, self._gray)
+        self._focused = False
+        self._update_precision()
         return True
     
     # KP_End == check gamekey = 65436
@@ -395,6 +777,7 @@ class OneWatchView():
     # KP_Home == box gamekey = 65429
     # KP_Page_Up == O gamekey = 65434
     def _keypress_cb(self, widget, event):
+        """Returns True if the key was a game key, and was used"""
         self._logger.debug("key press: " + gtk.gdk.keyval_name(event.keyval)+ " " + str(event.keyval))
         if event.keyval == 65436:
             self._run_button.clicked()
@@ -402,78 +785,468 @@ class OneWatchView():
             self._reset_button.clicked()
         elif event.keyval == 65435:
             self._mark_button.clicked()
-        return False
+        else:
+            return False
+        return True
             
+
+class WatchList():
+    """WatchList shows the watches in a scrollable column.  Only the rows in
+    view, and MARGIN rows on either side, exist as OneWatchViews; the others
+    are built by make_row(i) when they scroll into view and destroyed when
+    they scroll out of it, so a watch that is off screen costs no widgets.
+    Nothing is built until the window has been laid out, and then rows are
+    built one at a time from the main loop, those in view first, so the
+    first frame is drawn without waiting for any of them.
+    Every row has the natural height of the first row built, or more if the
+    rows would not otherwise fill the window."""
+    MARGIN = 2 #rows built beyond each edge of the window
+    
+    def __init__(self, make_row):
+        self._logger = logging.getLogger('stopwatch.WatchList')
+        self._make_row = make_row
+        self._count = 0
+        self._rows = {} #row -> OneWatchView
+        self._row_height = None #natural height of a row
+        self._height = 0 #height of every row, as laid out
+        self._width = 0
+        self._shown = None #row to scroll into view at the next update
+        self._paused = False
+        self._source = None
+        self._wanted = [] #rows still to be built, most urgent first
+        self._build_source = None
+        
+        self._layout = gtk.Layout()
+        self._layout.connect('size-allocate', self._allocate_cb)
+        self.display = gtk.ScrolledWindow()
+        self.display.set_policy(gtk.POLICY_NEVER, gtk.POLICY_AUTOMATIC)
+        self.display.add(self._layout)
+        self.display.get_vadjustment().connect('value-changed', self._scroll_cb)
+    
+    def set_count(self, n):
+        self._count = n
+        self._queue_update()
+    
+    def show_row(self, i):
+        """Scroll row i into view"""
+        self._shown = i
+        self._queue_update()
+    
+    def refresh(self):
+        for v in self._rows.values():
+            v.refresh()
+    
+    def set_whole_seconds(self, whole):
+        for v in self._rows.values():
+            v.set_whole_seconds(whole)
+    
+    def commit_names(self):
+        """Share the names being typed in any row now"""
+        for v in self._rows.values():
+            v.commit_name()
+    
+    def pause(self):
+        self._paused = True
+        for v in self._rows.values():
+            v.pause()
+    
+    def resume(self):
+        self._paused = False
+        for v in self._rows.values():
+            v.resume()
+    
+    def _allocate_cb(self, widget, allocation):
+        self._queue_update()
+    
+    def _scroll_cb(self, adjustment):
+        self._queue_update()
+    
+    def _queue_update(self):
+        #rows are only built and moved from the main loop, never during
+        #size allocation
+        if self._source is None:
+            self._source = gobject.idle_add(self._update)
+    
+    def _update(self):
+        self._source = None
+        allocation = self._layout.get_allocation()
+        if self._count == 0 or allocation.height <= 1:
+            return False #not laid out yet
+        if self._row_height is None:
+            v = self._make_row(0)
+            v.display.show_all()
+            self._row_height = max(1, v.display.size_request()[1])
+            self._layout.put(v.display, 0, 0)
+            if self._paused:
+                v.pause()
+            self._rows[0] = v
+        height = max(self._row_height, allocation.height // self._count)
+        if (height, allocation.width) != (self._height, self._width):
+            self._height = height
+            self._width = allocation.width
+            for (i, v) in self._rows.iteritems():
+                v.display.set_size_request(self._width, height)
+                self._layout.move(v.display, 0, i*height)
+        self._layout.set_size(self._width, height*self._count)
+        adjustment = self.display.get_vadjustment()
+        if self._shown is not None:
+            top = adjustment.get_value()
+            y = self._shown*height
+            if y < top:
+                adjustment.set_value(y)
+            elif y + height > top + allocation.height:
+                adjustment.set_value(min(y + height - allocation.height, height*self._count - allocation.height))
+            self._shown = None
+        top = int(adjustment.get_value())
+        first = max(0, top // height - WatchList.MARGIN)
+        last = min(self._count, (top + allocation.height) // height + 1 + WatchList.MARGIN)
+        for i in [i for i in self._rows if not first <= i < last]:
+            self._rows.pop(i).destroy()
+        #the rows in the window first, from the top, then the margins
+        bottom = min(self._count, (top + allocation.height - 1) // height + 1)
+        visible = range(max(0, top // height), bottom)
+        self._wanted = visible + [i for i in xrange(first, last) if i not in visible]
+        if self._build_source is None:
+            self._build_source = gobject.idle_add(self._build)
+        return False
+    
+    def _build(self):
+        """Build the first wanted row that does not exist yet.  Rows are built
+        one per main loop iteration, so the window is drawn, and stays
+        responsive, while they are being made."""
+        while len(self._wanted) > 0:
+            i = self._wanted.pop(0)
+            if i not in self._rows:
+                v = self._make_row(i)
+                v.display.set_size_request(self._width, self._height)
+                self._layout.put(v.display, 0, i*self._height)
+                v.display.show_all()
+                if self._paused:
+                    v.pause()
+                self._rows[i] = v
+                break
+        if len(self._wanted) > 0:
+            return True
+        self._build_source = None
+        return False
+
+def _watch_index(name):
+    """Returns the watch that the DObject called name belongs to, or None"""
+    m = re.match(r'(name|watch|marks)(\d+)(/|$)', name)
+    if m is None:
+        return None
+    return int(m.group(2))
+
 class GUIView():
-    NUM_WATCHES = 9
+    NUM_WATCHES = 9 #watches in a new session
+    HISTORY_HORIZON = 600.0 #seconds of watch history kept before compaction
+    PACKED = False #keep events and marks in PackedListSets
 
-    def __init__(self, tubebox, timer):
+    def __init__(self, tubebox, timer, num_watches=NUM_WATCHES):
+        """The models of each watch are only created when it is first shown,
+        changed, or heard of from another member, so a session may have any
+        number of watches, and idle ones cost next to nothing."""
+        self._logger = logging.getLogger('stopwatch.GUIView')
         self.timer = timer
-        self._views = []
-        self._names = []
-        self._watches = []
-        self._markers = []
-        for i in xrange(GUIView.NUM_WATCHES):
-            name_handler = dobject.UnorderedHandler("name"+str(i), tubebox)
-            name_model = dobject.Latest(name_handler, gettext("Stopwatch") + " " + locale.str(i+1), time_handler=timer, translator=dobject.string_translator)
-            self._names.append(name_model)
-            watch_handler = dobject.UnorderedHandler("watch"+str(i), tubebox)
-            watch_model = WatchModel(watch_handler)
-            self._watches.append(watch_model)
-            marks_handler = dobject.UnorderedHandler("marks"+str(i), tubebox)
-            marks_model = dobject.AddOnlySet(marks_handler, translator = dobject.float_translator)
-            self._markers.append(marks_model)
-            watch_view = OneWatchView(watch_model, name_model, marks_model, timer)
-            self._views.append(watch_view)
-            
+        self._models = {} #watch -> (name, watch, marks) models
+        self._models_lock = threading.RLock()
+        self._whole_seconds = False
+        self._journal = None
+        self._unloaded = {} #watch -> (name, nametime, basestate, basescore, columns) still in a mapped file
+        self._unloaded_lock = threading.Lock()
+        #load everything before the Multiplexer can be asked for it
+        tubebox.register_listener(self._tube_cb)
+        self._mux = dobject.Multiplexer("stopwatch", tubebox, missing=self._missing)
+        #watches are never removed, so the number of watches is the highest
+        #number any member has had
+        self._count = dobject.HighScore(self._mux.handler("count"), num_watches, num_watches,
+                     dobject.int_translator, dobject.int_translator)
+        
+        self._list = WatchList(self._make_row)
+        add = gtk.Button(gettext("Add stopwatch"))
+        add.set_image(gtk.image_new_from_stock(gtk.STOCK_ADD, gtk.ICON_SIZE_BUTTON))
+        add.props.focus_on_click = False
+        add.connect('clicked', self._add_cb)
+        clock = gtk.ToggleButton(gettext("Hours and minutes"))
+        clock.props.focus_on_click = False
+        clock.set_active(formatter.get_clock())
+        clock.connect('toggled', self._clock_cb)
+        whole = gtk.ToggleButton(gettext("Whole seconds"))
+        whole.props.focus_on_click = False
+        whole.connect('toggled', self._whole_seconds_cb)
+        buttons = gtk.HBox()
+        buttons.pack_start(add, expand=False, fill=False)
+        buttons.pack_end(clock, expand=False, fill=False)
+        buttons.pack_end(whole, expand=False, fill=False)
+        
         self.display = gtk.VBox()
-        for x in self._views:
-            self.display.pack_start(x.display, expand=True, fill=True)
+        self.display.pack_start(self._list.display, expand=True, fill=True)
+        self.display.pack_start(buttons, expand=False, fill=False)
         
+        self._count.register_listener(self._count_cb)
         self._pause_lock = threading.Lock()
     
+    def get_count(self):
+        """Returns the number of watches"""
+        return self._count.get_value()
+    
+    def add_watch(self):
+        """Add a watch, for every member of the group, and show it"""
+        n = self.get_count() + 1
+        self._grow(n)
+        self._list.show_row(n - 1)
+    
+    def _add_cb(self, widget):
+        self.add_watch()
+        return True
+    
+    def set_clock_mode(self, clock):
+        """Show times as h:mm:ss.cc if clock is true, or else as seconds"""
+        formatter.set_clock(clock)
+        self._list.refresh()
+    
+    def _clock_cb(self, widget):
+        self.set_clock_mode(widget.get_active())
+        return True
+    
+    def set_whole_seconds(self, whole):
+        """Show only whole seconds on running watches other than the focused
+        one, which then wake once per second instead of every frame"""
+        self._whole_seconds = whole
+        self._list.set_whole_seconds(whole)
+    
+    def _whole_seconds_cb(self, widget):
+        self.set_whole_seconds(widget.get_active())
+        return True
+    
+    def _grow(self, n):
+        """Make sure there are at least n watches"""
+        if n > self.get_count():
+            self._count.set_value(n, n)
+            gobject.idle_add(self._show_count)
+    
+    def _count_cb(self, value, score):
+        gobject.idle_add(self._show_count)
+    
+    def _show_count(self):
+        self._list.set_count(self.get_count())
+        return False
+    
+    def _default_name(self, i):
+        return gettext("Stopwatch") + " " + locale.str(i+1)
+    
+    def _get_models(self, i):
+        """Returns the (name, watch, marks) models of watch i, creating them
+        if necessary"""
+        self._models_lock.acquire()
+        models = self._models.get(i)
+        if models is None:
+            name_handler = self._mux.handler("name"+str(i))
+            name_model = dobject.Latest(name_handler, self._default_name(i), time_handler=self.timer, translator=dobject.string_translator)
+            watch_handler = self._mux.handler("watch"+str(i))
+            watch_model = WatchModel(watch_handler, GUIView.HISTORY_HORIZON, GUIView.PACKED)
+            marks_handler = self._mux.handler("marks"+str(i))
+            if GUIView.PACKED:
+                factory = functools.partial(dobject.PackedListSet, 'd')
+            else:
+                factory = dobject.ListSet
+            marks_model = dobject.AddOnlySortedSet(marks_handler, translator = dobject.float_translator,
+                     factory=factory)
+            models = (name_model, watch_model, marks_model)
+            self._models[i] = models
+            if self._journal is not None:
+                self._attach(self._journal, i, models)
+            if i in self._unloaded:
+                gobject.idle_add(self._materialize, i)
+        self._models_lock.release()
+        return models
+    
+    def _missing(self, name):
+        """Called by the Multiplexer for a DObject it has not seen, which
+        belongs to a watch another member has used first"""
+        i = _watch_index(name)
+        if i is not None:
+            self._grow(i+1)
+            self._get_models(i)
+    
+    def _make_row(self, i):
+        (name_model, watch_model, marks_model) = self._get_models(i)
+        v = OneWatchView(watch_model, name_model, marks_model, self.timer)
+        v.set_whole_seconds(self._whole_seconds)
+        return v
+    
     def get_names(self):
-        return [n.get_value() for n in self._names]
+        names = []
+        for i in xrange(self.get_count()):
+            models = self._models.get(i)
+            if models is None:
+                names.append(self._default_name(i))
+            else:
+                names.append(models[0].get_value())
+        return names
     
     def set_names(self, namestate):
-        for i in xrange(GUIView.NUM_WATCHES):
-            self._names[i].set_value(namestate[i])
+        self._grow(len(namestate))
+        for i in xrange(len(namestate)):
+            self._get_models(i)[0].set_value(namestate[i])
     
     def get_state(self):
-        return [(w.get_state(), w.get_last_update_time()) for w in self._watches]
+        states = []
+        for i in xrange(self.get_count()):
+            models = self._models.get(i)
+            if models is None:
+                states.append((WatchModel._default_basestate, float("-inf")))
+            else:
+                states.append((models[1].get_state(), models[1].get_last_update_time()))
+        return states
         
     def set_state(self,states):
-        for i in xrange(GUIView.NUM_WATCHES):
-            self._watches[i].reset(states[i][0], states[i][1])
-            if self._watches[i].is_running():
+        self._grow(len(states))
+        for i in xrange(len(states)):
+            watch_model = self._get_models(i)[1]
+            watch_model.reset(states[i][0], states[i][1])
+            if watch_model.is_running():
                 suspend.inhibit()
     
     def get_marks(self):
-        return [list(m) for m in self._markers]
+        marks = []
+        for i in xrange(self.get_count()):
+            models = self._models.get(i)
+            if models is None:
+                marks.append([])
+            else:
+                marks.append(list(models[2]))
+        return marks
     
     def set_marks(self, marks):
-        for i in xrange(GUIView.NUM_WATCHES):
-            self._markers[i].update(marks[i])
+        self._grow(len(marks))
+        for i in xrange(len(marks)):
+            self._get_models(i)[2].update(marks[i])
     
     def get_all(self):
+        self._materialize_all()
         return (self.timer.get_offset(), self.get_names(), self.get_state(), self.get_marks())
     
+    def get_save_data(self):
+        """Returns (offset, watches) in the form written by savefile"""
+        self._materialize_all()
+        watches = []
+        for i in xrange(self.get_count()):
+            models = self._models.get(i)
+            if models is None:
+                empty = array.array('d')
+                watches.append((self._default_name(i), float("-inf"), WatchModel._default_basestate,
+                                float("-inf"), empty, array.array('i'), empty))
+            else:
+                (name_model, watch_model, marks_model) = models
+                (basestate, basescore, times, types) = watch_model.get_saved()
+                (marks,) = marks_model.columns('d')
+                watches.append((name_model.get_value(), name_model.get_time(),
+                                basestate, basescore, times, types, marks))
+        return (self.timer.get_offset(), watches)
+    
+    def set_save_data(self, data):
+        """Restore (offset, watches) as read by savefile or journal, without
+        broadcasting or journaling any of it.  An offset or name of None is
+        left unchanged."""
+        (offset, watches) = data
+        if offset is not None:
+            self.timer.set_offset(offset)
+        self._grow(len(watches))
+        for i in xrange(len(watches)):
+            (name, nametime, basestate, basescore, times, types, marks) = watches[i]
+            if name in (None, self._default_name(i)) and basescore == float("-inf") \
+                    and len(times) == 0 and len(marks) == 0:
+                continue #an idle watch needs no models
+            (name_model, watch_model, marks_model) = self._get_models(i)
+            if name is not None:
+                name_model.restore(name, nametime)
+            watch_model.restore(basestate, basescore, times, types)
+            if watch_model.is_running():
+                suspend.inhibit()
+            marks_model.load_columns([marks])
+        self._list.refresh()
+    
     def set_all(self, q):
         self.timer.set_offset(q[0])
         self.set_names(q[1])
         self.set_state(q[2])
         self.set_marks(q[3])
-        for v in self._views:
-            v.refresh()
+        self._list.refresh()
+    
+    def set_mapped_data(self, data):
+        """Restore (offset, watches) as returned by savefile.map_file.  Each
+        watch is only read from the map, and merged without its history and
+        marks being broadcast, once it has been shown, or when the whole
+        session is needed."""
+        (offset, watches) = data
+        self.timer.set_offset(offset)
+        self._grow(len(watches))
+        for i in xrange(len(watches)):
+            (name, nametime, basestate, basescore, columns) = watches[i]
+            if name == self._default_name(i) and basescore == float("-inf") and columns.is_empty():
+                continue
+            self._unloaded_lock.acquire()
+            self._unloaded[i] = (name, nametime, basestate, basescore, columns)
+            self._unloaded_lock.release()
+            self._models_lock.acquire()
+            if i in self._models: #already shown
+                gobject.idle_add(self._materialize, i)
+            self._models_lock.release()
+    
+    def _materialize(self, i):
+        """Load watch i from the mapped file, if it is still there"""
+        self._unloaded_lock.acquire()
+        entry = self._unloaded.pop(i, None)
+        self._unloaded_lock.release()
+        if entry is not None:
+            (name, nametime, basestate, basescore, columns) = entry
+            (times, types, marks) = columns.load()
+            (name_model, watch_model, marks_model) = self._get_models(i)
+            name_model.restore(name, nametime)
+            watch_model.restore(basestate, basescore, times, types)
+            if watch_model.is_running():
+                suspend.inhibit()
+            marks_model.load_columns([marks])
+        return False
+    
+    def _materialize_all(self):
+        for i in self._unloaded.keys():
+            self._materialize(i)
+    
+    def _tube_cb(self, tube, is_initiator):
+        self._materialize_all()
+    
+    def attach_journal(self, journal):
+        """Record every later change to any watch in journal, including
+        watches whose models are created later"""
+        self._models_lock.acquire()
+        self._journal = journal
+        for (i, models) in self._models.items():
+            self._attach(journal, i, models)
+        self._models_lock.release()
+    
+    def _attach(self, journal, i, models):
+        (name_model, watch_model, marks_model) = models
+        name_model.register_change_listener(functools.partial(self._journal_name, journal, i))
+        watch_model.register_change_listeners(functools.partial(journal.add_events, i),
+                                              functools.partial(journal.add_base, i))
+        marks_model.register_change_listener(functools.partial(journal.add_marks, i))
+    
+    def _journal_name(self, journal, i, name, t):
+        journal.add_name(i, name, t)
+    
+    def flush(self):
+        """Send every queued change now, as before the activity exits"""
+        self._list.commit_names()
+        self._mux.flush()
     
     def pause(self):
         self._pause_lock.acquire()
-        for w in self._views:
-            w.pause()
+        self._list.pause()
         self._pause_lock.release()
     
     def resume(self):
         self._pause_lock.acquire()
-        for w in self._views:
-            w.resume()
+        self._list.resume()
         self._pause_lock.release()
@@ -0,0 +1,180 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""A FakeBus connects DObject handlers in one process, standing in for a
+Telepathy tube.  Each member gets a FakeTube offering the parts of the tube
+connection that the handlers use.  Signals and method calls are queued, and
+delivered in order by run(), after marshalling their arguments as the bus
+would, so that joins can be interleaved at will."""
+
+import dbus
+import dbus.lowlevel
+import gobject
+
+def _marshal(signature, args):
+    """Round-trip args through a message, as the bus would"""
+    message = dbus.lowlevel.SignalMessage('/', 'org.dobject.FakeBus', 'marshal')
+    message.append(signature=signature, *args)
+    return message.get_args_list()
+
+class FakeBus:
+    def __init__(self):
+        self._tubes = []
+        self._queue = []
+        self._next = 1
+        self.calls = [] #(caller, callee, member) of every method call
+        self.signals = [] #(sender, member) of every signal
+
+    def join(self, name=None):
+        """Returns the tube of a new member, and tells the others about it"""
+        if name is None:
+            name = ':1.' + str(self._next)
+        tube = FakeTube(self, name, self._next)
+        self._next += 1
+        for other in self._tubes:
+            other._notify([(tube.handle, tube.name)], [])
+        self._tubes.append(tube)
+        return tube
+
+    def leave(self, tube):
+        self._tubes.remove(tube)
+        for other in self._tubes:
+            other._notify([], [(tube.handle, tube.name)])
+
+    def _find(self, name):
+        for tube in self._tubes:
+            if tube.name == name:
+                return tube
+        return None
+
+    def _post(self, f, *args, **kwargs):
+        self._queue.append((f, args, kwargs))
+
+    def step(self):
+        """Deliver one queued signal, call or reply.  Returns False if there
+        was nothing to deliver."""
+        context = gobject.main_context_default()
+        while context.pending():
+            context.iteration(False)
+        if len(self._queue) == 0:
+            return False
+        (f, args, kwargs) = self._queue.pop(0)
+        f(*args, **kwargs)
+        return True
+
+    def run(self, limit=100000):
+        """Deliver everything, including what is sent in response"""
+        n = 0
+        while self.step():
+            n += 1
+            if n > limit:
+                raise AssertionError("the bus does not quiesce")
+        return n
+
+    def _emit(self, sender, message):
+        args = message.get_args_list()
+        self.signals.append((sender, message.get_member()))
+        for tube in list(self._tubes):
+            self._post(tube._receive, sender, message.get_interface(), message.get_member(), message.get_path(), args)
+
+    def _call(self, caller, callee, path, member, args, reply_handler, error_handler):
+        self.calls.append((caller, callee, member))
+        self._post(self._dispatch, caller, callee, path, member, args, reply_handler, error_handler)
+
+    def _dispatch(self, caller, callee, path, member, args, reply_handler, error_handler):
+        tube = self._find(callee)
+        obj = None
+        if tube is not None:
+            obj = tube._objects.get(path)
+        func = getattr(obj, member, None)
+        if not getattr(func, '_dbus_is_method', False):
+            self._post(error_handler, dbus.exceptions.DBusException("no method " + member + " at " + str(callee) + path))
+            return
+        kwargs = {}
+        if func._dbus_sender_keyword is not None:
+            kwargs[func._dbus_sender_keyword] = caller
+        try:
+            result = func(*_marshal(func._dbus_in_signature, args), **kwargs)
+        except Exception as e:
+            self._post(error_handler, e)
+            return
+        n = len(list(dbus.Signature(func._dbus_out_signature)))
+        if n == 0:
+            result = ()
+        elif n == 1:
+            result = (result,)
+        self._post(reply_handler, *_marshal(func._dbus_out_signature, result))
+
+class FakeTube:
+    """The connection of one member to a FakeBus"""
+    def __init__(self, bus, name, handle):
+        self._bus = bus
+        self.name = name
+        self.handle = handle
+        self._objects = {} #path -> exported object
+        self._receivers = []
+        self._watchers = []
+
+    def get_unique_name(self):
+        return self.name
+
+    def get_object(self, name, path):
+        return FakeProxy(self, name, path)
+
+    def add_signal_receiver(self, handler, signal_name=None, dbus_interface=None, sender_keyword=None, path=None):
+        self._receivers.append((handler, signal_name, dbus_interface, sender_keyword, path))
+
+    def watch_participants(self, callback):
+        self._watchers.append(callback)
+        members = [(tube.handle, tube.name) for tube in self._bus._tubes]
+        self._bus._post(callback, members, [])
+
+    def _notify(self, added, removed):
+        for callback in self._watchers:
+            self._bus._post(callback, added, removed)
+
+    def _receive(self, sender, interface, member, path, args):
+        if self not in self._bus._tubes:
+            return
+        for (handler, signal_name, dbus_interface, sender_keyword, p) in list(self._receivers):
+            if (signal_name, dbus_interface, p) == (member, interface, path):
+                kwargs = {}
+                if sender_keyword is not None:
+                    kwargs[sender_keyword] = sender
+                handler(*args, **kwargs)
+
+    #The parts of dbus.connection.Connection that dbus.service.Object uses
+    def _register_object_path(self, path, on_message, on_unregister=None, fallback=False):
+        self._objects[path] = on_message.im_self
+
+    def _unregister_object_path(self, path):
+        del self._objects[path]
+
+    def send_message(self, message):
+        self._bus._emit(self.name, message)
+
+class FakeProxy:
+    def __init__(self, tube, name, path):
+        self._tube = tube
+        self._name = name
+        self._path = path
+
+    def __getattr__(self, member):
+        if member.startswith('_'):
+            raise AttributeError(member)
+        def call(*args, **kwargs):
+            self._tube._bus._call(self._tube.name, self._name, self._path, member, args, kwargs['reply_handler'], kwargs['error_handler'])
+        return call
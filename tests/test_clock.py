@@ -0,0 +1,242 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import random
+import unittest
+
+import dobject_helpers
+from dobject_helpers import ClockEstimator, FakeClock
+
+class Peer:
+    """A simulated member whose clock reads group time, offset seconds ahead
+    of the local FakeClock, and gaining drift seconds per second on it"""
+    def __init__(self, clock, offset, name='peer', error=0.0, drift=0.0):
+        self.clock = clock
+        self.name = name
+        self.error = error
+        self.drift = drift
+        self._start = (clock.time(), offset)
+    
+    def _get_offset(self):
+        (t0, offset) = self._start
+        return offset + self.drift*(self.clock.time() - t0)
+    
+    offset = property(_get_offset)
+    
+    def exchange(self, estimator, there, back, processing=0.001):
+        """Probe the peer, with transfer delays of there and back seconds"""
+        ask = self.clock.time()
+        self.clock.advance(there)
+        start = self.clock.time() + self.offset
+        self.clock.advance(processing)
+        finish = self.clock.time() + self.offset
+        self.clock.advance(back)
+        receive = self.clock.time()
+        return estimator.add_sample(ask, start, finish, receive, self.error, self.name)
+
+def _delay(rng):
+    #a mesh link: mostly a few ms, with long queueing delays now and then
+    d = 0.005 + rng.expovariate(1/0.02)
+    if rng.random() < 0.2:
+        d += rng.uniform(0.1, 1.0)
+    return d
+
+class ClockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.old_clock = dobject_helpers.get_clock()
+        dobject_helpers.set_clock(self.clock)
+        self.rng = random.Random(14)
+    
+    def tearDown(self):
+        dobject_helpers.set_clock(self.old_clock)
+    
+    def estimate_error(self, peer, est):
+        """The error of the estimate, which get_offset() approaches by
+        slewing"""
+        return abs(est.offset - peer.offset)
+
+class ClockEstimatorTest(ClockTestCase):
+    def test_unknown(self):
+        est = ClockEstimator()
+        self.assertFalse(est.is_known())
+        self.assertEqual(est.get_error(), float('inf'))
+        self.assertEqual(est.get_sender(), None)
+    
+    def test_symmetric_delays_are_exact(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 12.5)
+        (offset, error) = peer.exchange(est, 0.3, 0.3)
+        self.assertAlmostEqual(offset, 12.5)
+        self.assertAlmostEqual(error, 0.3)
+        self.assertTrue(est.is_known())
+        self.assertAlmostEqual(est.get_offset(), 12.5)
+        self.assertAlmostEqual(est.time(), self.clock.time() + 12.5)
+        self.assertEqual(est.get_sender(), 'peer')
+    
+    def test_error_bounds_the_offset(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, -40.0, error=0.01)
+        for i in xrange(200):
+            (offset, error) = peer.exchange(est, _delay(self.rng), _delay(self.rng))
+            self.assertTrue(abs(offset - peer.offset) <= error + 1e-9)
+            self.assertTrue(self.estimate_error(peer, est) <= est.get_error() + 1e-9)
+            self.clock.advance(0.25)
+    
+    def test_smallest_error_wins(self):
+        est = ClockEstimator()
+        slow = Peer(self.clock, 5.0, 'slow')
+        fast = Peer(self.clock, 5.0, 'fast')
+        slow.exchange(est, 0.01, 0.8)
+        self.assertEqual(est.get_sender(), 'slow')
+        fast.exchange(est, 0.01, 0.02)
+        self.assertEqual(est.get_sender(), 'fast')
+        self.assertTrue(self.estimate_error(fast, est) < 0.01)
+        slow.exchange(est, 0.5, 0.01)
+        self.assertEqual(est.get_sender(), 'fast')
+    
+    def test_more_probes_beat_the_first_reply(self):
+        first = []
+        best = []
+        for trial in xrange(200):
+            est = ClockEstimator()
+            peer = Peer(self.clock, self.rng.uniform(-100, 100))
+            for i in xrange(8): #TimeHandler.PROBES, PROBE_INTERVAL apart
+                peer.exchange(est, _delay(self.rng), _delay(self.rng))
+                if i == 0:
+                    first.append(self.estimate_error(peer, est))
+                self.clock.advance(0.25)
+            best.append(self.estimate_error(peer, est))
+        first.sort()
+        best.sort()
+        #the median error shrinks severalfold, and the worst case tenfold
+        self.assertTrue(best[100]*3 < first[100])
+        self.assertTrue(best[-1]*10 < first[-1])
+    
+    def test_samples_age(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 1.0)
+        peer.exchange(est, 0.01, 0.01)
+        error = est.get_error()
+        self.clock.advance(1000.0)
+        self.assertAlmostEqual(est.get_error(), error + 1000.0*ClockEstimator.MAX_DRIFT)
+        #an old precise sample loses to a fresh, less precise one
+        peer.exchange(est, 0.03, 0.03)
+        self.assertAlmostEqual(est.get_error(), 0.03)
+    
+    def test_only_recent_samples_are_kept(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 1.0)
+        peer.exchange(est, 0.001, 0.001)
+        for i in xrange(ClockEstimator.SAMPLES):
+            peer.exchange(est, 0.1, 0.1)
+        self.assertTrue(est.get_error() > 0.1)
+    
+    def test_set_offset(self):
+        est = ClockEstimator()
+        est.set_offset(7.0, 0.5)
+        self.assertTrue(est.is_known())
+        self.assertEqual(est.get_offset(), 7.0)
+        self.assertEqual(est.get_error(), 0.5)
+        est.set_offset(-3.0) #takes effect at once
+        self.assertEqual(est.get_offset(), -3.0)
+        self.assertEqual(est.get_sender(), None)
+    
+    def test_reference_has_no_error(self):
+        est = ClockEstimator()
+        est.set_reference(True)
+        est.set_offset(0.0, 0.2)
+        self.clock.advance(3600.0)
+        self.assertEqual(est.get_error(), 0.0)
+
+class DriftTest(ClockTestCase):
+    def sync(self, est, peer, n, interval, noise=0.0):
+        for i in xrange(n):
+            there = 0.01 + self.rng.uniform(0, noise)
+            back = 0.01 + self.rng.uniform(0, noise)
+            peer.exchange(est, there, back)
+            self.clock.advance(interval)
+    
+    def test_no_drift_before_span(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 3.0, drift=5e-5)
+        self.sync(est, peer, 4, ClockEstimator.DRIFT_SPAN/8)
+        self.assertEqual(est.get_drift(), 0.0)
+    
+    def test_drift_estimate(self):
+        for drift in (5e-5, -2e-5, 0.0):
+            est = ClockEstimator()
+            peer = Peer(self.clock, 3.0, drift=drift)
+            self.sync(est, peer, 20, 60.0, 0.002)
+            self.assertTrue(abs(est.get_drift() - drift) < 5e-6)
+            #extrapolated along the drift, the offset stays close
+            self.clock.advance(600.0)
+            self.assertTrue(abs(est.get_offset() - peer.offset) < 0.005)
+    
+    def test_drift_is_bounded(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 3.0, drift=1e-3)
+        self.sync(est, peer, 20, 60.0)
+        self.assertEqual(est.get_drift(), ClockEstimator.MAX_DRIFT)
+    
+    def test_slew(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 10.0)
+        peer.exchange(est, 0.5, 0.01) #off by about 0.25 s
+        self.assertAlmostEqual(est.get_offset(), 10.245) #the first estimate is applied at once
+        peer.exchange(est, 0.01, 0.01)
+        self.assertAlmostEqual(est.offset, 10.0)
+        #the correction is applied at SLEW_RATE, never as a step
+        correction = 0.245
+        span = correction/ClockEstimator.SLEW_RATE
+        start = est.get_offset()
+        for i in xrange(100):
+            self.clock.advance(span/50)
+            expected = max(10.0, start - ClockEstimator.SLEW_RATE*(i + 1)*span/50)
+            self.assertAlmostEqual(est.get_offset(), expected)
+        self.assertAlmostEqual(est.get_offset(), 10.0)
+    
+    def test_time_never_decreases(self):
+        est = ClockEstimator()
+        peer = Peer(self.clock, 0.0, drift=2e-5)
+        peer.exchange(est, 0.01, 0.01)
+        last = (self.clock.time(), est.time())
+        bound = ClockEstimator.SLEW_RATE + ClockEstimator.MAX_DRIFT + 1e-9
+        for i in xrange(2000):
+            #jittery samples pull the estimate both ways
+            peer.exchange(est, self.rng.uniform(0.001, 0.5), self.rng.uniform(0.001, 0.5))
+            self.clock.advance(self.rng.uniform(0, 0.2))
+            (t, g) = (self.clock.time(), est.time())
+            self.assertTrue(g >= last[1])
+            self.assertTrue(1 - bound <= (g - last[1])/(t - last[0]) <= 1 + bound)
+            last = (t, g)
+    
+    def test_step_is_slewed(self):
+        est = ClockEstimator()
+        Peer(self.clock, 0.0).exchange(est, 0.01, 0.01)
+        Peer(self.clock, 2.0).exchange(est, 0.001, 0.001) #a better answer, 2 s away
+        last = (self.clock.time(), est.time())
+        #2 s at SLEW_RATE takes 40 s
+        for i in xrange(390):
+            self.clock.advance(0.1)
+            (t, g) = (self.clock.time(), est.time())
+            self.assertAlmostEqual((g - last[1])/(t - last[0]), 1 + ClockEstimator.SLEW_RATE)
+            last = (t, g)
+        self.clock.advance(1.0)
+        self.assertAlmostEqual(est.get_offset(), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
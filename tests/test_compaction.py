@@ -0,0 +1,172 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import array
+import unittest
+
+try:
+    import dobject
+except ImportError:
+    dobject = None
+
+try:
+    from stopwatch import WatchModel
+except ImportError:
+    WatchModel = None
+
+class StubHandler:
+    """Stands in for an UnorderedHandler, keeping what is sent instead of
+    broadcasting it"""
+    def __init__(self, name='watch'):
+        self._name = name
+        self.sent = []
+        self.children = {}
+
+    def register(self, obj):
+        self.obj = obj
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def copy(self, name):
+        h = StubHandler(self._name + '/' + name)
+        self.children[name] = h
+        return h
+
+    def get_path(self):
+        return '/' + self._name
+
+    def get_tube(self):
+        return None
+
+def _event(i):
+    """The i-th event of a watch that is started, stopped, and now and then
+    reset, once a second"""
+    if i % 10 == 9:
+        return (float(i), WatchModel.RESET_EVENT)
+    elif i % 2 == 0:
+        return (float(i), WatchModel.RUN_EVENT)
+    else:
+        return (float(i), WatchModel.PAUSE_EVENT)
+
+@unittest.skipIf(dobject is None, "needs dbus-python and pygobject")
+class ForgetTest(unittest.TestCase):
+    def setUp(self):
+        self.handler = StubHandler()
+        self.set = dobject.AddOnlySortedSet(self.handler, [float(i) for i in xrange(10)])
+
+    def test_forget(self):
+        self.set.forget(4.0)
+        self.assertEqual(list(self.set), [float(i) for i in xrange(5, 10)])
+        #a lower floor changes nothing
+        self.set.forget(2.0)
+        self.assertEqual(list(self.set), [float(i) for i in xrange(5, 10)])
+
+    def test_below_floor(self):
+        self.set.forget(4.0)
+        self.set.add(3.0)
+        self.set.add(4.0)
+        self.set.update([1.0, 4.5, 12.0])
+        self.set.receive_message([2.0, 11.0])
+        self.assertEqual(list(self.set), [4.5, 5.0, 6.0, 7.0, 8.0, 9.0, 11.0, 12.0])
+        #only what was kept is passed on
+        self.assertEqual([list(m) for m in self.handler.sent], [[4.5, 12.0]])
+
+    def test_load_columns_below_floor(self):
+        self.set.forget(4.0)
+        self.set.load_columns([array.array('d', [0.5, 3.5, 20.0])])
+        self.assertEqual(list(self.set), [5.0, 6.0, 7.0, 8.0, 9.0, 20.0])
+
+@unittest.skipIf(WatchModel is None, "needs gtk, sugar, dbus-python and pygobject")
+class CompactionTest(unittest.TestCase):
+    HORIZON = 10.0
+
+    def setUp(self):
+        self.handler = StubHandler()
+        self.model = WatchModel(self.handler, self.HORIZON)
+
+    def _fold(self, events):
+        q = WatchModel._default_basestate
+        for ev in sorted(events):
+            q = self.model._step(q, ev)
+        return q
+
+    def test_in_order(self):
+        events = []
+        for i in xrange(200):
+            events.append(_event(i))
+            self.model.add_event_from_view(events[-1])
+            self.assertEqual(self.model.get_state(), self._fold(events))
+            #the history holds the horizon, and less than a checkpoint interval
+            #of older events
+            self.assertTrue(len(self.model._history) <= self.HORIZON + WatchModel.CHECKPOINT_INTERVAL)
+        (basestate, basescore) = self.model._base_state.get_pair()
+        self.assertEqual(self.model._history.first()[0], basescore + 1)
+        self.assertEqual(basestate, self._fold([e for e in events if e[0] <= basescore]))
+        #each compaction is passed on as a new base state
+        self.assertTrue(len(self.handler.children['basestate'].sent) > 0)
+
+    def test_late_event(self):
+        events = [_event(i) for i in xrange(100)]
+        for ev in events:
+            self.model.add_event_from_view(ev)
+        floor = self.model._base_state.get_score()
+        late = (floor + 1.5, WatchModel.RESET_EVENT)
+        self.model._history.receive_message([self.model._trans(late, True)])
+        events.append(late)
+        self.assertEqual(self.model.get_state(), self._fold(events))
+
+    def test_below_floor(self):
+        for i in xrange(100):
+            self.model.add_event_from_view(_event(i))
+        floor = self.model._base_state.get_score()
+        state = self.model.get_state()
+        n = len(self.model._history)
+        old = (floor - 0.5, WatchModel.RUN_EVENT)
+        self.model._history.receive_message([self.model._trans(old, True)])
+        self.model.add_event_from_view((floor, WatchModel.RESET_EVENT))
+        self.assertEqual(len(self.model._history), n)
+        self.assertEqual(self.model.get_state(), state)
+
+    def _source(self):
+        """A model that has compacted its history, and the messages it sent"""
+        for i in xrange(150):
+            self.model.add_event_from_view(_event(i))
+        events = []
+        for message in self.handler.sent:
+            events.extend(message)
+        return (self.model._base_state.get_history(), events)
+
+    def _check(self, peer):
+        self.assertEqual(peer.get_state(), self.model.get_state())
+        self.assertEqual(list(peer._history), list(self.model._history))
+
+    def test_base_state_first(self):
+        (base, events) = self._source()
+        peer = WatchModel(StubHandler(), None)
+        peer._base_state.receive_message(base)
+        peer._history.receive_message(events)
+        self._check(peer)
+
+    def test_base_state_last(self):
+        (base, events) = self._source()
+        peer = WatchModel(StubHandler(), None)
+        peer._history.receive_message(events)
+        peer._base_state.receive_message(base)
+        self._check(peer)
+
+if __name__ == '__main__':
+    unittest.main()
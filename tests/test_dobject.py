@@ -0,0 +1,117 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import unittest
+
+try:
+    import dobject
+except ImportError:
+    dobject = None
+
+class StubHandler:
+    """Stands in for an UnorderedHandler"""
+    def register(self, obj):
+        self.obj = obj
+
+    def send(self, message):
+        pass
+
+def _concat(old, new):
+    return old + new
+
+@unittest.skipIf(dobject is None, "needs dbus-python and pygobject")
+class SendQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.queue = dobject.SendQueue(lambda key, message: self.emitted.append((key, message)), 10.0, 5)
+
+    def tearDown(self):
+        self.queue.flush() #removes the timeout
+
+    def test_coalesce(self):
+        self.queue.queue('a', [1], _concat)
+        self.queue.queue('b', [2], _concat)
+        self.queue.queue('a', [3], _concat)
+        self.queue.queue('c', [4], None)
+        self.queue.queue('c', [5], None)
+        self.assertEqual(self.emitted, [])
+        self.queue.flush()
+        #in the order first queued, merged by key, except without coalesce
+        self.assertEqual(self.emitted, [('a', [1, 3]), ('b', [2]), ('c', [4]), ('c', [5])])
+        self.assertEqual(self.queue.get_sent_count(), 4)
+        self.assertEqual(self.queue.get_coalesced_count(), 1)
+
+    def test_flush_at_limit(self):
+        for i in xrange(4):
+            self.queue.queue('a', [i], _concat)
+        self.assertEqual(self.emitted, [])
+        #the limit counts queued messages, merged or not
+        self.queue.queue('b', [9], _concat)
+        self.assertEqual(self.emitted, [('a', [0, 1, 2, 3]), ('b', [9])])
+        self.queue.queue('a', [10], _concat)
+        self.assertEqual(len(self.emitted), 2)
+        self.queue.flush()
+        self.assertEqual(self.emitted[-1], ('a', [10]))
+        self.assertEqual(self.queue.get_sent_count(), 3)
+        self.assertEqual(self.queue.get_coalesced_count(), 3)
+
+    def test_no_interval(self):
+        queue = dobject.SendQueue(lambda key, message: self.emitted.append((key, message)), 0)
+        queue.queue('a', [1], _concat)
+        queue.queue('a', [2], _concat)
+        self.assertEqual(self.emitted, [('a', [1]), ('a', [2])])
+        self.assertEqual(queue.get_sent_count(), 2)
+        self.assertEqual(queue.get_coalesced_count(), 0)
+
+@unittest.skipIf(dobject is None, "needs dbus-python and pygobject")
+class CoalesceTest(unittest.TestCase):
+    def test_highscore(self):
+        h = dobject.HighScore(StubHandler(), 'a', 0, dobject.string_translator, dobject.int_translator)
+        self.assertEqual(h.coalesce(('a', 1), ('b', 2)), ('b', 2))
+        self.assertEqual(h.coalesce(('b', 2), ('a', 1)), ('b', 2))
+        #a tie keeps the first, as a receiver of both would
+        self.assertEqual(h.coalesce(('a', 1), ('b', 1)), ('a', 1))
+
+    def test_highscore_break_ties(self):
+        h = dobject.HighScore(StubHandler(), 'a', 0, dobject.string_translator, dobject.int_translator, True)
+        self.assertEqual(h.coalesce(('a', 1, 0.9), ('b', 2, 0.1)), ('b', 2, 0.1))
+        self.assertEqual(h.coalesce(('a', 1, 0.2), ('b', 1, 0.7)), ('b', 1, 0.7))
+        self.assertEqual(h.coalesce(('a', 1, 0.7), ('b', 1, 0.2)), ('a', 1, 0.7))
+
+    def test_sets(self):
+        for s in (dobject.AddOnlySet(StubHandler()), dobject.AddOnlySortedSet(StubHandler())):
+            merged = s.coalesce([1, 2], [2, 3])
+            self.assertEqual(set(merged), set([1, 2, 3]))
+            s.receive_message(merged)
+            self.assertEqual(set(s), set([1, 2, 3]))
+
+    def test_queue(self):
+        #one HighScore and one set coalesced in one queue keep their order
+        emitted = []
+        queue = dobject.SendQueue(lambda key, message: emitted.append((key, message)), 10.0)
+        h = dobject.HighScore(StubHandler(), 'a', 0)
+        s = dobject.AddOnlySet(StubHandler())
+        queue.queue('h', ('a', 1), h.coalesce)
+        queue.queue('s', [1], s.coalesce)
+        queue.queue('h', ('c', 3), h.coalesce)
+        queue.queue('h', ('b', 2), h.coalesce)
+        queue.queue('s', [2], s.coalesce)
+        queue.flush()
+        self.assertEqual([(key, list(message)) for (key, message) in emitted], [('h', ['c', 3]), ('s', [1, 2])])
+        self.assertEqual(queue.get_coalesced_count(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
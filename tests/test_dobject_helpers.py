@@ -0,0 +1,371 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import random
+import unittest
+
+import dobject_helpers
+from dobject_helpers import *
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(1)
+    
+    def test_set_operations(self):
+        for i in xrange(50):
+            a = sorted(set(self.rng.randrange(40) for j in xrange(self.rng.randrange(30))))
+            b = sorted(set(self.rng.randrange(40) for j in xrange(self.rng.randrange(30))))
+            self.assertEqual(merge_or(a, b), sorted(set(a) | set(b)))
+            self.assertEqual(merge_and(a, b), sorted(set(a) & set(b)))
+            self.assertEqual(merge_sub(a, b), sorted(set(a) - set(b)))
+            self.assertEqual(merge_xor(a, b), sorted(set(a) ^ set(b)))
+    
+    def test_merge_new(self):
+        for i in xrange(200):
+            a = sorted(set(self.rng.randrange(50) for j in xrange(self.rng.randrange(40))))
+            b = sorted(self.rng.randrange(50) for j in xrange(self.rng.randrange(40)))
+            (union, new) = merge_new(a, b) #b has duplicates
+            self.assertEqual(union, sorted(set(a) | set(b)))
+            self.assertEqual(new, sorted(set(b) - set(a)))
+    
+    def test_merge_new_edges(self):
+        self.assertEqual(merge_new([], []), ([], []))
+        self.assertEqual(merge_new([], [1, 1, 2]), ([1, 2], [1, 2]))
+        self.assertEqual(merge_new([1, 2], []), ([1, 2], []))
+        self.assertEqual(merge_new([1, 2], [1, 2, 2]), ([1, 2], []))
+        self.assertEqual(merge_new([1], [2, 2, 3, 3]), ([1, 2, 3], [2, 3]))
+        self.assertEqual(merge_new([1, 3], [0, 2, 4]), ([0, 1, 2, 3, 4], [0, 2, 4]))
+        a = range(10)
+        self.assertTrue(merge_new(a, [3, 3, 9])[0] is a) #nothing new
+        self.assertEqual(merge_new(a, [9, 10, 10, 11]), (range(12), [10, 11]))
+    
+    def test_kill_dupes(self):
+        self.assertEqual(kill_dupes([1, 1, 2, 3, 3, 3]), [1, 2, 3])
+
+class ListSetTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(3)
+    
+    def _check(self, s, expected):
+        expected = sorted(expected)
+        self.assertEqual(len(s), len(expected))
+        self.assertEqual(list(s), expected)
+        self.assertEqual(s._list, expected)
+    
+    def test_add_across_blocks(self):
+        s = ListSet()
+        ref = set()
+        for i in xrange(5*ListSet.LOAD):
+            x = self.rng.randrange(10**6)
+            s.add(x)
+            ref.add(x)
+        self.assertTrue(len(s._blocks) > 2)
+        self._check(s, ref)
+        L = sorted(ref)
+        for i in xrange(0, len(L), 97):
+            self.assertEqual(s[i], L[i])
+            self.assertEqual(s.position(L[i]), i)
+            self.assertEqual(s.index(L[i]), i)
+            self.assertTrue(L[i] in s)
+        self.assertFalse(-1 in s)
+        self.assertEqual(s[-1], L[-1])
+        self.assertRaises(IndexError, s.__getitem__, len(L))
+        self.assertRaises(ValueError, s.index, -1)
+    
+    def test_remove(self):
+        L = range(0, 6*ListSet.LOAD, 3)
+        s = ListSet(L)
+        ref = set(L)
+        for i in xrange(len(L)//2):
+            x = self.rng.choice(L)
+            s.discard(x)
+            ref.discard(x)
+        self._check(s, ref)
+        del s[:ListSet.LOAD + 5] #the prefix fast path
+        self._check(s, sorted(ref)[ListSet.LOAD + 5:])
+        s.pop(0)
+        self._check(s, sorted(ref)[ListSet.LOAD + 6:])
+    
+    def test_slices(self):
+        L = range(3*ListSet.LOAD)
+        s = ListSet(L)
+        self.assertEqual(list(s[10:1000]), L[10:1000])
+        self.assertEqual(list(s[::7]), L[::7])
+        self.assertEqual(list(s.subset(100, 200)), L[100:200])
+        self.assertEqual(list(s.headset(50)), L[:50])
+        self.assertEqual(list(s.tailset(1500)), L[1500:])
+    
+    def test_set_operations(self):
+        a = set(self.rng.randrange(3000) for i in xrange(2000))
+        b = set(self.rng.randrange(3000) for i in xrange(2000))
+        (A, B) = (ListSet(a), ListSet(b))
+        self._check(A | B, a | b)
+        self._check(A & B, a & b)
+        self._check(A - B, a - b)
+        self._check(A ^ B, a ^ b)
+        C = A.copy()
+        C |= B
+        self._check(C, a | b)
+        self._check(A, a)
+        self.assertEqual(ListSet(a), A)
+        self.assertTrue(A & B <= A)
+    
+    def test_absorb(self):
+        base = [self.rng.random() for i in xrange(4*ListSet.LOAD)]
+        for size in (0, 1, 10, 100, 10000): #small and large relative to the set
+            s = ListSet(base)
+            batch = [self.rng.random() for i in xrange(size)]
+            batch += self.rng.sample(base, min(size, len(base))) #already present
+            batch += batch[:size//2] #duplicated within the batch
+            self.rng.shuffle(batch) #and unsorted
+            new = s.absorb(batch)
+            self.assertEqual(new, sorted(set(batch) - set(base)))
+            self._check(s, set(base) | set(batch))
+    
+    def test_absorb_nothing_new(self):
+        s = ListSet(range(100))
+        blocks = s._blocks
+        self.assertEqual(s.absorb(range(100)[::-1]), [])
+        self.assertTrue(s._blocks is blocks)
+    
+    def test_columns(self):
+        events = [(float(i), i % 3) for i in xrange(100)]
+        s = ListSet(events[:50])
+        cols = ListSet(events[25:]).columns('di')
+        self.assertEqual([c.typecode for c in cols], ['d', 'i'])
+        new = s.absorb_columns(cols)
+        self.assertTrue(isinstance(new, ListSet))
+        self.assertEqual(list(new), events[50:])
+        self._check(s, events)
+        marks = ListSet([1.0, 2.0])
+        self.assertEqual(list(marks.columns('d')[0]), [1.0, 2.0])
+        self.assertEqual(list(marks.absorb_columns(marks.columns('d'))), [])
+
+class PackedListSetTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(4)
+        self.numpy = dobject_helpers.numpy
+    
+    def tearDown(self):
+        dobject_helpers.numpy = self.numpy
+    
+    def _events(self, n, span):
+        return set((float(self.rng.randrange(span)), self.rng.randrange(2)) for i in xrange(n))
+    
+    def _test_operations(self):
+        a = self._events(500, 400)
+        b = self._events(500, 400)
+        (A, B) = (PackedListSet('di', a), PackedListSet('di', b))
+        self.assertEqual(len(A), len(a))
+        self.assertEqual(list(A | B), sorted(a | b))
+        self.assertEqual(list(A & B), sorted(a & b))
+        self.assertEqual(list(A - B), sorted(a - b))
+        self.assertEqual(list(A ^ B), sorted(a ^ b))
+        self.assertEqual(list(A | ListSet(b)), sorted(a | b))
+        m = set(self.rng.random() for i in xrange(300))
+        n = set(self.rng.random() for i in xrange(300))
+        (M, N) = (PackedListSet('d', m), PackedListSet('d', n))
+        M |= N
+        self.assertEqual(list(M), sorted(m | n))
+    
+    def test_operations(self):
+        self._test_operations()
+    
+    def test_operations_without_numpy(self):
+        dobject_helpers.numpy = None
+        self._test_operations()
+    
+    def test_add_and_index(self):
+        s = PackedListSet('di')
+        for i in xrange(100):
+            s.add((float(i), 0)) #appended in order
+        s.add((50.5, 1))
+        s.add((50.5, 1))
+        s.add((-1.0, 0))
+        self.assertEqual(len(s), 102)
+        self.assertEqual(s[0], (-1.0, 0))
+        self.assertEqual(s[52], (50.5, 1))
+        self.assertEqual(s.position((50.5, 1)), 52)
+        self.assertTrue((50.5, 1) in s)
+        self.assertFalse((50.5, 0) in s)
+        s.discard((50.5, 1))
+        self.assertEqual(list(s), [(-1.0, 0)] + [(float(i), 0) for i in xrange(100)])
+        self.assertEqual(list(s[1:4]), [(0.0, 0), (1.0, 0), (2.0, 0)])
+        del s[:51]
+        self.assertEqual(s.first(), (50.0, 0))
+    
+    def test_absorb(self):
+        base = self._events(2000, 5000)
+        for size in (0, 10, PackedListSet.INSERTS + 1, 100, 5000):
+            s = PackedListSet('di', base)
+            batch = list(self._events(size, 5000))
+            batch += batch[:size//2]
+            self.rng.shuffle(batch)
+            new = s.absorb(batch)
+            self.assertEqual(list(new), sorted(set(batch) - base))
+            self.assertEqual(list(s), sorted(base | set(batch)))
+    
+    def test_absorb_after_last(self):
+        s = PackedListSet('di', [(float(i), 0) for i in xrange(50)])
+        batch = [(float(i), 1) for i in xrange(100, 50, -1)]
+        new = s.absorb(batch + batch[:5])
+        self.assertEqual(list(new), sorted(batch))
+        self.assertEqual(list(s), [(float(i), 0) for i in xrange(50)] + sorted(batch))
+    
+    def test_columns(self):
+        events = sorted(self._events(300, 1000))
+        s = PackedListSet('di', events[:200])
+        new = s.absorb_columns(PackedListSet('di', events[100:]).columns())
+        self.assertTrue(isinstance(new, PackedListSet))
+        self.assertEqual(list(new), events[200:])
+        self.assertEqual(list(s), events)
+        cols = s.columns()
+        cols[0][0] = -5.0 #a copy
+        self.assertEqual(s[0], events[0])
+        self.assertEqual(PackedListSet('di', events), ListSet(events))
+
+class DigestTest(unittest.TestCase):
+    def test_digests(self):
+        a = [(float(i), i % 2) for i in xrange(1000)]
+        b = a[:500] + a[501:] + [(5000.0, 1)]
+        self.assertEqual(item_hash(a[0]), item_hash((0.0, 0)))
+        (da, db) = (set_digest(a, 16), set_digest(b, 16))
+        self.assertEqual(len(da), 16)
+        self.assertEqual(sum(c for (c, h) in da), len(a))
+        self.assertEqual(set_digest(reversed(a), 16), da) #independent of order
+        buckets = digest_diff(da, db)
+        self.assertTrue(0 < len(buckets) <= 2)
+        self.assertEqual(digest_diff(da, da), [])
+        self.assertEqual(digest_diff(da, set_digest(a, 8)), range(16))
+        #exchanging only the differing buckets reconciles the sets
+        missing_a = set(bucket_items(b, buckets, 16)) - set(a)
+        missing_b = set(bucket_items(a, buckets, 16)) - set(b)
+        self.assertEqual(missing_a, set([(5000.0, 1)]))
+        self.assertEqual(missing_b, set([a[500]]))
+    
+    def test_new_items(self):
+        self.assertEqual(new_items([3, 1], [1, 2, 3, 4]), [2, 4])
+        self.assertEqual(new_items([[1]], [[1], [2]]), [[2]]) #unhashable
+        self.assertEqual(new_items([], [2, 1]), [2, 1])
+
+def _step(q, item):
+    #depends on the order of the items, so that a misplaced one shows
+    return (q*31 + int(item*7)) % 1000003
+
+def _fold(items, initial):
+    q = initial
+    for item in items:
+        q = _step(q, item)
+    return q
+
+class CheckpointedFoldTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(2)
+        self.steps = 0
+    
+    def _counting_step(self, q, item):
+        self.steps += 1
+        return _step(q, item)
+    
+    def test_append_in_order(self):
+        items = ListSet()
+        fold = CheckpointedFold(items, self._counting_step, 1, 8)
+        for i in xrange(100):
+            items.add(float(i))
+            self.steps = 0
+            q = fold.update(len(items) - 1)
+            self.assertEqual(q, _fold(items, 1))
+            self.assertEqual(self.steps, 1)
+    
+    def test_late_items(self):
+        items = ListSet([self.rng.random()*1000 for i in xrange(500)])
+        fold = CheckpointedFold(items, self._counting_step, 1, 16)
+        fold.update()
+        for i in xrange(200):
+            x = self.rng.random()*1000
+            items.add(x)
+            self.steps = 0
+            q = fold.update(items.position(x))
+            self.assertEqual(q, _fold(items, 1))
+            self.assertEqual(q, fold.get_state())
+            #only the items from the checkpoint before x on are replayed
+            self.assertEqual(self.steps, len(items) - (items.position(x) // 16)*16)
+    
+    def test_state_at(self):
+        items = ListSet([self.rng.random() for i in xrange(300)])
+        fold = CheckpointedFold(items, _step, 5, 32)
+        fold.update()
+        for n in (0, 1, 31, 32, 33, 100, 299, 300):
+            self.assertEqual(fold.state_at(n), _fold(items[:n], 5))
+    
+    def test_reset(self):
+        items = ListSet([float(i) for i in xrange(100)])
+        fold = CheckpointedFold(items, _step, 5, 8)
+        fold.update()
+        del items[:40] #as when a prefix is folded into a new initial state
+        q = _fold([float(i) for i in xrange(40)], 5)
+        self.assertEqual(fold.reset(q), _fold(xrange(100), 5))
+        self.assertEqual(fold.state_at(10), _fold(xrange(50), 5))
+
+class MembershipTest(unittest.TestCase):
+    def _join(self, me, present):
+        m = Membership()
+        #The first callback lists everyone present, including me
+        self.assertEqual(m.update(me, [(i, name) for (i, name) in enumerate(present + [me])], []), [])
+        return m
+    
+    def test_initiator_answers(self):
+        a = self._join(':a', [])
+        self.assertTrue(a.is_responder())
+        self.assertEqual(a.update(':a', [(1, ':b')], []), [':b'])
+    
+    def test_only_eldest_answers(self):
+        a = self._join(':a', [])
+        b = self._join(':b', [':a'])
+        a.update(':a', [(1, ':b')], [])
+        #:c joins while :b is still syncing; only :a answers it
+        self.assertEqual(a.update(':a', [(2, ':c')], []), [':c'])
+        self.assertEqual(b.update(':b', [(2, ':c')], []), [])
+        c = self._join(':c', [':a', ':b'])
+        self.assertFalse(b.is_responder())
+        self.assertFalse(c.is_responder())
+    
+    def test_names_do_not_matter(self):
+        #The lowest unique name is not the responder if it joined later
+        z = self._join(':z', [])
+        a = self._join(':a', [':z'])
+        self.assertEqual(z.update(':z', [(1, ':a')], []), [':a'])
+        self.assertEqual(a.update(':a', [(2, ':b')], []), [])
+        self.assertEqual(z.update(':z', [(2, ':b')], []), [':b'])
+    
+    def test_takeover(self):
+        b = self._join(':b', [':a'])
+        c = self._join(':c', [':a', ':b'])
+        b.update(':b', [(2, ':c')], [])
+        b.update(':b', [], [(0, ':a')])
+        c.update(':c', [], [(0, ':a')])
+        self.assertTrue(b.is_responder())
+        self.assertFalse(c.is_responder())
+        self.assertEqual(b.update(':b', [(3, ':d')], []), [':d'])
+        self.assertEqual(c.update(':c', [(3, ':d')], []), [])
+        c.update(':c', [], [(1, ':b')])
+        self.assertTrue(c.is_responder())
+    
+    def test_unknown_membership_answers(self):
+        self.assertTrue(Membership().is_responder())
+
+if __name__ == '__main__':
+    unittest.main()
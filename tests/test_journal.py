@@ -0,0 +1,214 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import array
+import shutil
+import struct
+import logging
+import tempfile
+import unittest
+
+import journal
+from journal import Journal
+
+logging.getLogger('stopwatch.Journal').addHandler(logging.NullHandler())
+
+def _watch(name, nametime, basestate, basescore, events, marks):
+    return (name, nametime, basestate, basescore,
+            array.array('d', [e[0] for e in events]),
+            array.array('i', [e[1] for e in events]),
+            array.array('d', marks))
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'journal')
+        self.session = (0.0, [])
+        self.limits = (Journal.FLUSH_LIMIT, Journal.COMPACT_MIN)
+    
+    def tearDown(self):
+        (Journal.FLUSH_LIMIT, Journal.COMPACT_MIN) = self.limits
+        shutil.rmtree(self.dir)
+    
+    def snapshot(self):
+        return self.session
+    
+    def open(self):
+        return Journal(self.path, self.snapshot)
+    
+    def read(self):
+        f = open(self.path, 'rb')
+        try:
+            return journal.read(f)
+        finally:
+            f.close()
+    
+    def data(self):
+        f = open(self.path, 'rb')
+        data = f.read()
+        f.close()
+        return data
+    
+    def test_new(self):
+        j = self.open()
+        self.assertEqual(self.read(), (None, []))
+        f = open(self.path, 'rb')
+        self.assertTrue(journal.is_journal(f))
+        self.assertEqual(f.tell(), 0)
+        f.close()
+        j.close()
+    
+    def test_round_trip(self):
+        j = self.open()
+        j.add_name(0, u'Caf\xe9', 5.0)
+        j.add_name(0, 'Older', 4.0) #arrives later, but was set earlier
+        j.add_base(1, (12.5, 1), 3.0)
+        j.add_base(1, (99.0, 2), 2.0) #a lower score does not win
+        j.add_events(1, [(3.0, 1), (1.0, 2)])
+        j.add_events(1, [(2.0, 1), (1.0, 2)])
+        j.add_marks(0, [2.5, 1.5])
+        j.add_marks(0, [1.5])
+        self.assertEqual(self.read(), (None, [])) #nothing is written before a flush
+        j.flush()
+        (offset, watches) = self.read()
+        self.assertEqual(offset, None)
+        self.assertEqual(watches[0], _watch(u'Caf\xe9'.encode('utf-8'), 5.0, (0.0, 0), float('-inf'), [], [1.5, 2.5]))
+        self.assertEqual(watches[1], _watch(None, float('-inf'), (12.5, 1), 3.0, [(1.0, 2), (2.0, 1), (3.0, 1)], []))
+        j.close()
+        #reopened, the journal is appended to
+        j = self.open()
+        j.add_name(1, 'Second', 1.0)
+        j.close()
+        self.assertEqual(self.read()[1][1][0], 'Second')
+        self.assertEqual(self.read()[1][0][0], u'Caf\xe9'.encode('utf-8'))
+    
+    def test_flush_limit(self):
+        Journal.FLUSH_LIMIT = 10
+        j = self.open()
+        j.add_marks(2, [float(i) for i in xrange(9)])
+        self.assertEqual(self.read(), (None, []))
+        j.add_marks(2, [9.0])
+        self.assertEqual(list(self.read()[1][2][6]), [float(i) for i in xrange(10)])
+        j.close()
+    
+    def test_torn_record(self):
+        j = self.open()
+        j.add_marks(0, [1.0])
+        j.flush()
+        j.add_marks(0, [2.0])
+        j.close()
+        data = self.data()
+        for cut in xrange(1, 8 + 12 + 1): #into the last record
+            f = open(self.path, 'wb')
+            f.write(data[:-cut])
+            f.close()
+            self.assertEqual(list(self.read()[1][0][6]), [1.0])
+            j = self.open() #drops the torn record, and appends after it
+            self.assertEqual(len(self.data()), len(data) - 8 - 12)
+            j.add_marks(0, [3.0])
+            j.close()
+            self.assertEqual(list(self.read()[1][0][6]), [1.0, 3.0])
+    
+    def test_corrupt_record(self):
+        j = self.open()
+        j.add_marks(0, [1.0])
+        j.flush()
+        j.add_marks(0, [2.0])
+        j.flush()
+        j.add_marks(0, [3.0])
+        j.close()
+        data = self.data()
+        pos = 12 + (12 + 8) + 12 #in the data of the second record
+        f = open(self.path, 'wb')
+        f.write(data[:pos] + chr(ord(data[pos]) ^ 1) + data[pos+1:])
+        f.close()
+        #the checksum fails, and the records after it are ignored too
+        self.assertEqual(list(self.read()[1][0][6]), [1.0])
+    
+    def test_unreadable(self):
+        f = open(self.path, 'wb')
+        f.write('STOPWTCH' + '\0'*100)
+        f.close()
+        self.assertRaises(ValueError, self.read)
+        j = self.open()
+        j.close()
+        self.assertFalse(os.path.exists(self.path)) #replaced by an empty journal
+    
+    def test_discard(self):
+        j = self.open()
+        j.add_marks(0, [1.0])
+        mark = j.get_mark()
+        j.add_marks(0, [2.0])
+        j.flush()
+        j.add_marks(0, [3.0]) #not yet flushed
+        j.discard(mark)
+        j.close()
+        self.assertEqual(list(self.read()[1][0][6]), [2.0, 3.0])
+    
+    def test_close_removes_empty(self):
+        j = self.open()
+        j.add_marks(0, [1.0])
+        j.discard(j.get_mark())
+        j.close()
+        self.assertFalse(os.path.exists(self.path))
+    
+    def test_compact(self):
+        j = self.open()
+        for i in xrange(100):
+            j.add_marks(0, [float(i)])
+            j.add_name(0, 'name %d' % i, float(i))
+            j.flush()
+        size = len(self.data())
+        self.session = (7.0, [_watch('name 99', 99.0, (1.0, 2), 4.0, [(0.5, 1)], [float(i) for i in xrange(100)])])
+        j.compact()
+        self.assertTrue(len(self.data()) < size)
+        self.assertEqual(self.read(), self.session)
+        j.add_marks(0, [100.0])
+        j.close()
+        (offset, watches) = self.read()
+        self.assertEqual(offset, 7.0)
+        self.assertEqual(watches, [_watch('name 99', 99.0, (1.0, 2), 4.0, [(0.5, 1)], [float(i) for i in xrange(101)])])
+    
+    def test_compact_when_grown(self):
+        Journal.COMPACT_MIN = 1000
+        self.session = (0.0, [_watch('w', 1.0, (0.0, 1), 0.0, [], [1.0])])
+        j = self.open()
+        for i in xrange(200):
+            j.add_marks(0, [1.0])
+            j.flush()
+            self.assertTrue(len(self.data()) < 1000 + 12 + 20)
+        j.close()
+        self.assertEqual(self.read()[1], self.session[1])
+    
+    def test_version_1(self):
+        #a journal of VERSION 1, whose names had no time
+        f = open(self.path, 'wb')
+        f.write(struct.pack('<8sI', journal.MAGIC, 1))
+        f.write(journal._record(journal.NAME, 0, 'Old'))
+        f.write(journal._record(journal.MARKS, 0, struct.pack('<d', 2.0)))
+        f.close()
+        self.assertEqual(self.read(), (None, [_watch('Old', 0.0, (0.0, 0), float('-inf'), [], [2.0])]))
+        #a Journal rewrites it in the current version, from the session it was replayed into
+        self.session = (0.0, [_watch('Old', 0.0, (0.0, 1), 0.0, [], [2.0])])
+        j = self.open()
+        j.add_name(0, 'New', 1.0)
+        j.close()
+        self.assertEqual(struct.unpack('<8sI', self.data()[:12]), (journal.MAGIC, journal.VERSION))
+        self.assertEqual(self.read()[1], [_watch('New', 1.0, (0.0, 1), 0.0, [], [2.0])])
+
+if __name__ == '__main__':
+    unittest.main()
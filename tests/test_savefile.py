@@ -0,0 +1,131 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+import array
+import struct
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+import savefile
+
+def _watch(i, n, m):
+    times = array.array('d', [i*1000.0 + k*0.5 for k in xrange(n)])
+    types = array.array('i', [1 + k % 2 for k in xrange(n)])
+    marks = array.array('d', [k*0.25 for k in xrange(m)])
+    return ('watch %d' % i, 100.0 + i, (float(i), 1 + i % 2), 7.5 + i, times, types, marks)
+
+def _session():
+    watches = [_watch(i, n, m) for (i, (n, m)) in enumerate([(0, 0), (1, 0), (0, 3), (5, 2), (1000, 300)])]
+    watches.append((u'Z\xfcrich \u231a', 0.0, (0.0, 1), float('-inf'), array.array('d'), array.array('i'), array.array('d')))
+    return (1234.5, watches)
+
+def _write_version_1(f, offset, watches):
+    """Write watches in the layout of VERSION 1, which had no name times"""
+    parts = [struct.pack('<8sII', savefile.MAGIC, 1, len(watches)), struct.pack('<d', offset)]
+    for (name, nametime, basestate, basescore, times, types, marks) in watches:
+        parts.append(struct.pack('<I', len(name)))
+        parts.append(name + '\0'*(-(len(name) + 4) % 8))
+        parts.append(struct.pack('<ddi4xII', basestate[0], basescore, basestate[1], len(times), len(marks)))
+        parts.append(times.tostring())
+        parts.append(types.tostring())
+        parts.append('\0'*(-len(types)*4 % 8))
+        parts.append(marks.tostring())
+    f.write(''.join(parts))
+
+class SaveFileTest(unittest.TestCase):
+    def _encoded(self, watches):
+        """watches as they read back, with the names in UTF-8"""
+        out = []
+        for w in watches:
+            name = w[0]
+            if isinstance(name, unicode):
+                name = name.encode('utf-8')
+            out.append((name,) + w[1:])
+        return out
+    
+    def _write(self, offset, watches):
+        f = StringIO()
+        savefile.write(f, offset, watches)
+        return f.getvalue()
+    
+    def test_round_trip(self):
+        (offset, watches) = _session()
+        data = self._write(offset, watches)
+        self.assertEqual(len(data) % 8, 0)
+        self.assertEqual(savefile.read(StringIO(data)), (offset, self._encoded(watches)))
+        self.assertEqual(self._write(offset, watches), data)
+    
+    def test_empty(self):
+        data = self._write(0.0, [])
+        self.assertEqual(savefile.parse(data), (0.0, []))
+    
+    def test_version_1(self):
+        (offset, watches) = _session()
+        f = StringIO()
+        _write_version_1(f, offset, self._encoded(watches))
+        (offset1, watches1) = savefile.parse(f.getvalue())
+        self.assertEqual(offset1, offset)
+        expected = [(w[0], 0.0) + tuple(w[2:]) for w in self._encoded(watches)]
+        self.assertEqual(watches1, expected)
+    
+    def test_truncated(self):
+        (offset, watches) = _session()
+        data = self._write(offset, watches)
+        for n in range(0, 200) + range(200, len(data), 97):
+            self.assertRaises(ValueError, savefile.parse, data[:n])
+            self.assertRaises(ValueError, savefile.parse, data[:n], True)
+    
+    def test_not_a_savefile(self):
+        self.assertRaises(ValueError, savefile.parse, 'STOPJRNL' + '\0'*32)
+        data = self._write(0.0, [])
+        future = struct.pack('<8sI', savefile.MAGIC, savefile.VERSION + 1) + data[12:]
+        self.assertRaises(ValueError, savefile.parse, future)
+    
+    def test_is_savefile(self):
+        f = StringIO('xx' + self._write(0.0, []))
+        f.seek(2)
+        self.assertTrue(savefile.is_savefile(f))
+        self.assertEqual(f.tell(), 2)
+        self.assertFalse(savefile.is_savefile(StringIO('(lp0\n')))
+    
+    def test_map_file(self):
+        (offset, watches) = _session()
+        (fd, path) = tempfile.mkstemp()
+        f = os.fdopen(fd, 'wb')
+        savefile.write(f, offset, watches)
+        f.close()
+        f = open(path, 'rb')
+        (offset1, mapped) = savefile.map_file(f)
+        f.close()
+        os.remove(path) #the map stays valid
+        self.assertEqual(offset1, offset)
+        for (w, m) in zip(self._encoded(watches), mapped):
+            self.assertEqual(m[:4], w[:4])
+            self.assertEqual(m[4].is_empty(), len(w[4]) == 0 and len(w[6]) == 0)
+            self.assertEqual(m[4].load(), w[4:])
+    
+    def test_lazy_parse(self):
+        (offset, watches) = _session()
+        data = self._write(offset, watches)
+        (offset1, lazy) = savefile.parse(data, lazy=True)
+        for (w, m) in zip(self._encoded(watches), lazy):
+            self.assertTrue(isinstance(m[4], savefile.MappedColumns))
+            self.assertEqual(m[:4] + m[4].load(), w)
+
+if __name__ == '__main__':
+    unittest.main()
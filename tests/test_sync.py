@@ -0,0 +1,200 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import unittest
+
+try:
+    import dobject
+    from fakebus import FakeBus
+except ImportError:
+    dobject = None
+
+#The calls with which a responder answers a newcomer
+ANSWERS = ('receive_digest', 'exchange_history')
+
+def _member(bus, make, name=None):
+    """Join bus as a new member, holding the UO make(handler)"""
+    box = dobject.TubeBox()
+    handler = dobject.UnorderedHandler('test', box, 0)
+    obj = make(handler)
+    tube = bus.join(name)
+    box.insert_tube(tube)
+    return (tube, obj)
+
+def _answered(bus, answers=ANSWERS):
+    """The (responder, newcomer) pairs, in the order first answered.  A
+    responder answers both the participants callback and ask_history."""
+    pairs = []
+    for (caller, callee, member) in bus.calls:
+        if (member in answers) and ((caller, callee) not in pairs):
+            pairs.append((caller, callee))
+    return pairs
+
+@unittest.skipIf(dobject is None, "needs dbus-python and pygobject")
+class UnorderedSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = FakeBus()
+
+    def _set(self, items, name=None):
+        return _member(self.bus, lambda h: dobject.AddOnlySet(h, items, dobject.int_translator), name)
+
+    def test_digest_sync(self):
+        (a, A) = self._set([1, 2, 3])
+        self.bus.run()
+        (b, B) = self._set([3, 4])
+        self.bus.run()
+        for s in (A, B):
+            self.assertEqual(set(s), set([1, 2, 3, 4]))
+        self.assertEqual(_answered(self.bus), [(a.name, b.name)])
+
+    def test_join_during_sync(self):
+        (a, A) = self._set([1, 2])
+        self.bus.run()
+        (b, B) = self._set([3])
+        self.bus.step()
+        #:c joins while the sync of :b is still in flight
+        (c, C) = self._set([4])
+        self.bus.run()
+        for s in (A, B, C):
+            self.assertEqual(set(s), set([1, 2, 3, 4]))
+        self.assertEqual(sorted(_answered(self.bus)), [(a.name, b.name), (a.name, c.name)])
+
+    def test_eldest_answers(self):
+        #The responder is the member present longest, not the lowest name
+        (z, Z) = self._set([1], ':1.9')
+        self.bus.run()
+        (y, Y) = self._set([2], ':1.5')
+        self.bus.run()
+        (x, X) = self._set([3], ':1.1')
+        self.bus.run()
+        self.assertEqual(_answered(self.bus), [(z.name, y.name), (z.name, x.name)])
+        self.bus.leave(z)
+        self.bus.run()
+        (w, W) = self._set([4], ':1.0')
+        self.bus.run()
+        self.assertEqual(_answered(self.bus)[-1], (y.name, w.name))
+        for s in (Y, X, W):
+            self.assertEqual(set(s), set([1, 2, 3, 4]))
+
+    def test_history_exchange(self):
+        #A UO without digests: the newcomer's history must reach everyone
+        make = lambda score: (lambda h: dobject.HighScore(h, 'v' + str(score), score, dobject.string_translator, dobject.int_translator))
+        (a, A) = _member(self.bus, make(1))
+        self.bus.run()
+        (b, B) = _member(self.bus, make(2))
+        self.bus.run()
+        (c, C) = _member(self.bus, make(5))
+        self.bus.run()
+        for s in (A, B, C):
+            self.assertEqual(s.get_pair(), ('v5', 5))
+        self.assertEqual(_answered(self.bus), [(a.name, b.name), (a.name, c.name)])
+        #:a shared what :c brought
+        self.assertTrue((a.name, 'share') in self.bus.signals)
+
+@unittest.skipIf(dobject is None, "needs dbus-python and pygobject")
+class MultiplexerSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = FakeBus()
+        self.muxes = {} #unique name -> Multiplexer
+
+    def _member(self, scores, sets):
+        """Join as a new member holding a HighScore per name in scores, and an
+        AddOnlySet per name in sets.  Sets that arrive from the network are
+        created as they would be by the owner."""
+        box = dobject.TubeBox()
+        objects = {}
+        def missing(name):
+            objects[name] = dobject.AddOnlySet(mux.handler(name), (), dobject.int_translator)
+        mux = dobject.Multiplexer('test', box, missing, 0)
+        for (name, score) in scores.iteritems():
+            objects[name] = dobject.HighScore(mux.handler(name), 'v' + str(score), score, dobject.string_translator, dobject.int_translator)
+        for (name, items) in sets.iteritems():
+            objects[name] = dobject.AddOnlySet(mux.handler(name), items, dobject.int_translator)
+        tube = self.bus.join()
+        self.muxes[tube.name] = mux
+        box.insert_tube(tube)
+        return (tube, objects)
+
+    def test_symmetric_join(self):
+        (a, A) = self._member({'x': 1}, {'s': [1, 2]})
+        self.bus.run()
+        (c, C) = self._member({'x': 0}, {'s': [2]})
+        self.bus.run()
+        #:b brings a higher score, new items, and a set nobody else has
+        (b, B) = self._member({'x': 5}, {'s': [3], 't': [7, 8]})
+        self.bus.run()
+        for objects in (A, B, C):
+            self.assertEqual(objects['x'].get_pair(), ('v5', 5))
+            self.assertEqual(set(objects['s']), set([1, 2, 3]))
+            self.assertEqual(set(objects['t']), set([7, 8]))
+        self.assertEqual(_answered(self.bus, ('receive_state',)), [(a.name, c.name), (a.name, b.name)])
+        self.assertTrue((a.name, 'share') in self.bus.signals)
+
+    def test_join_during_sync(self):
+        (a, A) = self._member({}, {'s': [1]})
+        self.bus.run()
+        (b, B) = self._member({}, {'s': [2]})
+        self.bus.step()
+        (c, C) = self._member({}, {'s': [3]})
+        self.bus.run()
+        for objects in (A, B, C):
+            self.assertEqual(set(objects['s']), set([1, 2, 3]))
+        self.assertEqual(sorted(_answered(self.bus, ('receive_state',))), [(a.name, b.name), (a.name, c.name)])
+
+    def test_late_ask(self):
+        (a, A) = self._member({'x': 1}, {'s': [1]})
+        self.bus.run()
+        (b, B) = self._member({'x': 2}, {'s': [2]})
+        self.bus.run()
+        told = []
+        mux = self.muxes[a.name]
+        tell = mux._tell
+        def record(sender, names):
+            told.append(sorted(names))
+            tell(sender, names)
+        mux._tell = record
+        calls = len(self.bus.calls)
+        #A UO registered later is asked for alone, and answered alone
+        B['u'] = dobject.AddOnlySet(self.muxes[b.name].handler('u'), [9], dobject.int_translator)
+        self.bus.run()
+        self.assertEqual(told, [['u']])
+        self.assertEqual([member for (caller, callee, member) in self.bus.calls[calls:]], ['receive_state', 'sync_state', 'sync_buckets'])
+        self.assertEqual(set(A['u']), set([9]))
+
+@unittest.skipIf(dobject is None, "needs dbus-python and pygobject")
+class TimeSyncTest(unittest.TestCase):
+    def _member(self, bus, is_initiator):
+        box = dobject.TubeBox()
+        handler = dobject.TimeHandler('time', box)
+        tube = bus.join()
+        box.insert_tube(tube, is_initiator)
+        return (tube, handler)
+
+    def test_reply_credits_probed_peer(self):
+        bus = FakeBus()
+        (a, A) = self._member(bus, True)
+        (b, B) = self._member(bus, False)
+        bus.run()
+        self.assertTrue(B.get_error() < float('inf'))
+        self.assertEqual(B._estimator.get_sender(), a.name)
+        B._probe()
+        #the best peer changes while the probe is in flight
+        B._peer = ':1.99'
+        bus.run()
+        self.assertEqual(B._estimator._samples[-1][3], a.name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import locale
+import random
+import unittest
+
+from timeformat import TimeFormatter, to_hundredths
+
+#the separators of de_DE, and of a locale whose groups vary in size
+GERMAN = {'decimal_point': ',', 'thousands_sep': '.', 'grouping': [3, 3, 0]}
+INDIAN = {'decimal_point': '.', 'thousands_sep': ',', 'grouping': [3, 2, 0]}
+NO_REPEAT = {'decimal_point': '.', 'thousands_sep': ' ', 'grouping': [3, locale.CHAR_MAX]}
+
+def _values(rng):
+    values = [0.0, 0.005, 0.015, 0.125, 0.375, 0.995, 1.005, 2.675, 59.995, 99.99,
+              3599.995, 1e6 + 0.125, 123456789.125]
+    values += [k/8.0 for k in xrange(200)] #exact halves of a hundredth and more
+    values += [rng.uniform(0, 10) for i in xrange(2000)]
+    values += [rng.uniform(0, 1e7) for i in xrange(2000)]
+    values += [rng.randrange(10**9)/100.0 + 0.005 for i in xrange(2000)] #near halves
+    return values
+
+class HundredthsTest(unittest.TestCase):
+    def test_like_printf(self):
+        for t in _values(random.Random(24)):
+            self.assertEqual(to_hundredths(t), int(('%.2f' % t).replace('.', '')))
+    
+    def test_halves(self):
+        self.assertEqual(to_hundredths(0.125), 12)
+        self.assertEqual(to_hundredths(0.375), 38)
+        self.assertEqual(to_hundredths(2.675), 267) #2.675 is just below the half
+        self.assertEqual(to_hundredths(1.005), 100)
+
+class TimeFormatterTest(unittest.TestCase):
+    def setUp(self):
+        self.localeconv = locale.localeconv
+        self.rng = random.Random(24)
+    
+    def tearDown(self):
+        locale.localeconv = self.localeconv
+    
+    def use(self, conv):
+        """Pretend that the current locale has the separators in conv"""
+        full = dict(self.localeconv())
+        full.update(conv)
+        locale.localeconv = lambda: full
+    
+    def test_like_locale_format(self):
+        f = TimeFormatter()
+        for t in _values(self.rng):
+            self.assertEqual(f.format(t), locale.format('%.2f', t))
+        self.assertEqual(f.format(-3.0), '0.00')
+    
+    def test_separators(self):
+        for conv in (GERMAN, INDIAN, NO_REPEAT):
+            self.use(conv)
+            plain = TimeFormatter()
+            grouped = TimeFormatter(grouping=True)
+            for t in _values(self.rng):
+                self.assertEqual(plain.format(t), locale.format('%.2f', t))
+                self.assertEqual(grouped.format(t), locale.format('%.2f', t, True))
+                self.assertEqual(grouped.format_seconds(t), locale.format('%d', int(t), True))
+        self.use(GERMAN)
+        self.assertEqual(TimeFormatter(grouping=True).format(1234567.891), '1.234.567,89')
+    
+    def test_reload(self):
+        f = TimeFormatter()
+        self.use(GERMAN)
+        self.assertEqual(f.format(1.5), '1.50') #until reloaded
+        f.reload()
+        self.assertEqual(f.format(1.5), '1,50')
+    
+    def test_clock(self):
+        self.use(GERMAN)
+        f = TimeFormatter(grouping=True)
+        self.assertFalse(f.get_clock())
+        f.set_clock(True)
+        self.assertTrue(f.get_clock())
+        self.assertEqual(f.format(0.0), '0:00:00,00')
+        self.assertEqual(f.format(59.999), '0:01:00,00')
+        self.assertEqual(f.format(3723.456), '1:02:03,46')
+        self.assertEqual(f.format(360000.0), '100:00:00,00') #never grouped
+        self.assertEqual(f.format_seconds(3723.999), '1:02:03')
+        for t in _values(self.rng):
+            n = int(('%.2f' % t).replace('.', ''))
+            (h, m, s, c) = (n//360000, n//6000 % 60, n//100 % 60, n % 100)
+            self.assertEqual(f.format(t), '%d:%02d:%02d,%02d' % (h, m, s, c))
+    
+    def test_format_seconds(self):
+        f = TimeFormatter()
+        self.assertEqual(f.format_seconds(0.999), '0')
+        self.assertEqual(f.format_seconds(59.99), '59')
+        self.assertEqual(f.format_seconds(-1.0), '0')
+        self.assertEqual(f.format_seconds(1234567.5), '1234567')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright 2026 agent
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import locale
+
+def to_hundredths(t):
+    """Returns the float t in hundredths, rounded as '%.2f' % t rounds it:
+    the exact binary value of t is rounded to the nearest hundredth, with
+    exact halves rounded to even."""
+    x = t*100.0
+    if 0.0 <= x < 1e8:
+        #x is within 1e-8 of the exact product, so it rounds the same way
+        #unless it is near a half
+        n = int(x)
+        f = x - n
+        if abs(f - 0.5) > 1e-7:
+            if f > 0.5:
+                n += 1
+            return n
+    (p, q) = float(t).as_integer_ratio()
+    (n, r) = divmod(p*100, q)
+    if (2*r > q) or ((2*r == q) and (n % 2 == 1)):
+        n += 1
+    return n
+
+class TimeFormatter():
+    """TimeFormatter formats times as locale.format('%.2f') and
+    locale.format('%d') would, but reads the locale's decimal point and
+    grouping only once, in reload(), and works on whole hundredths with
+    integer arithmetic.  Like '%.2f', it rounds the exact value of the float
+    to the nearest hundredth, and halfway cases to even, so 0.125 is shown as
+    0.12.  Digits are only grouped if grouping is true, as locale.format does
+    not group by default.  In clock mode, times are shown as h:mm:ss.cc
+    instead of as seconds."""
+    def __init__(self, grouping=False):
+        self._grouping = grouping
+        self._clock = False
+        self.reload()
+    
+    def reload(self):
+        """Read the separators of the current locale"""
+        conv = locale.localeconv()
+        self._point = conv['decimal_point']
+        self._sep = conv['thousands_sep']
+        self._groups = conv['grouping']
+        if not (self._grouping and self._sep):
+            self._groups = []
+        self._fixed = "%d" + self._point.replace("%", "%%") + "%02d"
+        self._clock_fixed = "%d:%02d:%02d" + self._point.replace("%", "%%") + "%02d"
+    
+    def set_clock(self, clock):
+        self._clock = clock
+    
+    def get_clock(self):
+        return self._clock
+    
+    def _group(self, n):
+        """Returns the integer n >= 0 as a string, with its digits grouped"""
+        s = str(n)
+        if len(self._groups) == 0:
+            return s
+        parts = []
+        size = None
+        for g in self._groups:
+            if g == locale.CHAR_MAX:
+                break
+            if g != 0:
+                size = g
+            if size is None or len(s) <= size:
+                break
+            parts.append(s[-size:])
+            s = s[:-size]
+        else:
+            #the last group size repeats
+            while size and len(s) > size:
+                parts.append(s[-size:])
+                s = s[:-size]
+        parts.append(s)
+        parts.reverse()
+        return self._sep.join(parts)
+    
+    def format(self, t):
+        """Returns t >= 0 to the hundredth"""
+        n = to_hundredths(max(0.0, t))
+        if self._clock:
+            (seconds, hundredths) = divmod(n, 100)
+            (minutes, seconds) = divmod(seconds, 60)
+            (hours, minutes) = divmod(minutes, 60)
+            return self._clock_fixed % (hours, minutes, seconds, hundredths)
+        if len(self._groups) == 0:
+            return self._fixed % divmod(n, 100)
+        (seconds, hundredths) = divmod(n, 100)
+        return "%s%s%02d" % (self._group(seconds), self._point, hundredths)
+    
+    def format_seconds(self, t):
+        """Returns t >= 0 in whole seconds, rounded down"""
+        seconds = int(max(0, t))
+        if self._clock:
+            (minutes, seconds) = divmod(seconds, 60)
+            (hours, minutes) = divmod(minutes, 60)
+            return "%d:%02d:%02d" % (hours, minutes, seconds)
+        return self._group(seconds)